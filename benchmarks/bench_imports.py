@@ -0,0 +1,104 @@
+"""
+Import-time report for the client and server entry points.
+
+Imports each entry point in a fresh interpreter under `-X importtime` and
+reports its total import time and the slowest modules, by cumulative time
+(the module and everything it imported first) and by self time. This is
+what every server spawn pays before it can answer initialize, and what
+mcp_zygote preloads.
+
+Run from the repo root:
+    python -m benchmarks.bench_imports [--top 15] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Any
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS=(
+    "mcp_manager",
+    "mcp_connect",
+    "mcp_servers.database_server",
+    "mcp_servers.email_server",
+)
+
+
+def import_times(module:str)->list[dict[str,Any]]:
+    """
+    Per module import times of importing module in a fresh interpreter.
+
+    Args:
+        module:Module to import
+    Returns:
+        One row per imported module, in import order
+    """
+
+    env=os.environ.copy()
+    env["PYTHONPATH"]=REPO_ROOT+os.pathsep+env.get("PYTHONPATH","")
+
+    completed=subprocess.run(
+        [sys.executable,"-X","importtime","-c",f"import {module}"],
+        env=env,
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode!=0:
+        raise RuntimeError(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows=[]
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us,cumulative_us,name=line[len("import time:"):].split("|",2)
+        rows.append({
+            "module":name.strip(),
+            "depth":(len(name)-len(name.lstrip()))//2,
+            "self_ms":int(self_us)/1000,
+            "cumulative_ms":int(cumulative_us)/1000
+        })
+    return rows
+
+
+def report(module:str,top:int)->dict[str,Any]:
+    rows=import_times(module)
+    # top level imports of the entry point add up to its total
+    total=sum(row["cumulative_ms"] for row in rows if row["depth"]==0)
+    return {
+        "total_ms":total,
+        "modules":len(rows),
+        "by_cumulative":sorted(rows,key=lambda row:row["cumulative_ms"],reverse=True)[:top],
+        "by_self":sorted(rows,key=lambda row:row["self_ms"],reverse=True)[:top]
+    }
+
+
+def print_report(results:dict[str,Any])->None:
+    for module,result in results.items():
+        print(f"\n== {module}: {result['total_ms']:.1f} ms, {result['modules']} modules")
+        print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+        for row in result["by_cumulative"]:
+            print(f"  {row['cumulative_ms']:>13.1f}  {row['self_ms']:>8.1f}  {row['module']}")
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules",default=",".join(ENTRY_POINTS),help="comma separated, default every entry point")
+    parser.add_argument("--top",type=int,default=15,help="slowest modules to list")
+    parser.add_argument("--json",help="write results to this file")
+    args=parser.parse_args()
+
+    results={module:report(module,args.top) for module in args.modules.split(",")}
+    print_report(results)
+
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"benchmark":"imports","python":sys.version.split()[0],"results":results},f,indent=2)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+End-to-end benchmark of the MCP stack.
+
+Measures, for the database and email servers:
+
+connect      cold and warm mcp_connect.connect_server latency. Cold runs
+             against an empty bytecode cache (a fresh PYTHONPYCACHEPREFIX),
+             so every import is compiled, warm runs reuse that cache
+session      the same for a bare MCP stdio session (spawn + initialize),
+             without the ADK toolset on top
+list_tools   list_tools round trip on an open session
+calls        p50/p99 latency of every tool
+throughput   calls per second at increasing client concurrency
+
+over the stdio transport (a server subprocess) and an in-memory transport
+(the server runs in this process), which separates the cost of the
+transport from the cost of the tools. Everything runs offline: mail is
+not delivered and the refund ledger and email history go to a temp dir.
+
+Run from the repo root:
+    python -m benchmarks.bench_mcp [--calls 200] [--concurrency 1,4,16,64] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import statistics
+from typing import Any,Awaitable,Callable
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,REPO_ROOT)
+
+SERVERS={
+    "database":"mcp_servers.database_server",
+    "email":"mcp_servers.email_server",
+}
+
+TRANSPORTS=("stdio","memory")
+
+# arguments for each tool, a call counter is passed in for unique values
+TOOL_CALLS:dict[str,dict[str,Callable[[int],dict[str,Any]]]]={
+    "database":{
+        "get_customer":lambda i:{"email":"user@email.com"},
+        "get_orders":lambda i:{"customer_id":"C001"},
+        "find_duplicate_charges":lambda i:{"customer_id":"C001"},
+        "find_all_duplicate_charges":lambda i:{},
+        # only the first call writes, the rest replay the idempotency key
+        "process_refund":lambda i:{"order_id":"ORD-45232","amount":29.99,"idempotency_key":"bench-refund"},
+        "get_subscription":lambda i:{"customer_id":"C001"},
+        "batch":lambda i:{"calls":[
+            {"tool":"get_customer","arguments":{"email":"user@email.com"}},
+            {"tool":"get_orders","arguments":{"customer_id":"C001"}},
+            {"tool":"find_duplicate_charges","arguments":{"customer_id":"C001"}}
+        ]},
+    },
+    "email":{
+        "send_email":lambda i:{"to":f"bench{i%50}@example.com","subject":"Benchmark","body":"Hello"},
+        "send_password_reset":lambda i:{"email":f"bench{i%50}@example.com"},
+        "send_refund_confirmation":lambda i:{"email":"user@email.com","refund_id":"REF-00001","amount":29.99,"order_id":"ORD-45232"},
+        "send_ticket_confirmation":lambda i:{"email":"user@email.com","ticket_id":f"T-{i}","issue_type":"billing"},
+        "get_email_status":lambda i:{"email_id":"EMAIL-000000000000"},
+        "get_email_history":lambda i:{"email":"bench0@example.com"},
+        "batch":lambda i:{"calls":[
+            {"tool":"send_email","arguments":{"to":"user@email.com","subject":"Benchmark","body":"Hello"}},
+            {"tool":"get_email_history","arguments":{"email":"user@email.com"}}
+        ]},
+    },
+}
+
+# tool used for the throughput runs
+THROUGHPUT_TOOL={"database":"get_orders","email":"get_email_history"}
+
+
+def _percentile(samples:list[float],pct:float)->float:
+    ordered=sorted(samples)
+    index=min(len(ordered)-1,max(0,round(pct/100*(len(ordered)-1))))
+    return ordered[index]
+
+
+def _summary(samples:list[float])->dict[str,float]:
+    """Latency summary in milliseconds"""
+
+    return {
+        "n":len(samples),
+        "mean_ms":statistics.fmean(samples)*1000,
+        "p50_ms":_percentile(samples,50)*1000,
+        "p99_ms":_percentile(samples,99)*1000,
+        "max_ms":max(samples)*1000
+    }
+
+
+async def _timed(fn:Callable[[],Awaitable[Any]])->float:
+    started=time.perf_counter()
+    await fn()
+    return time.perf_counter()-started
+
+
+def server_env(pycache:str)->dict[str,str]:
+    """Environment for a benchmarked server subprocess"""
+
+    env=os.environ.copy()
+    env["PYTHONPYCACHEPREFIX"]=pycache
+    env["PYTHONPATH"]=REPO_ROOT+os.pathsep+env.get("PYTHONPATH","")
+    return env
+
+
+@contextlib.asynccontextmanager
+async def open_session(name:str,transport:str,env:dict[str,str]):
+    """ClientSession on a server over stdio or in memory"""
+
+    from mcp import ClientSession,StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    if transport=="stdio":
+        params=StdioServerParameters(command=sys.executable,args=["-m",SERVERS[name]],env=env,cwd=REPO_ROOT)
+        with open(os.devnull,"w") as devnull:
+            async with stdio_client(params,errlog=devnull) as (read_stream,write_stream):
+                async with ClientSession(read_stream,write_stream) as session:
+                    await session.initialize()
+                    yield session
+        return
+
+    import importlib
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    module=importlib.import_module(SERVERS[name])
+    outbox=getattr(module,"OUTBOX",None)
+    if outbox is not None:
+        outbox.start()
+    try:
+        async with create_connected_server_and_client_session(module.mcp_server) as session:
+            yield session
+    finally:
+        if outbox is not None:
+            await outbox.stop()
+
+
+async def bench_connect(name:str,warm:int,pycache_root:str)->dict[str,Any]:
+    """Cold and warm connect_server latency"""
+
+    from mcp_connect import MCPServerConfig,open_connection,disconnect_server
+
+    pycache=tempfile.mkdtemp(prefix="connect-",dir=pycache_root)
+    server=MCPServerConfig(
+        name=name,
+        type="stdio",
+        command=sys.executable,
+        args=["-m",SERVERS[name]],
+        env={"PYTHONPYCACHEPREFIX":pycache,"PYTHONPATH":REPO_ROOT}
+    )
+
+    samples=[]
+    for _ in range(warm+1):
+        # connect_server reports progress on stdout
+        with contextlib.redirect_stdout(open(os.devnull,"w")):
+            started=time.perf_counter()
+            connection=await open_connection(server,timeout=60)
+            elapsed=time.perf_counter()-started
+            connected=connection.connected
+            await disconnect_server(connection)
+        if not connected:
+            return {"error":"connect_server failed, is google-adk installed?"}
+        samples.append(elapsed)
+
+    return {"cold_ms":samples[0]*1000,"warm":_summary(samples[1:])}
+
+
+async def bench_session(name:str,warm:int,pycache_root:str)->dict[str,Any]:
+    """Cold and warm spawn + initialize of a bare MCP stdio session"""
+
+    env=server_env(tempfile.mkdtemp(prefix="session-",dir=pycache_root))
+    samples=[]
+    for _ in range(warm+1):
+        started=time.perf_counter()
+        async with open_session(name,"stdio",env):
+            samples.append(time.perf_counter()-started)
+    return {"cold_ms":samples[0]*1000,"warm":_summary(samples[1:])}
+
+
+async def bench_transport(name:str,transport:str,calls:int,concurrency:list[int],env:dict[str,str])->dict[str,Any]:
+    """list_tools, per tool latency and throughput over one transport"""
+
+    result:dict[str,Any]={}
+    async with open_session(name,transport,env) as session:
+        result["list_tools"]=_summary([await _timed(session.list_tools) for _ in range(calls)])
+
+        result["calls"]={}
+        for tool,arguments in TOOL_CALLS[name].items():
+            # first call warms caches and lazy paths, it is not counted
+            await session.call_tool(tool,arguments(0))
+            samples=[await _timed(lambda:session.call_tool(tool,arguments(i))) for i in range(1,calls+1)]
+            result["calls"][tool]=_summary(samples)
+
+        tool=THROUGHPUT_TOOL[name]
+        arguments=TOOL_CALLS[name][tool]
+        result["throughput"]=[]
+        for clients in concurrency:
+            total=calls*clients
+            queue=iter(range(total))
+
+            async def client():
+                for i in queue:
+                    await session.call_tool(tool,arguments(i))
+
+            started=time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(clients)))
+            elapsed=time.perf_counter()-started
+            result["throughput"].append({"tool":tool,"concurrency":clients,"calls":total,"calls_per_s":total/elapsed})
+
+    return result
+
+
+async def run(servers:list[str],transports:list[str],calls:int,concurrency:list[int],warm:int)->dict[str,Any]:
+    scratch=tempfile.mkdtemp(prefix="bench-mcp-")
+    # keep the servers' side effects out of the repo, in this process (memory
+    # transport) and in the subprocesses that inherit the environment
+    os.environ["REFUND_LEDGER_PATH"]=os.path.join(scratch,"refunds.jsonl")
+    os.environ["EMAIL_HISTORY_PATH"]=os.path.join(scratch,"email_history.jsonl")
+    for var in ("SMTP_HOST","MCP_TRANSPORT"):
+        os.environ.pop(var,None)
+
+    env=server_env(tempfile.mkdtemp(prefix="pycache-",dir=scratch))
+    results:dict[str,Any]={}
+    for name in servers:
+        print(f"{name}: connect",file=sys.stderr)
+        results[name]={
+            "connect":await bench_connect(name,warm,scratch),
+            "session":await bench_session(name,warm,scratch)
+        }
+        for transport in transports:
+            print(f"{name}: {transport}",file=sys.stderr)
+            # the email outbox logs every undelivered message on stderr
+            with contextlib.redirect_stderr(open(os.devnull,"w")):
+                results[name][transport]=await bench_transport(name,transport,calls,concurrency,env)
+    return results
+
+
+def print_report(results:dict[str,Any])->None:
+    for name,result in results.items():
+        print(f"\n== {name}")
+        for phase in ("connect","session"):
+            entry=result[phase]
+            if "error" in entry:
+                print(f"{phase:<12} {entry['error']}")
+            else:
+                print(f"{phase:<12} cold {entry['cold_ms']:8.1f} ms   warm p50 {entry['warm']['p50_ms']:8.1f} ms")
+
+        for transport in TRANSPORTS:
+            if transport not in result:
+                continue
+            entry=result[transport]
+            print(f"\n  [{transport}] {'tool':<28} {'p50 ms':>8} {'p99 ms':>8}")
+            print(f"  [{transport}] {'list_tools':<28} {entry['list_tools']['p50_ms']:>8.3f} {entry['list_tools']['p99_ms']:>8.3f}")
+            for tool,summary in entry["calls"].items():
+                print(f"  [{transport}] {tool:<28} {summary['p50_ms']:>8.3f} {summary['p99_ms']:>8.3f}")
+            for row in entry["throughput"]:
+                print(f"  [{transport}] {row['tool']} x{row['concurrency']:<4} {row['calls_per_s']:>10.0f} calls/s")
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers",default=",".join(SERVERS),help="comma separated, default all")
+    parser.add_argument("--transports",default=",".join(TRANSPORTS),help="comma separated, default all")
+    parser.add_argument("--calls",type=int,default=200,help="calls per tool, and per client for throughput")
+    parser.add_argument("--concurrency",default="1,4,16,64")
+    parser.add_argument("--warm",type=int,default=5,help="warm connects after the cold one")
+    parser.add_argument("--json",help="write results to this file")
+    args=parser.parse_args()
+
+    servers=args.servers.split(",")
+    transports=args.transports.split(",")
+    for value,known in ((servers,SERVERS),(transports,TRANSPORTS)):
+        unknown=set(value)-set(known)
+        if unknown:
+            parser.error(f"unknown: {', '.join(sorted(unknown))}")
+
+    results=asyncio.run(run(servers,transports,args.calls,[int(c) for c in args.concurrency.split(",")],args.warm))
+    print_report(results)
+
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"benchmark":"mcp","python":sys.version.split()[0],"results":results},f,indent=2)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark tool result serialization.
+
+Compares the old pretty printed json.dumps against the compact encoders
+in mcp_servers.serialization on large get_orders and email history
+results: payload size, encode time and, for the client side, decode time.
+
+Run from the repo root:
+    python -m benchmarks.bench_serialization [--orders 5000] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any,Callable
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_servers import serialization
+
+
+def orders_result(count:int)->dict[str,Any]:
+    orders=[
+        {
+            "OrderID":f"ORD-{100000+i}",
+            "Amount":29.99 if i%3 else 9.99,
+            "Date":f"2024-{1+i%12:02d}-{1+i%28:02d}",
+            "Status":"Completed",
+            "Item":"Premium Monthly" if i%3 else "Basic Monthly"
+        }
+        for i in range(count)
+    ]
+    return {"success":True,"customer_id":"C001","total_orders":count,"orders":orders}
+
+
+def history_result(count:int)->dict[str,Any]:
+    emails=[
+        {
+            "email_id":f"EMAIL-{i:012X}",
+            "to":"user@email.com",
+            "subject":"Refund Confirmed -$29.99",
+            "body":"Hello,\n    Your refund has been processed successfully.\n    "*3,
+            "sent_at":"2024-12-20T10:00:00.000000",
+            "status":"sent"
+        }
+        for i in range(count)
+    ]
+    return {"success":True,"email":"user@email.com","total_emails":count,"emails":emails}
+
+
+def _time(fn:Callable[[],Any],repeat:int)->float:
+    """Best of repeat runs, seconds"""
+
+    best=float("inf")
+    for _ in range(repeat):
+        started=time.perf_counter()
+        fn()
+        best=min(best,time.perf_counter()-started)
+    return best
+
+
+def run(orders:int,emails:int,repeat:int)->list[dict[str,Any]]:
+    encoders={
+        "pretty json (before)":lambda r:json.dumps(r,indent=2),
+        "compact json":lambda r:json.dumps(r,separators=(",",":"),ensure_ascii=False),
+    }
+    if serialization.orjson is not None:
+        encoders["compact orjson"]=lambda r:serialization.orjson.dumps(r).decode()
+
+    rows=[]
+    for name,result in (("get_orders",orders_result(orders)),("get_email_history",history_result(emails))):
+        for encoder,encode in encoders.items():
+            text=encode(result)
+            rows.append({
+                "result":name,
+                "encoder":encoder,
+                "bytes":len(text.encode()),
+                "encode_ms":_time(lambda:encode(result),repeat)*1000,
+                "decode_ms":_time(lambda:json.loads(text),repeat)*1000
+            })
+    return rows
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders",type=int,default=5000)
+    parser.add_argument("--emails",type=int,default=1000)
+    parser.add_argument("--repeat",type=int,default=20)
+    parser.add_argument("--json",help="write results to this file")
+    args=parser.parse_args()
+
+    rows=run(args.orders,args.emails,args.repeat)
+
+    print(f"{'result':<18} {'encoder':<22} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    for row in rows:
+        print(f"{row['result']:<18} {row['encoder']:<22} {row['bytes']:>10} {row['encode_ms']:>10.2f} {row['decode_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"benchmark":"serialization","rows":rows},f,indent=2)
+
+if __name__=="__main__":
+    main()
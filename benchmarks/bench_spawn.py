@@ -0,0 +1,120 @@
+"""
+Spawn-to-ready benchmark for the stdio servers.
+
+Measures how long a client waits from spawning a server to the end of
+the MCP initialize handshake, for
+
+direct   python -m mcp_servers.<server>, a fresh interpreter that imports
+         the whole server stack
+zygote   the mcp_zygote launcher, which forks the server from a zygote
+         that already imported it
+
+A private zygote is started on a temp socket for the run. Everything runs
+offline: mail is not delivered and the refund ledger and email history go
+to a temp dir.
+
+Run from the repo root:
+    python -m benchmarks.bench_spawn [--runs 20] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Any
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,REPO_ROOT)
+
+from benchmarks.bench_mcp import SERVERS,_summary
+from mcp_zygote import launcher_command,start_zygote
+
+MODES=("direct","zygote")
+
+
+async def spawn_once(command:str,args:list[str],env:dict[str,str])->float:
+    """Seconds from spawn to an initialized session"""
+
+    from mcp import ClientSession,StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params=StdioServerParameters(command=command,args=args,env=env,cwd=REPO_ROOT)
+    with open(os.devnull,"w") as devnull:
+        started=time.perf_counter()
+        async with stdio_client(params,errlog=devnull) as (read_stream,write_stream):
+            async with ClientSession(read_stream,write_stream) as session:
+                await session.initialize()
+                elapsed=time.perf_counter()-started
+                # one call, so a broken fork fails the benchmark
+                await session.list_tools()
+    return elapsed
+
+
+async def bench_server(name:str,runs:int,socket_path:str,env:dict[str,str])->dict[str,Any]:
+    result={}
+    for mode in MODES:
+        command,args=sys.executable,["-m",SERVERS[name]]
+        if mode=="zygote":
+            command,args=launcher_command(command,args,socket_path)
+        # the first spawn warms the bytecode and page caches, it is not counted
+        await spawn_once(command,args,env)
+        result[mode]=_summary([await spawn_once(command,args,env) for _ in range(runs)])
+    result["speedup"]=result["direct"]["p50_ms"]/result["zygote"]["p50_ms"]
+    return result
+
+
+async def run(servers:list[str],runs:int)->dict[str,Any]:
+    scratch=tempfile.mkdtemp(prefix="bench-spawn-")
+    env=os.environ.copy()
+    env["REFUND_LEDGER_PATH"]=os.path.join(scratch,"refunds.jsonl")
+    env["EMAIL_HISTORY_PATH"]=os.path.join(scratch,"email_history.jsonl")
+    env["PYTHONPATH"]=REPO_ROOT+os.pathsep+env.get("PYTHONPATH","")
+    for var in ("SMTP_HOST","MCP_TRANSPORT"):
+        env.pop(var,None)
+
+    socket_path=os.path.join(scratch,"zygote.sock")
+    zygote=await asyncio.to_thread(start_zygote,socket_path)
+    try:
+        results={}
+        for name in servers:
+            print(f"{name}: spawning",file=sys.stderr)
+            results[name]=await bench_server(name,runs,socket_path,env)
+        return results
+    finally:
+        zygote.terminate()
+        zygote.wait()
+
+
+def print_report(results:dict[str,Any])->None:
+    print(f"{'server':<10} {'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name,result in results.items():
+        for mode in MODES:
+            row=result[mode]
+            print(f"{name:<10} {mode:<8} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        print(f"{name:<10} zygote is {result['speedup']:.1f}x faster to ready")
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers",default=",".join(SERVERS),help="comma separated, default all")
+    parser.add_argument("--runs",type=int,default=20,help="spawns per server and mode")
+    parser.add_argument("--json",help="write results to this file")
+    args=parser.parse_args()
+
+    servers=args.servers.split(",")
+    unknown=set(servers)-set(SERVERS)
+    if unknown:
+        parser.error(f"unknown: {', '.join(sorted(unknown))}")
+
+    results=asyncio.run(run(servers,args.runs))
+    print_report(results)
+
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"benchmark":"spawn","python":sys.version.split()[0],"results":results},f,indent=2)
+
+if __name__=="__main__":
+    main()
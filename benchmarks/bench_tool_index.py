@@ -0,0 +1,121 @@
+"""
+Benchmark the cross-server tool index.
+
+Builds a fleet of N copies of the database and email servers (each copy
+with its own server name, so every tool name collides) from their real
+tool schemas, then compares what the agent is sent per turn with the full
+toolset and with RankedToolset's top k: declared tools, declaration bytes
+(about 4 bytes per prompt token), plus index build time and ranking time
+per query. No server is spawned.
+
+Run from the repo root:
+    python -m benchmarks.bench_tool_index [--servers 1,5,25] [--top-k 8] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_connect import MCPServerConfig,MCPConnection
+from mcp_schema_cache import CachedMcpTool
+from mcp_tool_index import ToolIndex
+
+QUERIES=(
+    "I was charged twice for my Premium subscription last month, please refund the duplicate",
+    "send a password reset link to jane@example.com",
+    "which emails did we send to user@email.com about their refund",
+    "list the orders of customer C001",
+    "open a support ticket for a billing question",
+)
+
+
+def server_schemas()->dict[str,tuple[str,list[dict[str,Any]]]]:
+    from mcp_servers import database_server,email_server
+
+    return {
+        "database":("Mock customer database, orders, duplicate charges and refunds",
+            [tool.model_dump(exclude_none=True) for tool in database_server.registry.list_tools()]),
+        "email":("Mock email server, transactional emails and email history",
+            [tool.model_dump(exclude_none=True) for tool in email_server.registry.list_tools()]),
+    }
+
+
+def fleet(copies:int)->list[MCPConnection]:
+    connections=[]
+    for copy in range(copies):
+        for name,(description,schemas) in server_schemas().items():
+            server=MCPServerConfig(name=f"{name}-{copy}",type="stdio",description=description)
+            connection=MCPConnection(server=server,tool=[],connected=False)
+            connection.tool=[CachedMcpTool(schema,connection) for schema in schemas]
+            connections.append(connection)
+    return connections
+
+
+def declaration_bytes(tools:list[Any])->int:
+    return sum(
+        len(json.dumps(tool._get_declaration().model_dump(exclude_none=True,mode="json"),separators=(",",":")))
+        for tool in tools
+    )
+
+
+def run(copies:int,top_k:int,repeat:int)->dict[str,Any]:
+    connections=fleet(copies)
+
+    started=time.perf_counter()
+    index=ToolIndex(connections)
+    build=time.perf_counter()-started
+
+    full=index.tools()
+    ranked_tools=0
+    ranked_bytes=0
+    search_us=[]
+    for query in QUERIES:
+        best=float("inf")
+        for _ in range(repeat):
+            started=time.perf_counter()
+            entries=index.search(query,top_k)
+            best=min(best,time.perf_counter()-started)
+        search_us.append(best*1e6)
+        ranked_tools+=len(entries)
+        ranked_bytes+=declaration_bytes([entry.tool for entry in entries])
+
+    return {
+        "servers":len(connections),
+        "tools":len(full),
+        "collisions":len(index.collisions),
+        "build_ms":build*1000,
+        "full_bytes":declaration_bytes(full),
+        "ranked_tools":ranked_tools/len(QUERIES),
+        "ranked_bytes":ranked_bytes/len(QUERIES),
+        "search_us":sum(search_us)/len(search_us)
+    }
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers",default="1,5,25",help="comma separated copies of the server pair")
+    parser.add_argument("--top-k",type=int,default=8)
+    parser.add_argument("--repeat",type=int,default=50)
+    parser.add_argument("--json",help="write results to this file")
+    args=parser.parse_args()
+
+    rows=[run(int(copies),args.top_k,args.repeat) for copies in args.servers.split(",")]
+
+    print(f"{'servers':>7} {'tools':>6} {'build ms':>9} {'full bytes':>11} {'top-k tools':>12} {'top-k bytes':>12} {'search us':>10}")
+    for row in rows:
+        print(
+            f"{row['servers']:>7} {row['tools']:>6} {row['build_ms']:>9.2f} {row['full_bytes']:>11} "
+            f"{row['ranked_tools']:>12.1f} {row['ranked_bytes']:>12.0f} {row['search_us']:>10.1f}"
+        )
+
+    if args.json:
+        with open(args.json,"w") as f:
+            json.dump({"benchmark":"tool_index","top_k":args.top_k,"rows":rows},f,indent=2)
+
+if __name__=="__main__":
+    main()
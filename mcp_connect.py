@@ -8,18 +8,44 @@ HTTP MCP servers
 
 uses Google's ADK MCPToolSet for seamless integration
 
+connects, disconnects and tool calls are recorded in mcp_metrics, and
+results of cacheable tools are served from mcp_result_cache
+
+iter_pages follows the next_cursor of list tools page by page
+
+A circuit breaker per server makes calls to a dead server fail fast and
+reconnects it with jittered exponential backoff; monitor_connection
+probes live connections in the background
+
 """
 
 
 import os
 import sys
+import json
+import time
+import random
+import shutil
 import asyncio
-from typing import Any,Optional
+from typing import Any,AsyncIterator,Callable,Iterator,Optional
 from dataclasses import dataclass,field
-from contextlib import AsyncExitStack
+from contextlib import AsyncExitStack,asynccontextmanager,contextmanager
+
+from pydantic import BaseModel
+from opentelemetry import context as otel_context,trace as otel_trace
 
 sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from mcp_metrics import METRICS,Span,span
+from mcp_result_cache import RESULT_CACHE,cache_key,entity_tags
+from mcp_zygote import launcher_command
+
+
+# server types served over HTTP, stremable_http is kept for older configs
+HTTP_TYPES=('http','streamable_http','stremable_http','sse')
+
+# seconds a stdio session waits for any response, including a tool result
+STDIO_READ_TIMEOUT=60.0
 
 @dataclass
 class MCPServerConfig:
@@ -36,15 +62,263 @@ class MCPServerConfig:
     #for HTTP servers
     url:str=""
     
+    # seconds this server may take to connect, manager default if None
+    timeout:Optional[float]=None
+    
+    # lazy servers only run while their tools are in use: spawned on the
+    # first call and shut down after idle_timeout seconds without calls
+    lazy:bool=False
+    idle_timeout:float=300.0
+    
+    # fork `python -m` servers from the pre-warmed zygote (mcp_zygote)
+    zygote:bool=False
+    
+    # keep this many warm connections (mcp_pool) and run every call on one
+    # checked out of the pool, 0 for a single connection
+    pool_size:int=0
+    
     
 @dataclass
 class MCPConnection:
     server:MCPServerConfig
     tool:list[Any]
     exit_stack:Optional[AsyncExitStack]=None
+    # the McpToolset whose session manager holds the live session, and
+    # the ClientSession it opened when the connection was made
+    toolset:Optional[Any]=None
+    session:Optional[Any]=None
     connected:bool=False
     
-async def connect_stdio_server(server:MCPServerConfig)->MCPConnection:
+    # seconds spent in spawn, initialize and list_tools, filled by connect_*
+    timings:dict[str,float]=field(default_factory=dict)
+    
+    # set when the connection is owned by a task started with open_connection
+    owner:Optional[asyncio.Task]=None
+    closing:Optional[asyncio.Event]=None
+    
+    # live session tools by name, tool may hold placeholders (see
+    # mcp_schema_cache) until the connection is activated
+    remote:dict[str,Any]=field(default_factory=dict)
+    activation_lock:asyncio.Lock=field(default_factory=asyncio.Lock)
+    
+    # tool call bookkeeping used to reap idle lazy connections
+    inflight:int=0
+    last_used:float=field(default_factory=time.monotonic)
+    
+    # why the last connection attempt failed
+    error:str=""
+    
+    # called with the connection each time ensure_connected brings it up,
+    # e.g. to check the live tool list against the cached one
+    on_activate:Optional[Callable[["MCPConnection"],None]]=None
+    
+    # mcp_pool.ConnectionPool the calls of this connection are run on, it
+    # then holds no session of its own
+    pool:Optional[Any]=None
+    
+    
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a server that is down and not yet due for a retry"""
+    
+    
+# listener(server name, old state, new state), called on every circuit
+# breaker transition so callers can route around an outage
+StateListener=Callable[[str,str,str],None]
+STATE_LISTENERS:list[StateListener]=[]
+
+def on_state_change(listener:StateListener)->None:
+    """Register a listener for circuit breaker state changes"""
+    STATE_LISTENERS.append(listener)
+    
+    
+@dataclass
+class CircuitBreaker:
+    """
+    Per server circuit breaker.
+    
+    closed: calls go through. After failure_threshold failures in a row it
+    opens: calls fail at once with CircuitOpenError until a jittered
+    exponential backoff has passed. Then it is half_open: the next call (or
+    the background monitor) tries to reconnect, closing the breaker on
+    success and opening it again, with a longer backoff, on failure.
+    """
+    
+    name:str
+    failure_threshold:int=3
+    base_backoff:float=0.5
+    max_backoff:float=30.0
+    state:str="closed"
+    failures:int=0
+    retry_at:float=0.0
+    last_error:str=""
+    
+    def allow(self)->None:
+        """
+        Raises:
+            CircuitOpenError: while the breaker is open
+        """
+        
+        if self.state!="open":
+            return
+        wait=self.retry_at-time.monotonic()
+        if wait>0:
+            raise CircuitOpenError(f"{self.name} is down ({self.last_error}), next retry in {wait:.1f}s")
+        self._set("half_open")
+        
+    def record_success(self)->None:
+        self.failures=0
+        if self.state!="closed":
+            self._set("closed")
+            
+    def record_failure(self,error:Any)->None:
+        self.failures+=1
+        self.last_error=str(error)
+        if self.state=="half_open" or self.failures>=self.failure_threshold:
+            backoff=min(self.max_backoff,self.base_backoff*2**(self.failures-1))
+            # equal jitter, so clients of one server do not retry in lockstep
+            self.retry_at=time.monotonic()+backoff/2+random.uniform(0,backoff/2)
+            if self.state!="open":
+                self._set("open")
+                
+    def _set(self,state:str)->None:
+        old,self.state=self.state,state
+        print(f"Server {self.name}: circuit {old} -> {state}")
+        for listener in STATE_LISTENERS:
+            try:
+                listener(self.name,old,state)
+            except Exception as e:
+                print(f"State listener failed: {e}")
+                
+                
+_breakers:dict[str,CircuitBreaker]={}
+
+def circuit_breaker(server_name:str)->CircuitBreaker:
+    """The breaker of a server, shared by every connection to it"""
+    
+    breaker=_breakers.get(server_name)
+    if breaker is None:
+        breaker=_breakers[server_name]=CircuitBreaker(server_name)
+    return breaker
+    
+def tool_name(tool:Any)->str:
+    """Name of an ADK/MCP tool object"""
+    return getattr(tool,'name',getattr(tool,'__name__',str(tool)))
+    
+def _interpreter(executable:str)->tuple[str,str]:
+    """Real path of a python executable and of the venv it belongs to, '' outside one"""
+    
+    venv=os.path.dirname(os.path.dirname(os.path.abspath(executable)))
+    if not os.path.exists(os.path.join(venv,"pyvenv.cfg")):
+        venv=""
+    return os.path.realpath(executable),os.path.realpath(venv) if venv else ""
+    
+def runs_this_interpreter(command:str,path:Optional[str]=None)->bool:
+    """
+    Whether a server command is the interpreter running this process.
+    
+    Args:
+        command:Server command, e.g. python or an absolute path
+        path:PATH the command is resolved on, this process's if None
+    """
+    
+    resolved=shutil.which(command,path=path)
+    return resolved is not None and _interpreter(resolved)==_interpreter(sys.executable)
+    
+def raw_mcp_tool(tool:Any)->Any:
+    """
+    The mcp.types.Tool (inputSchema, annotations, meta) an ADK McpTool wraps.
+    
+    Raises:
+        TypeError: if tool does not wrap an MCP tool, so a changed ADK
+            surfaces here instead of as tools without schemas or policies
+    """
+    
+    raw=getattr(tool,'raw_mcp_tool',None) or getattr(tool,'_mcp_tool',None)
+    if raw is None:
+        raise TypeError(f"{tool_name(tool)} ({type(tool).__name__}) does not wrap an MCP tool")
+    return raw
+    
+def _time_transport(toolset:Any,timings:dict[str,float])->None:
+    """
+    Record how long the toolset's transport takes to open.
+    
+    The session manager opens the transport (spawning a stdio server,
+    connecting to an HTTP one) and runs initialize in one call; wrapping
+    the transport it creates splits the two so they are timed apart.
+    """
+    
+    manager=toolset._mcp_session_manager
+    create_client=manager._create_client
+    
+    def timed_client(*args:Any,**kwargs:Any)->Any:
+        client=create_client(*args,**kwargs)
+        
+        @asynccontextmanager
+        async def spawn()->AsyncIterator[Any]:
+            started=time.perf_counter()
+            async with client as streams:
+                timings["spawn"]=time.perf_counter()-started
+                yield streams
+        return spawn()
+    
+    manager._create_client=timed_client
+    
+async def _open_toolset(
+    server:MCPServerConfig,
+    connection_params:Any,
+    exit_stack:Optional[AsyncExitStack]
+)->MCPConnection:
+    """
+    Open an McpToolset session and list its tools.
+    
+    Args:
+        server:Server configuration
+        connection_params:ADK connection params for the server's transport
+        exit_stack:Stack to register the session on, a new one if None
+    Returns:
+        MCPConnection with discovered tools and spawn, initialize and
+        list_tools timings
+    
+    """
+    
+    from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+    
+    toolset=McpToolset(connection_params=connection_params)
+    timings:dict[str,float]={}
+    _time_transport(toolset,timings)
+    
+    exit_stack=exit_stack or AsyncExitStack()
+    exit_stack.push_async_callback(toolset.close)
+    
+    try:
+        started=time.perf_counter()
+        session=await toolset._mcp_session_manager.create_session()
+        timings["initialize"]=time.perf_counter()-started-timings.get("spawn",0.0)
+        
+        started=time.perf_counter()
+        tools=await toolset.get_tools()
+        timings["list_tools"]=time.perf_counter()-started
+    except BaseException:
+        await toolset.close()
+        raise
+    
+    total=sum(timings.values())
+    print(f" Connected! Found {len(tools)} tools ({total*1000:.0f} ms)")
+    for tool in tools:
+        print(f'  -{tool_name(tool)}')
+        
+    return MCPConnection(
+        server=server,
+        tool=list(tools),
+        exit_stack=exit_stack,
+        toolset=toolset,
+        session=session,
+        connected=True,
+        timings=timings,
+        remote={tool_name(tool):tool for tool in tools}
+    )
+    
+async def connect_stdio_server(server:MCPServerConfig,exit_stack:Optional[AsyncExitStack]=None)->MCPConnection:
     """
     Connect to a STDIO Mcp server using Google Adk's MCPToolset.
     
@@ -52,89 +326,82 @@ async def connect_stdio_server(server:MCPServerConfig)->MCPConnection:
     
     Args:
         server:Server configuration from YAML
+        exit_stack:Optional stack to register the session on, so the caller
+            controls when the subprocess is torn down
     Returns:
         MCPConnection with discovered tools
     
     """    
     
     try:
-        from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+        from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
         from mcp import StdioServerParameters
         
         print(f'Connecting to STDIO server: {server.name}')
-        print(f'commanf: {server.command} {''.join(server.args)}')
+        print(f'commanf: {server.command} {" ".join(server.args)}')
         
         env=os.environ.copy()
         env.update(server.env)
         
+        command,args=server.command,server.args
+        if server.zygote:
+            if runs_this_interpreter(command,env.get("PATH")):
+                command,args=launcher_command(command,args)
+            else:
+                # the zygote forks this interpreter, it cannot run another
+                # python or another venv's packages
+                print(f"{server.name}: {command} is not {sys.executable}, spawning it without the zygote")
+        
         stdio_params=StdioServerParameters(
-            command=server.command,
-            args=server.args,
+            command=command,
+            args=args,
             env=env
         )
         
-        tools,exit_stack=await McpToolset.from_server(
-            connection_parmas=stdio_params
-        )
-        
-        print(f" Connected! Found {len(tools)} tools")
-        
-        for tool in tools:
-            tool_name=getattr(tool,'name',getattr(tool,'__name__',str(tool)))
-            print(f'  -{tool_name}')
-            
-        return MCPConnection(
-            server=server,
-            tool=list(tools),
-            exit_stack=exit_stack,
-            connected=True
-        )
+        # ADK uses this timeout for every read on a stdio session, so it
+        # must cover the slowest tool call; open_connection bounds startup
+        connection_params=StdioConnectionParams(server_params=stdio_params,timeout=STDIO_READ_TIMEOUT)
+        return await _open_toolset(server,connection_params,exit_stack)
     except Exception as e:
         print(f"Connection Failed {str(e)}")
-        return MCPConnection(server=server,tool=[],connected=False)
+        return MCPConnection(server=server,tool=[],connected=False,error=str(e))
     
-async def connect_http_server(server:MCPServerConfig)->MCPConnection:
+async def connect_http_server(server:MCPServerConfig,exit_stack:Optional[AsyncExitStack]=None)->MCPConnection:
     """
     Connect to an HTTP Mcp server using google ADk's MCPToolset
     
     Args:
         server:Server configuration with URL
+        exit_stack:Optional stack to register the session on
     Returns:
         MCPConnection with discovered tools
     
     """ 
     
     try:
-        from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+        from google.adk.tools.mcp_tool.mcp_session_manager import SseConnectionParams,StreamableHTTPConnectionParams
         
         print(f'Connecting to HTTP server: {server.name}')
         print(f'URL : {server.url}')
         
-        tools,exit_stack=await McpToolset.from_server(
-            connection_parmas={"url":server.url}
-        )
-        
-        print(f" Connected! Found {len(tools)} tools")
-        for tool in tools:
-            tool_name=getattr(tool,'name',getattr(tool,'__name__',str(tool)))
-            print(f'  -{tool_name}')
-            
-        return MCPConnection(
-            server=server,
-            tool=list(tools),
-            exit_stack=exit_stack,
-            connected=True
-        )
+        # http and streamable_http both speak streamable HTTP, sse is the
+        # older event stream transport
+        if server.type=='sse':
+            http_params=SseConnectionParams(url=server.url,timeout=server.timeout or 5.0)
+        else:
+            http_params=StreamableHTTPConnectionParams(url=server.url,timeout=server.timeout or 5.0)
+        return await _open_toolset(server,http_params,exit_stack)
     except Exception as e:
         print(f"Connection Failed {str(e)}")
-        return MCPConnection(server=server,tool=[],connected=False)
+        return MCPConnection(server=server,tool=[],connected=False,error=str(e))
     
-async def connect_server(server:MCPServerConfig)->MCPConnection:
+async def connect_server(server:MCPServerConfig,exit_stack:Optional[AsyncExitStack]=None)->MCPConnection:
     """
     Connect to mcp server based on its type
     
     Args:
         server:Server configuration
+        exit_stack:Optional stack to register the session on
     Returns:
         MCPConnection with tools
     
@@ -144,14 +411,594 @@ async def connect_server(server:MCPServerConfig)->MCPConnection:
         print(f"Skipping disabled servers : {server.name}")
         return MCPConnection(server=server,tool=[],connected=False)
     
-    if server.type=='stdio':
-        return await connect_stdio_server(server=server)
-    elif server.type in ['http','stremable_http','sse']:
-        return await connect_http_server(server)
-    else:
+    if server.type not in ('stdio',*HTTP_TYPES):
         print(f"Unkonwn Server type: {server.type}")
         return MCPConnection(server=server,tool=[],connected=False)
     
+    with METRICS.timer("mcp_client_connect",server=server.name) as timer,span("connect",server=server.name):
+        if server.type=='stdio':
+            connection=await connect_stdio_server(server=server,exit_stack=exit_stack)
+        else:
+            connection=await connect_http_server(server,exit_stack=exit_stack)
+        timer.error=not connection.connected
+    return connection
+    
+async def open_connection(
+    server:MCPServerConfig,
+    timeout:Optional[float]=None,
+    connection:Optional[MCPConnection]=None
+)->MCPConnection:
+    """
+    Connect to mcp server inside a dedicated owner task.
+    
+    The MCP client transports use anyio cancel scopes, which must be exited
+    by the same task that entered them. The owner task enters the session,
+    parks until disconnect_server asks it to close, and then tears the
+    session down itself, so connections can be opened and closed from
+    anywhere (the manager, a pool, a timeout handler).
+    
+    Args:
+        server:Server configuration
+        timeout:Seconds to wait for the connection before giving up
+        connection:Existing (deferred or disconnected) connection to bring
+            up in place instead of returning a new one
+    Returns:
+        MCPConnection owned by a background task
+    Raises:
+        asyncio.TimeoutError: if the server is not ready within timeout
+    
+    """
+    
+    ready=asyncio.get_running_loop().create_future()
+    closing=asyncio.Event()
+    
+    async def owner()->None:
+        async with AsyncExitStack() as stack:
+            live=await connect_server(server,exit_stack=stack)
+            target=live if connection is None else _adopt(connection,live)
+            target.closing=closing
+            ready.set_result(target)
+            if target.connected:
+                await closing.wait()
+                await disconnect_server(target)
+                
+    task=asyncio.create_task(owner(),name=f"mcp-owner:{server.name}")
+    
+    try:
+        await asyncio.wait({ready,task},timeout=timeout,return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not ready.done():
+            # timed out, failed or the caller was cancelled: don't leave a
+            # half-started subprocess behind
+            task.cancel()
+    if not ready.done():
+        try:
+            await task
+        except asyncio.CancelledError:
+            raise asyncio.TimeoutError(f"{server.name} not ready after {timeout}s")
+        
+    connected=ready.result()
+    connected.owner=task
+    return connected
+
+def _adopt(connection:MCPConnection,live:MCPConnection)->MCPConnection:
+    """Move a freshly opened session into an existing connection object"""
+    
+    connection.exit_stack=live.exit_stack
+    connection.toolset=live.toolset
+    connection.session=live.session
+    connection.connected=live.connected
+    connection.timings.update(live.timings)
+    connection.error=live.error
+    connection.remote=live.remote
+    if not connection.tool:
+        connection.tool=live.tool
+    return connection
+
+async def ensure_connected(connection:MCPConnection,timeout:Optional[float]=None)->MCPConnection:
+    """
+    Bring a deferred or dropped connection up, once, no matter how many
+    callers are waiting on it.
+    
+    Args:
+        connection: Mcp Connection to activate
+        timeout:Seconds to wait for the server
+    Returns:
+        The same connection, connected
+    Raises:
+        ConnectionError: if the server could not be reached
+        CircuitOpenError: if the server is down and not due for a retry
+    
+    """
+    
+    if connection.connected:
+        return connection
+    
+    breaker=circuit_breaker(connection.server.name)
+    breaker.allow()
+    
+    async with connection.activation_lock:
+        if not connection.connected:
+            breaker.allow()
+            print(f"Activating server on demand: {connection.server.name}")
+            timeout=timeout if timeout is not None else connection.server.timeout
+            try:
+                await open_connection(connection.server,timeout=timeout,connection=connection)
+            except asyncio.TimeoutError:
+                connection.error=f"not ready after {timeout}s"
+            if connection.connected:
+                breaker.record_success()
+                if connection.on_activate is not None:
+                    try:
+                        connection.on_activate(connection)
+                    except Exception as e:
+                        print(f"Activation hook of {connection.server.name} failed: {e}")
+            else:
+                breaker.record_failure(connection.error or "connection failed")
+    if not connection.connected:
+        raise ConnectionError(f"Could not connect to {connection.server.name}: {connection.error or 'connection failed'}")
+    return connection
+
+async def call_tool(
+    connection:MCPConnection,
+    name:str,
+    arguments:dict[str,Any],
+    tool_context:Any=None
+)->Any:
+    """
+    Call a tool on a server, connecting first if needed.
+    
+    Results of tools the server marks cacheable are served from
+    RESULT_CACHE while they are fresh, without connecting. Identical
+    read-only calls that are already in flight on the same server are
+    coalesced: later callers wait for the first call instead of sending
+    their own, and all of them get its result (run with the first
+    caller's tool_context).
+    
+    Args:
+        connection: Mcp Connection the tool belongs to
+        name:Tool name
+        arguments:Tool arguments
+        tool_context:ADK tool context passed through to the tool
+    Returns:
+        The tool's result as a dict, see tool_result
+    
+    """
+    
+    tool=_find_tool(connection,name)
+    meta=tool_meta(tool)
+    if "cache" not in meta and not is_read_only(tool):
+        return await _call_remote(connection,name,arguments,tool_context,meta)
+    
+    key=cache_key(connection.server.name,name,arguments)
+    if "cache" in meta:
+        cached=RESULT_CACHE.get(key)
+        if cached is not None:
+            METRICS.observe("mcp_client_cache_hit",0.0,server=connection.server.name,tool=name)
+            return cached
+    
+    shared=_pending_reads.get(key)
+    if shared is None:
+        shared=asyncio.ensure_future(_call_remote(connection,name,arguments,tool_context,meta))
+        _pending_reads[key]=shared
+        shared.add_done_callback(lambda done:_forget_pending(key,done))
+    else:
+        METRICS.observe("mcp_client_coalesced",0.0,server=connection.server.name,tool=name)
+    # shielded so a cancelled caller does not cancel the call for the others
+    return await asyncio.shield(shared)
+
+# in-flight read-only calls by cache key, shared by every connection so
+# pooled connections to one server coalesce too
+_pending_reads:dict[tuple[str,str,str],asyncio.Future]={}
+
+def _forget_pending(key:tuple[str,str,str],done:asyncio.Future)->None:
+    if _pending_reads.get(key) is done:
+        del _pending_reads[key]
+    # retrieve the outcome so it is not reported as never retrieved when
+    # every caller was cancelled
+    if not done.cancelled():
+        done.exception()
+        
+async def _call_remote(
+    connection:MCPConnection,
+    name:str,
+    arguments:dict[str,Any],
+    tool_context:Any,
+    meta:dict[str,Any]
+)->Any:
+    """Send one tool call to the server and apply the cache policy to its result"""
+    
+    if connection.pool is not None:
+        try:
+            async with connection.pool.connection() as pooled:
+                return await _call_remote(pooled,name,arguments,tool_context,meta)
+        finally:
+            connection.last_used=time.monotonic()
+    
+    generation=RESULT_CACHE.generation
+    connection.inflight+=1
+    try:
+        with (
+            METRICS.timer("mcp_client_tool_call",server=connection.server.name,tool=name) as timer,
+            span("call_tool",server=connection.server.name,tool=name) as current
+        ):
+            await ensure_connected(connection)
+            tool=connection.remote.get(name)
+            if tool is None:
+                raise KeyError(f"Server {connection.server.name} has no tool {name}")
+            
+            exit_stack=connection.exit_stack
+            try:
+                # ADK's McpTool sends the current OpenTelemetry context as
+                # _meta.traceparent, so the server's spans join this trace
+                with _trace_context(current):
+                    result=tool_result(await tool.run_async(args=arguments,tool_context=tool_context))
+            except Exception as e:
+                # tool failures come back as results, an exception means
+                # the session itself is gone
+                await mark_broken(connection,e,exit_stack)
+                raise
+            data=result_data(result)
+            timer.error=result_failed(result,data)
+            if isinstance(result,dict) and "content" not in result:
+                # ADK turned an exception into {"error":...}, the call never
+                # got a result from the server
+                await mark_broken(connection,result.get("error"),exit_stack)
+                return result
+            circuit_breaker(connection.server.name).record_success()
+            if meta and not timer.error:
+                if meta.get("invalidates"):
+                    # reads already in flight may predate this write, new
+                    # callers must not join them
+                    _forget_server_reads(connection.server.name)
+                RESULT_CACHE.remember(
+                    connection.server.name,name,arguments,meta,result,data,generation=generation
+                )
+            return result
+    finally:
+        connection.inflight-=1
+        connection.last_used=time.monotonic()
+        
+def _forget_server_reads(server_name:str)->None:
+    for key in [key for key in _pending_reads if key[0]==server_name]:
+        del _pending_reads[key]
+        
+def forget_server(server_name:str)->None:
+    """Drop the breaker, pending reads and cached results of a removed or reconfigured server"""
+    
+    _breakers.pop(server_name,None)
+    _forget_server_reads(server_name)
+    RESULT_CACHE.invalidate_server(server_name)
+        
+def _find_tool(connection:MCPConnection,name:str)->Any:
+    """The live tool, or its cached placeholder when the server is not connected"""
+    
+    tool=connection.remote.get(name)
+    if tool is not None:
+        return tool
+    return next((tool for tool in connection.tool if tool_name(tool)==name),None)
+        
+def tool_meta(tool:Any)->dict[str,Any]:
+    """
+    The _meta a server declared for a tool.
+    
+    Read from the live tool, or from the cached schema of a placeholder,
+    so cache hits never need a connection.
+    
+    Raises:
+        TypeError: for a live tool that wraps no MCP tool, see raw_mcp_tool
+    """
+    
+    if tool is None:
+        return {}
+    schema=getattr(tool,'schema',None)
+    if isinstance(schema,dict):
+        return schema.get("meta") or {}
+    return raw_mcp_tool(tool).meta or {}
+
+def is_read_only(tool:Any)->bool:
+    """
+    Whether the server annotated a tool with readOnlyHint.
+    
+    Raises:
+        TypeError: for a live tool that wraps no MCP tool, see raw_mcp_tool
+    """
+    
+    if tool is None:
+        return False
+    schema=getattr(tool,'schema',None)
+    if isinstance(schema,dict):
+        return bool((schema.get("annotations") or {}).get("readOnlyHint"))
+    annotations=raw_mcp_tool(tool).annotations
+    return bool(annotations is not None and annotations.readOnlyHint)
+    
+def tool_result(result:Any)->Any:
+    """
+    A tool result in the form ADK's McpTool returns it, the CallToolResult
+    dumped to a JSON dict, whichever way the call was made. Other values
+    (ADK's {"error":...} for calls that never reached the server) are
+    returned unchanged.
+    """
+    
+    if isinstance(result,BaseModel):
+        return result.model_dump(exclude_none=True,mode="json")
+    return result
+    
+def result_failed(result:Any,data:Any)->bool:
+    """
+    Whether a tool result reports an error.
+    
+    Args:
+        result:Result from tool_result, isError or ADK's {"error":...}
+        data:Its payload from result_data, failed as the servers report
+            it, with success false or an error
+    """
+    
+    if isinstance(result,dict) and (result.get("isError") or ("error" in result and "content" not in result)):
+        return True
+    return isinstance(data,dict) and (data.get("success") is False or "error" in data)
+    
+@contextmanager
+def _trace_context(current:Optional[Span])->Iterator[None]:
+    """Make a span the current OpenTelemetry span, a no-op for None"""
+    
+    if current is None:
+        yield
+        return
+    
+    context=otel_trace.SpanContext(
+        trace_id=int(current.trace_id,16),
+        span_id=int(current.span_id,16),
+        is_remote=False,
+        trace_flags=otel_trace.TraceFlags(otel_trace.TraceFlags.SAMPLED)
+    )
+    token=otel_context.attach(otel_trace.set_span_in_context(otel_trace.NonRecordingSpan(context)))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+    
+def result_data(result:Any)->Any:
+    """
+    Decode the JSON payload of a tool result.
+    
+    Args:
+        result:CallToolResult from an mcp tool, the dict ADK's McpTool
+            dumps it to, or an already decoded value
+    Returns:
+        The decoded payload, or the result unchanged if it is not JSON text
+    
+    """
+    
+    if isinstance(result,dict):
+        if not isinstance(result.get("content"),list) and "structuredContent" not in result:
+            return result
+        structured=result.get("structuredContent")
+        content=result.get("content") or []
+        text=content[0].get("text") if content and isinstance(content[0],dict) else None
+    else:
+        structured=getattr(result,'structuredContent',None)
+        content=getattr(result,'content',None)
+        text=getattr(content[0],'text',None) if content else None
+    
+    if structured is not None:
+        return structured
+    if text is not None:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+    return result
+
+async def iter_pages(
+    connection:MCPConnection,
+    name:str,
+    arguments:dict[str,Any],
+    tool_context:Any=None,
+    max_pages:Optional[int]=None
+)->AsyncIterator[dict[str,Any]]:
+    """
+    Call a list tool page after page, following its next_cursor.
+    
+    Each page is a normal call_tool, so it is cached and coalesced like any
+    other read, and only one page is held at a time.
+    
+    Args:
+        connection: Mcp Connection the tool belongs to
+        name:Tool name
+        arguments:Tool arguments, a cursor in them is where to start
+        tool_context:ADK tool context passed through to the tool
+        max_pages:Stop after this many pages, all of them if None
+    Yields:
+        The decoded result of every page, a failed result ends the iteration
+    
+    """
+    
+    pagination=tool_meta(_find_tool(connection,name)).get("pagination") or {}
+    cursor_param=pagination.get("cursor","cursor")
+    next_field=pagination.get("next_cursor","next_cursor")
+    
+    arguments=dict(arguments)
+    pages=0
+    while max_pages is None or pages<max_pages:
+        page=result_data(await call_tool(connection,name,arguments,tool_context))
+        pages+=1
+        yield page
+        cursor=page.get(next_field) if isinstance(page,dict) else None
+        if not cursor or page.get("success") is False:
+            return
+        arguments[cursor_param]=cursor
+
+async def call_tools_batch(
+    connection:MCPConnection,
+    calls:list[tuple[str,dict[str,Any]]],
+    tool_context:Any=None
+)->list[dict[str,Any]]:
+    """
+    Run several tool calls on one server in a single round trip.
+    
+    Uses the server's batch tool when it has one and falls back to
+    concurrent individual calls otherwise.
+    
+    Args:
+        connection: Mcp Connection the tools belong to
+        calls:(tool name, arguments) pairs
+        tool_context:ADK tool context passed through to the tools
+    Returns:
+        One {"tool","ok","result"|"error"} entry per call, in order
+    
+    """
+    
+    await ensure_connected(connection)
+    
+    if _find_tool(connection,"batch") is not None:
+        payload={"calls":[{"tool":name,"arguments":arguments} for name,arguments in calls]}
+        data=result_data(await call_tool(connection,"batch",payload,tool_context))
+        if not isinstance(data,dict) or not data.get("success"):
+            error=data.get("error") if isinstance(data,dict) else str(data)
+            raise RuntimeError(f"Batch on {connection.server.name} failed: {error}")
+        
+        # writes inside a batch must still drop the results they touch
+        for (name,arguments),entry in zip(calls,data["results"]):
+            invalidates=tool_meta(_find_tool(connection,name)).get("invalidates")
+            if invalidates and entry.get("ok"):
+                RESULT_CACHE.invalidate(entity_tags(connection.server.name,invalidates,arguments,entry.get("result")))
+                _forget_server_reads(connection.server.name)
+        return data["results"]
+    
+    async def call_one(name:str,arguments:dict[str,Any])->dict[str,Any]:
+        try:
+            return {"tool":name,"ok":True,"result":result_data(await call_tool(connection,name,arguments,tool_context))}
+        except Exception as e:
+            return {"tool":name,"ok":False,"error":str(e)}
+        
+    return list(await asyncio.gather(*(call_one(name,arguments) for name,arguments in calls)))
+    
+async def reap_idle(connection:MCPConnection)->bool:
+    """
+    Shut a lazy connection down if it has been idle for its idle_timeout.
+    
+    The server is respawned by call_tool the next time one of its tools
+    is used.
+    
+    Args:
+        connection: Mcp Connection to check
+    Returns:
+        True if the connection was shut down
+    
+    """
+    
+    def idle()->bool:
+        return (
+            connection.server.lazy
+            and connection.connected
+            and connection.inflight==0
+            and time.monotonic()-connection.last_used>connection.server.idle_timeout
+        )
+    
+    if not idle():
+        return False
+    
+    async with connection.activation_lock:
+        if not idle():
+            return False
+        # new calls must wait for the respawn instead of using the
+        # session that is being closed
+        connection.connected=False
+        print(f"Shutting down idle server: {connection.server.name}")
+        await disconnect_server(connection)
+    return True
+    
+async def mark_broken(connection:MCPConnection,error:Any,exit_stack:Optional[AsyncExitStack]=None)->None:
+    """
+    Take a failed connection down so the next call reconnects it.
+    
+    Args:
+        connection: Mcp Connection whose session failed
+        error:What went wrong, counted against the server's circuit breaker
+        exit_stack:Session the failure was seen on; ignored if the
+            connection has been reconnected since
+    
+    """
+    
+    if not connection.connected or (exit_stack is not None and connection.exit_stack is not exit_stack):
+        return
+    
+    connection.connected=False
+    connection.error=str(error)
+    circuit_breaker(connection.server.name).record_failure(error)
+    print(f"Connection to {connection.server.name} lost: {error}")
+    async with connection.activation_lock:
+        await disconnect_server(connection)
+        
+async def monitor_connection(connection:MCPConnection,interval:float=10.0,timeout:float=5.0)->None:
+    """
+    Probe a connection until cancelled.
+    
+    A live connection that stops answering pings is marked broken. A
+    server whose breaker is open is reconnected once its backoff has
+    passed, so it is back before the next call needs it; lazy servers
+    are left to reconnect on their next call.
+    
+    Args:
+        connection: Mcp Connection to watch
+        interval:Seconds between probes
+        timeout:Seconds to wait for a ping
+    
+    """
+    
+    breaker=circuit_breaker(connection.server.name)
+    while True:
+        delay=interval
+        if breaker.state=="open":
+            delay=min(interval,max(breaker.retry_at-time.monotonic(),0.05))
+        await asyncio.sleep(delay)
+        
+        try:
+            if connection.connected:
+                if not await ping_server(connection,timeout):
+                    await mark_broken(connection,"liveness probe failed",connection.exit_stack)
+            elif breaker.state!="closed" and not connection.server.lazy and time.monotonic()>=breaker.retry_at:
+                await ensure_connected(connection)
+        except ConnectionError:
+            pass
+        except Exception as e:
+            print(f"Error probing {connection.server.name}: {e}")
+            
+async def ping_server(connection:MCPConnection,timeout:float=5.0)->bool:
+    """
+    Check that a connection is still usable.
+    
+    Sends an MCP ping over the session held by the connection's toolset.
+    Any error, or no answer within timeout, counts as dead, and so does a
+    session the session manager had to replace: the server went away and
+    was respawned behind the connection's back.
+    
+    Args:
+        connection: Mcp Connection to check
+        timeout:Seconds to wait for the ping response
+    Returns:
+        True if the server answered
+    
+    """
+    
+    if not connection.connected or connection.session is None:
+        return False
+    if connection.owner is not None and connection.owner.done():
+        return False
+    
+    async def ping()->None:
+        session=await connection.toolset._mcp_session_manager.create_session()
+        if session is not connection.session:
+            raise ConnectionError("session was replaced")
+        await session.send_ping()
+        
+    try:
+        await asyncio.wait_for(ping(),timeout)
+        return True
+    except Exception:
+        return False
+    
 async def disconnect_server(connection:MCPConnection)->None:
     """
     Disconnect from mcp server and cleanup resources.
@@ -161,13 +1008,27 @@ async def disconnect_server(connection:MCPConnection)->None:
     
     """ 
     
+    owner=connection.owner
+    if owner is not None and owner is not asyncio.current_task():
+        # let the owner task close the session it opened
+        connection.owner=None
+        connection.closing.set()
+        await owner
+        return
+    
     if connection.exit_stack:
-        try:
-            await connection.exit_stack.aclose()
-            print(f"Disconnected from {connection.server.name}")
-        except Exception as e:
-            print(f"Error disconnecting: {e}")
+        with METRICS.timer("mcp_client_disconnect",server=connection.server.name) as timer:
+            try:
+                await connection.exit_stack.aclose()
+                print(f"Disconnected from {connection.server.name}")
+            except Exception as e:
+                timer.error=True
+                print(f"Error disconnecting: {e}")
             
+    connection.exit_stack=None
+    connection.toolset=None
+    connection.session=None
+    connection.remote={}
     connection.connected=False
     
 
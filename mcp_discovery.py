@@ -5,44 +5,59 @@ this module handles:
 Loading server configuration from yaml
 parsing server definition
 providing server metadata
+diffing two configurations, server by server
+watching the config file for changes
+
+A config is only parsed again when the file changes, and watch_config
+hands every new version to a callback, so MCPManager can restart just
+the servers that were added, removed or modified.
+
+The actual connection is handled by mcp_connect.py
 
-The actual connection is handled by mcp_connect.py  
-    
 """
 
 import os
 import sys
+import copy
 import yaml
-from typing import Optional
+import asyncio
+from typing import Any,Awaitable,Callable,Optional
 from pathlib import Path
+from dataclasses import dataclass,field
 
 sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from mcp_connect import MCPServerConfig
 
-def discover_servers(config_path:Optional[str]=None)->list[MCPServerConfig]:
-    
-    if config_path is None:
-        config_path=Path(__file__).parent/"mcp_config.yaml"
-    else:
-        config_path=Path(config_path)
-        
-    if not config_path.exists():
-        print(f"MCP config not found: {config_path}")
-        return []
-    
-    print(f"Loading MCP config from : {config_path}")
-    
-    with open(config_path,"r") as f:
-        config=yaml.safe_load(f)
-        
-    
-    if not config:
-        print("Empty config file")
-        return []
-    
+DEFAULT_CONFIG=Path(__file__).parent/"mcp_config.yaml"
+
+class ConfigError(ValueError):
+    """Raised for a config file that does not define an mcp_servers list"""
+
+
+# file signature and servers of every config parsed so far
+_parsed:dict[Path,tuple[tuple[int,int],list[MCPServerConfig]]]={}
+
+
+def config_file(config_path:Optional[str]=None)->Path:
+    return DEFAULT_CONFIG if config_path is None else Path(config_path)
+
+
+def config_signature(config_path:Path)->Optional[tuple[int,int]]:
+    """(mtime_ns, size) of the config file, None if it does not exist"""
+
+    try:
+        stat=config_path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns,stat.st_size
+
+
+def parse_servers(config:dict[str,Any])->list[MCPServerConfig]:
+    """Server configurations from a parsed config file"""
+
     servers=[]
-    
+
     for server_data in config.get("mcp_servers",[]):
         server=MCPServerConfig(
             name=server_data.get("name","unkown"),
@@ -52,16 +67,173 @@ def discover_servers(config_path:Optional[str]=None)->list[MCPServerConfig]:
             command=server_data.get("command",""),
             args=server_data.get("args",[]),
             env=server_data.get("env",{}),
-            url=server_data.get("url","")
+            url=server_data.get("url",""),
+            timeout=server_data.get("timeout"),
+            lazy=server_data.get("lazy",False),
+            idle_timeout=server_data.get("idle_timeout",300.0),
+            zygote=server_data.get("zygote",False),
+            pool_size=server_data.get("pool_size",0)
         )
         servers.append(server)
-        
+
+    return servers
+
+
+def discover_servers(config_path:Optional[str]=None,strict:bool=False)->list[MCPServerConfig]:
+    """
+    Servers defined in the config file.
+
+    The file is only read and parsed again once it has changed.
+
+    Args:
+        config_path:Path to mcp_config.yaml, the one next to this module if omitted
+        strict:Raise ConfigError for an empty file or one without an
+            mcp_servers list instead of returning no servers. Reloads are
+            strict, such a file is more likely half written than a
+            request to stop every server
+    Returns:
+        Server configurations, empty if the file is missing or lists no servers
+    Raises:
+        yaml.YAMLError: if the file is not valid YAML
+        ConfigError: if the file is not a mapping, or with strict if it is
+            empty or has no mcp_servers list
+    """
+
+    config_path=config_file(config_path)
+    signature=config_signature(config_path)
+
+    if signature is None:
+        print(f"MCP config not found: {config_path}")
+        return []
+
+    cached=_parsed.get(config_path)
+    if cached is not None and cached[0]==signature:
+        # callers own their copy, they may edit it
+        return copy.deepcopy(cached[1])
+
+    print(f"Loading MCP config from : {config_path}")
+
+    with open(config_path,"r") as f:
+        config=yaml.safe_load(f)
+
+    if not config:
+        if strict:
+            raise ConfigError(f"{config_path} is empty")
+        print("Empty config file")
+        return []
+    if not isinstance(config,dict):
+        raise ConfigError(f"{config_path} is not a mapping")
+    if not isinstance(config.get("mcp_servers"),list):
+        if strict:
+            raise ConfigError(f"{config_path} has no mcp_servers list")
+        print(f"No mcp_servers list in {config_path}")
+        return []
+
+    servers=parse_servers(config)
+    _parsed[config_path]=(signature,copy.deepcopy(servers))
+
     print(f'Found {len(servers)} MCP Servers: ')
-    
+
     for s in servers:
         status="yes" if s.enabled else "no"
         print(f"{status} {s.name} ({s.type}):({s.description})")
-        
-    return server
-        
-    
\ No newline at end of file
+
+    return servers
+
+
+@dataclass
+class ConfigDiff:
+    """What changed between two configurations, servers matched by name"""
+
+    added:list[MCPServerConfig]=field(default_factory=list)
+    removed:list[MCPServerConfig]=field(default_factory=list)
+    # new configuration of servers whose settings changed
+    modified:list[MCPServerConfig]=field(default_factory=list)
+    unchanged:list[str]=field(default_factory=list)
+
+    def __bool__(self)->bool:
+        return bool(self.added or self.removed or self.modified)
+
+    def summary(self)->str:
+        parts=[
+            f"{label} {', '.join(server.name for server in servers)}"
+            for label,servers in (("added",self.added),("removed",self.removed),("modified",self.modified))
+            if servers
+        ]
+        return "; ".join(parts) or "no changes"
+
+
+def diff_servers(old:list[MCPServerConfig],new:list[MCPServerConfig])->ConfigDiff:
+    """
+    Compare two configurations.
+
+    Args:
+        old:Servers currently in use
+        new:Servers from the changed config
+    Returns:
+        ConfigDiff, a server counts as modified if any of its settings differ
+    """
+
+    before={server.name:server for server in old}
+    after={server.name:server for server in new}
+    diff=ConfigDiff()
+
+    for name,server in after.items():
+        if name not in before:
+            diff.added.append(server)
+        elif before[name]!=server:
+            diff.modified.append(server)
+        else:
+            diff.unchanged.append(name)
+
+    diff.removed=[server for name,server in before.items() if name not in after]
+    return diff
+
+
+async def watch_config(
+    config_path:Optional[str],
+    on_change:Callable[[list[MCPServerConfig]],Awaitable[Any]],
+    interval:float=2.0
+)->None:
+    """
+    Poll the config file until cancelled, passing each new version to on_change.
+
+    A file that is missing, not valid YAML, empty or without an
+    mcp_servers list is reported and skipped, the servers keep running on
+    the last good config. An explicit empty list (mcp_servers: []) does
+    stop them.
+
+    Args:
+        config_path:Path to mcp_config.yaml, the one next to this module if omitted
+        on_change:Awaited with the new server list after every change
+        interval:Seconds between checks
+    """
+
+    path=config_file(config_path)
+    signature=config_signature(path)
+
+    while True:
+        await asyncio.sleep(interval)
+        current=config_signature(path)
+        if current==signature:
+            continue
+
+        # editors may write the file in several steps, wait until it settles
+        await asyncio.sleep(min(interval,0.2))
+        if config_signature(path)!=current:
+            continue
+        signature=current
+
+        if current is None:
+            print(f"MCP config {path} was removed, keeping the current servers")
+            continue
+        try:
+            servers=discover_servers(str(path),strict=True)
+        except (OSError,yaml.YAMLError,ConfigError) as e:
+            print(f"MCP config {path} not reloaded: {e}")
+            continue
+
+        try:
+            await on_change(servers)
+        except Exception as e:
+            print(f"Applying MCP config {path} failed: {e}")
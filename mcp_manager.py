@@ -0,0 +1,545 @@
+"""
+MCP Manager - starts and owns every mcp server the agent talks to.
+
+this module handles:
+connecting all enabled servers concurrently
+per-server and whole-fleet startup deadlines
+reporting startup timing per server
+serving tools from the schema cache instead of spawning servers at startup
+shutting lazy servers down when idle
+keeping warm connection pools for servers with pool_size set
+starting the spawn zygote for servers with zygote: true
+reloading mcp_config.yaml on change, restarting only the servers that changed
+probing connected servers and reconnecting them after a crash
+collecting the tools of connected servers for the agent
+indexing those tools by name and relevance, see mcp_tool_index.py
+writing client metrics to MCP_METRICS_FILE (Prometheus text) on stop
+
+Server discovery lives in mcp_discovery.py and the low level connection
+logic in mcp_connect.py
+
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+from typing import Any,Callable,Optional
+from dataclasses import dataclass,field
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_connect import (
+    MCPServerConfig,
+    MCPConnection,
+    open_connection,
+    disconnect_server,
+    reap_idle,
+    monitor_connection,
+    circuit_breaker,
+    on_state_change,
+    forget_server,
+    STATE_LISTENERS
+)
+from mcp_discovery import ConfigDiff,discover_servers,diff_servers,watch_config
+from mcp_metrics import METRICS
+from mcp_pool import ConnectionPool,pooled_connection
+from mcp_schema_cache import deferred_connection,defer_tools,refresh_schemas,save_schemas
+from mcp_tool_index import RankedToolset,ToolIndex
+from mcp_zygote import start_zygote
+
+
+@dataclass
+class ServerStatus:
+    name:str
+    # pending | connected | deferred | failed | timeout | disabled, then
+    # down | recovering | connected as the server's circuit breaker moves
+    state:str="pending"
+    elapsed:float=0.0
+    tool_count:int=0
+    timings:dict[str,float]=field(default_factory=dict)
+    error:str=""
+
+
+class MCPManager:
+    """
+    Connects a fleet of mcp servers at once.
+
+    Every enabled server is started in its own task. A server that misses
+    its own deadline, or is still starting when the fleet deadline passes,
+    is cancelled and only loses its own tools; the rest of the fleet is
+    available to the agent as soon as start() returns.
+
+    With the schema cache enabled, a server whose tool list is cached is
+    not spawned at all during startup. Its tools are built from the cache
+    and the server is connected the first time one of them is called.
+
+    The agent always gets placeholder tools that call through
+    mcp_connect.call_tool, so it never holds a session that might go away.
+    A reaper task shuts lazy servers down once they have been idle for
+    their idle_timeout; the next call spawns them again. A monitor task
+    per server pings it and reconnects it with backoff after a crash,
+    while its circuit breaker makes calls fail fast; status follows the
+    breaker, and available() lists the servers worth routing to. A server
+    that failed or timed out at startup is retried with the same backoff
+    until it comes up.
+
+    A server with pool_size set is started as a ConnectionPool of that many
+    warm connections instead; each call checks one out, so concurrent
+    sessions do not share a process and never wait for a spawn while the
+    pool is warm. The pool does its own health checks and refills.
+
+    With watch_interval set, the config file is polled and every change
+    is applied by reload(): added servers are started, removed ones
+    stopped and modified ones restarted, while the rest keep their warm
+    sessions. Placeholder tools belong to a connection, so the agent
+    should fetch get_tools() again after a reload (on_reload is called
+    with the diff), or use toolset(), which always follows the current
+    connections.
+
+    All tools are kept in a ToolIndex: names that clash across servers are
+    exposed as server__tool, call() dispatches by name, and toolset() gives
+    the agent only the top k tools for each turn.
+
+    """
+
+    def __init__(
+        self,
+        servers:Optional[list[MCPServerConfig]]=None,
+        config_path:Optional[str]=None,
+        server_timeout:float=20.0,
+        startup_timeout:float=30.0,
+        schema_cache:bool=True,
+        health_interval:float=10.0,
+        watch_interval:float=0.0,
+        on_reload:Optional[Callable[[ConfigDiff],Any]]=None,
+        namespace_tools:bool=False
+    ):
+        """
+        Args:
+            servers:Server configurations, discovered from config_path if omitted
+            config_path:Path to mcp_config.yaml
+            server_timeout:Default seconds a single server may take to connect
+            startup_timeout:Seconds the whole fleet may take to start
+            schema_cache:Build tools from cached schemas and connect on first use
+            health_interval:Seconds between liveness probes, 0 to disable
+            watch_interval:Seconds between config file checks, 0 to disable
+                hot reload, only used for servers discovered from config_path
+            on_reload:Called with the ConfigDiff after a reload changed something
+            namespace_tools:Expose every tool as server__tool, not only the
+                ones whose name another server uses too
+        """
+
+        self.config_path=config_path
+        self.watch_config=servers is None and watch_interval>0
+        self.watch_interval=watch_interval
+        self.on_reload=on_reload
+        self.servers=servers if servers is not None else discover_servers(config_path)
+        self.server_timeout=server_timeout
+        self.startup_timeout=startup_timeout
+        self.schema_cache=schema_cache
+        self.connections:dict[str,MCPConnection]={}
+        self.status:dict[str,ServerStatus]={}
+        self._reaper:Optional[asyncio.Task]=None
+        self.health_interval=health_interval
+        self._monitors:dict[str,asyncio.Task]={}
+        # reconnect tasks of servers that failed at startup
+        self._retries:dict[str,asyncio.Task]={}
+        # pools of servers with pool_size set, by server name
+        self._pools:dict[str,ConnectionPool]={}
+        # zygote process this manager started, None if it reuses a running one
+        self._zygote:Optional[Any]=None
+        self._watcher:Optional[asyncio.Task]=None
+        # reloads and start() must not interleave
+        self._reload_lock=asyncio.Lock()
+        self.namespace_tools=namespace_tools
+        # rebuilt on first use after the connections changed
+        self._tool_index:Optional[ToolIndex]=None
+
+    async def start(self)->dict[str,ServerStatus]:
+        """
+        Connect every enabled server concurrently.
+
+        Returns:
+            Startup status per server name
+
+        """
+
+        async with self._reload_lock:
+            if self._on_state_change not in STATE_LISTENERS:
+                on_state_change(self._on_state_change)
+            await self._start_servers(self.servers)
+            self._start_background()
+
+        if self.watch_config and self._watcher is None:
+            self._watcher=asyncio.create_task(
+                watch_config(self.config_path,self.reload,self.watch_interval),
+                name="mcp-config-watcher"
+            )
+        return self.status
+
+    async def _start_servers(self,servers:list[MCPServerConfig])->None:
+        """Connect servers concurrently within the fleet deadline and report how it went"""
+
+        started=time.perf_counter()
+        tasks={}
+
+        if any(server.enabled and server.zygote for server in servers) and self._zygote is None:
+            # servers fall back to a normal spawn if the zygote is missing
+            try:
+                self._zygote=await asyncio.to_thread(start_zygote)
+            except (OSError,RuntimeError,TimeoutError) as e:
+                print(f"MCP zygote not started, spawning servers directly: {e}")
+
+        for server in servers:
+            self.status[server.name]=ServerStatus(name=server.name)
+            if not server.enabled:
+                self.status[server.name].state="disabled"
+                continue
+            tasks[asyncio.create_task(self._start_server(server))]=server
+
+        if tasks:
+            _,pending=await asyncio.wait(tasks,timeout=self.startup_timeout)
+
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+                status=self.status[tasks[task].name]
+                status.state="timeout"
+                status.elapsed=time.perf_counter()-started
+                status.error=f"fleet startup deadline of {self.startup_timeout}s exceeded"
+
+        self._tool_index=None
+        self.print_report(time.perf_counter()-started)
+
+    def _start_background(self)->None:
+        """Start the reaper and any missing monitor and retry tasks"""
+
+        if any(server.lazy for server in self.servers) and self._reaper is None:
+            self._reaper=asyncio.create_task(self._reap_idle(),name="mcp-reaper")
+        if self.health_interval>0:
+            for name,connection in self.connections.items():
+                if name not in self._monitors and connection.pool is None:
+                    self._monitors[name]=asyncio.create_task(
+                        monitor_connection(connection,self.health_interval),
+                        name=f"mcp-monitor:{name}"
+                    )
+            for server in self.servers:
+                status=self.status.get(server.name)
+                if status is not None and status.state in ("failed","timeout") and server.name not in self._retries:
+                    self._retries[server.name]=asyncio.create_task(
+                        self._retry_server(server),
+                        name=f"mcp-retry:{server.name}"
+                    )
+
+    async def _retry_server(self,server:MCPServerConfig)->None:
+        """Start a server that failed at startup again, with jittered exponential backoff"""
+
+        breaker=circuit_breaker(server.name)
+        attempt=0
+        try:
+            while server.name not in self.connections:
+                backoff=min(breaker.max_backoff,breaker.base_backoff*2**attempt)
+                await asyncio.sleep(backoff/2+random.uniform(0,backoff/2))
+                attempt+=1
+                async with self._reload_lock:
+                    if self.status.get(server.name) is None:
+                        # removed by a reload while we slept
+                        return
+                    await self._start_server(server)
+                    if server.name in self.connections:
+                        print(f"Server {server.name} up after {attempt} retries")
+                        self._tool_index=None
+                        self._start_background()
+        finally:
+            if self._retries.get(server.name) is asyncio.current_task():
+                del self._retries[server.name]
+
+    async def _stop_server(self,name:str)->None:
+        """Disconnect one server and forget everything held for it"""
+
+        for task in (self._monitors.pop(name,None),self._retries.pop(name,None)):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task,return_exceptions=True)
+
+        pool=self._pools.pop(name,None)
+        if pool is not None:
+            await pool.close()
+        connection=self.connections.pop(name,None)
+        if connection is not None:
+            try:
+                await disconnect_server(connection)
+            except Exception as e:
+                print(f"Error disconnecting {name}: {e}")
+        forget_server(name)
+        self.status.pop(name,None)
+        self._tool_index=None
+
+    async def reload(self,servers:Optional[list[MCPServerConfig]]=None)->ConfigDiff:
+        """
+        Apply a new configuration, touching only the servers that changed.
+
+        Args:
+            servers:New server configurations, discovered from config_path if omitted
+        Returns:
+            What changed
+        Raises:
+            ConfigError: if the config file is empty or lists no servers,
+                nothing is stopped then
+        """
+
+        if servers is None:
+            servers=discover_servers(self.config_path,strict=True)
+
+        async with self._reload_lock:
+            diff=diff_servers(self.servers,servers)
+            if not diff:
+                return diff
+
+            print(f"MCP config changed: {diff.summary()}")
+            await asyncio.gather(*(self._stop_server(server.name) for server in diff.removed+diff.modified))
+            self.servers=servers
+            await self._start_servers(diff.added+diff.modified)
+
+            # the reaper computes its interval from the lazy servers it started with
+            if self._reaper is not None:
+                self._reaper.cancel()
+                await asyncio.gather(self._reaper,return_exceptions=True)
+                self._reaper=None
+            self._start_background()
+
+        if self.on_reload is not None:
+            self.on_reload(diff)
+        return diff
+
+    async def _start_server(self,server:MCPServerConfig)->None:
+        """Connect a single server and record how it went"""
+
+        status=self.status[server.name]
+        timeout=server.timeout if server.timeout is not None else self.server_timeout
+        started=time.perf_counter()
+
+        if server.pool_size>0:
+            await self._start_pool(server,timeout)
+            return
+
+        if self.schema_cache or server.lazy:
+            connection=deferred_connection(server)
+            if connection is not None:
+                connection.on_activate=self._on_activate
+                status.state="deferred"
+                status.tool_count=len(connection.tool)
+                status.elapsed=time.perf_counter()-started
+                self.connections[server.name]=connection
+                return
+
+        try:
+            connection=await open_connection(server,timeout=timeout)
+        except asyncio.TimeoutError:
+            status.state="timeout"
+            status.error=f"not ready after {timeout}s"
+            return
+        except Exception as e:
+            status.state="failed"
+            status.error=str(e)
+            return
+        finally:
+            status.elapsed=time.perf_counter()-started
+
+        status.timings=dict(connection.timings)
+        status.tool_count=len(connection.tool)
+
+        if connection.connected:
+            status.state="connected"
+            self.connections[server.name]=connection
+            if self.schema_cache or server.lazy:
+                save_schemas(server,connection.tool)
+                connection.on_activate=self._on_activate
+            # placeholders survive reconnects, and for lazy servers the idle
+            # timer starts now, the reaper stops it if unused
+            defer_tools(connection)
+        else:
+            status.state="failed"
+            status.error="connection failed"
+
+    async def _start_pool(self,server:MCPServerConfig,timeout:float)->None:
+        """Fill a pooled server's pool and hand the agent its front connection"""
+
+        status=self.status[server.name]
+        started=time.perf_counter()
+        pool=ConnectionPool(server,size=server.pool_size,connect_timeout=timeout)
+        try:
+            await pool.start()
+            connection=await pooled_connection(pool)
+        except Exception as e:
+            await pool.close()
+            status.state="failed"
+            status.error=str(e)
+            return
+        except BaseException:
+            await pool.close()
+            raise
+        finally:
+            status.elapsed=time.perf_counter()-started
+
+        self._pools[server.name]=pool
+        status.state="connected"
+        status.timings=dict(connection.timings)
+        status.tool_count=len(connection.tool)
+        self.connections[server.name]=connection
+
+    def _on_activate(self,connection:MCPConnection)->None:
+        """Check a cached server's live tools when it comes up, see refresh_schemas"""
+
+        if refresh_schemas(connection):
+            status=self.status.get(connection.server.name)
+            if status is not None:
+                status.tool_count=len(connection.tool)
+            self._tool_index=None
+
+    def _on_state_change(self,name:str,old:str,new:str)->None:
+        status=self.status.get(name)
+        if status is None:
+            return
+        status.state={"open":"down","half_open":"recovering","closed":"connected"}[new]
+        if new=="open":
+            status.error=circuit_breaker(name).last_error
+
+    def available(self)->list[str]:
+        """Names of servers that are not known to be down"""
+
+        return [
+            name for name in self.connections
+            if circuit_breaker(name).state!="open"
+        ]
+
+    @property
+    def tool_index(self)->ToolIndex:
+        """Index over the tools of the current connections"""
+
+        if self._tool_index is None:
+            self._tool_index=ToolIndex(self.connections.values(),namespace=self.namespace_tools)
+        return self._tool_index
+
+    def get_tools(self,query:Optional[str]=None,top_k:int=8)->list[Any]:
+        """
+        Tools of every connected server, for the agent's toolset.
+
+        Args:
+            query:Only return the top_k tools most relevant to this text
+            top_k:Most tools returned for a query
+        Returns:
+            Tools under their exposed names, see ToolIndex
+        """
+
+        if query is None:
+            return self.tool_index.tools()
+        return [entry.tool for entry in self.tool_index.search(query,top_k)]
+
+    def toolset(self,top_k:int=8,pinned:tuple[str,...]=())->RankedToolset:
+        """
+        Agent toolset that declares only the top_k tools relevant to each turn.
+
+        Args:
+            top_k:Most tools declared per turn
+            pinned:Tools declared on every turn, e.g. ("batch",)
+        """
+
+        return RankedToolset(lambda:self.tool_index,top_k,pinned)
+
+    async def call(self,name:str,arguments:dict[str,Any],tool_context:Any=None)->Any:
+        """
+        Call a tool by the name the agent knows it under.
+
+        Raises:
+            KeyError: if no server has the tool, or the name is ambiguous
+        """
+
+        return await self.tool_index.call(name,arguments,tool_context)
+
+    async def _reap_idle(self)->None:
+        """Periodically shut down lazy servers that have gone idle"""
+
+        lazy=[server.idle_timeout for server in self.servers if server.lazy]
+        interval=min(max(min(lazy)/2,1.0),30.0)
+
+        while True:
+            await asyncio.sleep(interval)
+            for connection in list(self.connections.values()):
+                try:
+                    await reap_idle(connection)
+                except Exception as e:
+                    print(f"Error reaping {connection.server.name}: {e}")
+
+    async def stop(self)->None:
+        """Disconnect every connected server"""
+
+        if self._watcher:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher,return_exceptions=True)
+            self._watcher=None
+
+        tasks=[*self._monitors.values(),*self._retries.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks,return_exceptions=True)
+        self._monitors.clear()
+        self._retries.clear()
+
+        if self._reaper:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper=None
+
+        await asyncio.gather(
+            *(pool.close() for pool in self._pools.values()),
+            *(disconnect_server(connection) for connection in self.connections.values()),
+            return_exceptions=True
+        )
+        self._pools.clear()
+        self.connections.clear()
+        self._tool_index=None
+        if self._on_state_change in STATE_LISTENERS:
+            STATE_LISTENERS.remove(self._on_state_change)
+
+        if self._zygote is not None:
+            self._zygote.terminate()
+            await asyncio.to_thread(self._zygote.wait)
+            self._zygote=None
+
+        metrics_file=os.environ.get("MCP_METRICS_FILE")
+        if metrics_file:
+            METRICS.dump(metrics_file)
+
+    def print_report(self,total:float)->None:
+        """Print per server startup timings"""
+
+        print(f"MCP startup finished in {total*1000:.0f} ms")
+        for status in self.status.values():
+            phases=" ".join(f"{phase}={seconds*1000:.0f}ms" for phase,seconds in status.timings.items())
+            line=f"  {status.name}: {status.state} in {status.elapsed*1000:.0f} ms, {status.tool_count} tools"
+            if phases:
+                line+=f" ({phases})"
+            if status.error:
+                line+=f" - {status.error}"
+            print(line)
+
+
+async def main():
+    manager=MCPManager()
+    await manager.start()
+    print(f"{len(manager.get_tools())} tools available")
+    await manager.stop()
+
+if __name__=="__main__":
+    asyncio.run(main())
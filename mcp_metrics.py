@@ -0,0 +1,45 @@
+"""
+Mcp metrics - this file handles metrics and trace spans for the client
+
+this module handles:
+
+The process wide METRICS registry and trace spans of the client. They are
+implemented in mcp_servers/metrics.py, next to the servers that record
+into them too, so the servers never import client modules; the client
+uses them from here.
+
+Usage:
+    with METRICS.timer("mcp_client_tool_call",server="database") as timer:
+        result=await call()
+
+    METRICS.dump(os.environ["MCP_METRICS_FILE"])
+"""
+
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_servers.metrics import (
+    BUCKETS,
+    METRICS,
+    Metrics,
+    Series,
+    Span,
+    Timer,
+    current_traceparent,
+    span,
+    tracing_enabled
+)
+
+__all__=[
+    "BUCKETS",
+    "METRICS",
+    "Metrics",
+    "Series",
+    "Span",
+    "Timer",
+    "current_traceparent",
+    "span",
+    "tracing_enabled"
+]
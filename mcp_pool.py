@@ -0,0 +1,267 @@
+"""
+MCP Pool - keeps initialized mcp connections warm for reuse across agent sessions.
+
+this module handles:
+pre-spawning N connections per server config
+checking connections out and back in
+health checks on checkout
+evicting surplus connections that sat idle too long
+refilling the pool in the background
+
+Connections are opened with mcp_connect.open_connection, so a pooled
+subprocess is spawned and initialized once and then serves many sessions.
+
+MCPManager pools every server with pool_size set in mcp_config.yaml. The
+agent gets the tools of pooled_connection(pool), a front connection that
+holds no session: call_tool runs each of its calls on a connection
+checked out of the pool and returns it afterwards.
+
+"""
+
+import os
+import sys
+import time
+import asyncio
+from typing import Optional
+from collections import deque
+from contextlib import asynccontextmanager
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_connect import MCPServerConfig,MCPConnection,open_connection,disconnect_server,ping_server
+from mcp_schema_cache import CachedMcpTool,tool_schema
+
+
+class ConnectionPool:
+    """
+    Pool of warm connections to one mcp server.
+
+    The pool keeps `size` idle connections ready. A checkout takes the most
+    recently returned connection, pings it and falls back to the next one
+    (or a fresh connection) if it is dead. Connections above `size` that
+    stay idle for longer than `max_idle` seconds are closed, and a background
+    task tops the pool back up after checkouts and evictions, so sessions
+    never pay the spawn and initialize cost while the pool is warm.
+
+    """
+
+    def __init__(
+        self,
+        server:MCPServerConfig,
+        size:int=2,
+        max_idle:float=300.0,
+        connect_timeout:Optional[float]=None,
+        health_check:bool=True
+    ):
+        """
+        Args:
+            server:Server configuration to pool connections for
+            size:Number of idle connections to keep warm
+            max_idle:Seconds a surplus idle connection is kept before eviction
+            connect_timeout:Seconds a new connection may take, config/default if None
+            health_check:Ping connections on checkout
+        """
+
+        self.server=server
+        self.size=size
+        self.max_idle=max_idle
+        self.connect_timeout=connect_timeout if connect_timeout is not None else server.timeout
+        self.health_check=health_check
+
+        # (connection, returned_at), most recently returned on the right
+        self._idle:deque[tuple[MCPConnection,float]]=deque()
+        self._in_use:set[int]=set()
+        self._opening=0
+        self._wakeup=asyncio.Event()
+        self._maintainer:Optional[asyncio.Task]=None
+        self._closed=False
+
+    @property
+    def idle_count(self)->int:
+        return len(self._idle)
+
+    @property
+    def in_use_count(self)->int:
+        return len(self._in_use)
+
+    async def start(self)->None:
+        """Fill the pool and start the background maintainer"""
+
+        await asyncio.gather(*(self._add_connection() for _ in range(self.size)))
+        self._maintainer=asyncio.create_task(self._maintain(),name=f"mcp-pool:{self.server.name}")
+        print(f"Pool {self.server.name}: {self.idle_count}/{self.size} connections warm")
+
+    async def acquire(self)->MCPConnection:
+        """
+        Check a connection out of the pool.
+
+        Returns:
+            A connected MCPConnection, opened on the spot if the pool is empty
+        Raises:
+            RuntimeError: if the pool is closed or no connection can be opened
+
+        """
+
+        if self._closed:
+            raise RuntimeError(f"Pool {self.server.name} is closed")
+
+        try:
+            while self._idle:
+                connection,_=self._idle.pop()
+                if not self.health_check or await ping_server(connection):
+                    return self._check_out(connection)
+                print(f"Pool {self.server.name}: dropping dead connection")
+                asyncio.create_task(disconnect_server(connection))
+
+            # pool ran dry, pay the cold start on the request path this time
+            connection=await open_connection(self.server,timeout=self.connect_timeout)
+            if not connection.connected:
+                raise RuntimeError(f"Could not connect to {self.server.name}")
+            return self._check_out(connection)
+        finally:
+            self._wakeup.set()
+
+    async def release(self,connection:MCPConnection,broken:bool=False)->None:
+        """
+        Return a checked out connection to the pool.
+
+        Args:
+            connection:Connection obtained from acquire
+            broken:Set when the caller saw the connection fail, it is closed instead
+        """
+
+        self._in_use.discard(id(connection))
+
+        if self._closed or broken or not connection.connected:
+            await disconnect_server(connection)
+            self._wakeup.set()
+            return
+
+        self._idle.append((connection,time.monotonic()))
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection for the duration of a with block"""
+
+        connection=await self.acquire()
+        broken=False
+        try:
+            yield connection
+        except Exception:
+            broken=not await ping_server(connection)
+            raise
+        finally:
+            await self.release(connection,broken=broken)
+
+    async def close(self)->None:
+        """Stop the maintainer and disconnect every idle connection"""
+
+        self._closed=True
+        # wakes the maintainer up should wait_for swallow the cancellation
+        self._wakeup.set()
+        if self._maintainer:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+
+        idle=[connection for connection,_ in self._idle]
+        self._idle.clear()
+        await asyncio.gather(*(disconnect_server(c) for c in idle),return_exceptions=True)
+
+    def _check_out(self,connection:MCPConnection)->MCPConnection:
+        self._in_use.add(id(connection))
+        return connection
+
+    async def _add_connection(self)->None:
+        self._opening+=1
+        try:
+            connection=await open_connection(self.server,timeout=self.connect_timeout)
+        except Exception as e:
+            print(f"Pool {self.server.name}: could not open connection: {e}")
+            return
+        finally:
+            self._opening-=1
+
+        if not connection.connected:
+            return
+        if self._closed:
+            await disconnect_server(connection)
+            return
+        self._idle.appendleft((connection,time.monotonic()))
+
+    def _evict_idle(self)->list[MCPConnection]:
+        """Take surplus connections idle for longer than max_idle out of the pool"""
+
+        surplus=len(self._idle)-self.size
+        if surplus<=0:
+            return []
+
+        now=time.monotonic()
+        stale=[entry for entry in self._idle if now-entry[1]>self.max_idle][:surplus]
+        for entry in stale:
+            self._idle.remove(entry)
+        return [connection for connection,_ in stale]
+
+    async def _maintain(self)->None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),timeout=min(self.max_idle,30.0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            for connection in self._evict_idle():
+                await disconnect_server(connection)
+
+            missing=self.size-len(self._idle)-self._opening
+            if missing>0:
+                await asyncio.gather(*(self._add_connection() for _ in range(missing)))
+
+
+async def pooled_connection(pool:ConnectionPool)->MCPConnection:
+    """
+    Connection the agent uses for a pooled server.
+
+    It holds placeholder tools built from a pooled connection's tool list,
+    and call_tool runs its calls on connections checked out of the pool.
+
+    Args:
+        pool:Started pool
+    Returns:
+        The front MCPConnection, connected while the pool is open
+    Raises:
+        RuntimeError: as ConnectionPool.acquire
+    """
+
+    front=MCPConnection(server=pool.server,tool=[],connected=True,pool=pool)
+    async with pool.connection() as connection:
+        front.tool=[CachedMcpTool(tool_schema(tool),front) for tool in connection.remote.values()]
+        front.timings=dict(connection.timings)
+    return front
+
+
+async def create_pools(
+    servers:list[MCPServerConfig],
+    size:int=2,
+    max_idle:float=300.0
+)->dict[str,ConnectionPool]:
+    """
+    Start a warm pool for every enabled server.
+
+    Args:
+        servers:Server configurations, typically from discover_servers
+        size:Idle connections to keep per server
+        max_idle:Seconds a surplus idle connection is kept
+    Returns:
+        Pools keyed by server name
+
+    """
+
+    pools={
+        server.name:ConnectionPool(server,size=size,max_idle=max_idle)
+        for server in servers if server.enabled
+    }
+    await asyncio.gather(*(pool.start() for pool in pools.values()))
+    return pools
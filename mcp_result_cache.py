@@ -0,0 +1,172 @@
+"""
+Mcp result cache - this file handles caching the results of read-only
+tools on the client
+
+this module handles:
+
+serving repeated calls to cacheable tools without a server round trip
+TTL expiry and an LRU bound on the number of cached results
+dropping cached results when a mutating tool touches the same entity
+
+Servers opt tools in through the tool's _meta:
+
+    {"cache":{"ttl":60,"tags":["customer_id"]}}
+        results are cached for 60 s and tagged with the customer_id found
+        in the call arguments or at the top level of the result
+    {"invalidates":["customer_id"]}
+        after a successful call, every cached result of the same server
+        tagged with the same customer_id is dropped
+
+Cache keys are (server, tool, arguments). Set MCP_RESULT_CACHE_SIZE=0 to
+turn the cache off.
+"""
+
+import os
+import json
+import time
+from typing import Any,Optional
+from collections import OrderedDict
+
+DEFAULT_TTL=60.0
+
+CacheKey=tuple[str,str,str]
+Tag=tuple[str,str,str]
+
+
+def cache_key(server:str,tool:str,arguments:dict[str,Any])->CacheKey:
+    return (server,tool,json.dumps(arguments or {},sort_keys=True,separators=(",",":"),default=str))
+
+
+def entity_tags(server:str,fields:list[str],arguments:dict[str,Any],data:Any)->set[Tag]:
+    """(server, field, value) for every tag field set in the arguments or the result"""
+
+    tags=set()
+    for source in (arguments or {},data if isinstance(data,dict) else {}):
+        for name in fields:
+            value=source.get(name)
+            if isinstance(value,(str,int)) and not isinstance(value,bool):
+                tags.add((server,name,str(value)))
+    return tags
+
+
+class ResultCache:
+
+    def __init__(self,max_entries:int=1024):
+        """
+        Args:
+            max_entries:Results kept before the least recently used is evicted, 0 disables the cache
+        """
+
+        self.max_entries=max_entries
+        self._entries:OrderedDict[CacheKey,tuple[float,Any,set[Tag]]]=OrderedDict()
+        self._by_tag:dict[Tag,set[CacheKey]]={}
+        self.hits=0
+        self.misses=0
+        # bumped by every invalidation, a read that started before one may
+        # be stale and is not cached
+        self.generation=0
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def get(self,key:CacheKey)->Optional[Any]:
+        """Cached result, None on a miss or if it has expired"""
+
+        entry=self._entries.get(key)
+        if entry is None or entry[0]<time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses+=1
+            return None
+        self._entries.move_to_end(key)
+        self.hits+=1
+        return entry[1]
+
+    def put(self,key:CacheKey,value:Any,ttl:float=DEFAULT_TTL,tags:Optional[set[Tag]]=None)->None:
+        if self.max_entries<=0:
+            return
+        if key in self._entries:
+            self._drop(key)
+
+        tags=tags or set()
+        self._entries[key]=(time.monotonic()+ttl,value,tags)
+        for tag in tags:
+            self._by_tag.setdefault(tag,set()).add(key)
+
+        while len(self._entries)>self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self,tags:set[Tag])->int:
+        """Drop every result carrying one of the tags, returns how many were dropped"""
+
+        self.generation+=1
+        keys=set()
+        for tag in tags:
+            keys|=self._by_tag.get(tag,set())
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    def invalidate_server(self,server:str)->None:
+        self.generation+=1
+        for key in [key for key in self._entries if key[0]==server]:
+            self._drop(key)
+
+    def clear(self)->None:
+        self.generation+=1
+        self._entries.clear()
+        self._by_tag.clear()
+
+    def _drop(self,key:CacheKey)->None:
+        _,_,tags=self._entries.pop(key)
+        for tag in tags:
+            keys=self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def remember(
+        self,
+        server:str,
+        tool:str,
+        arguments:dict[str,Any],
+        meta:dict[str,Any],
+        result:Any,
+        data:Any,
+        generation:Optional[int]=None
+    )->None:
+        """
+        Apply a finished call's cache policy.
+
+        Args:
+            server:Server name
+            tool:Tool name
+            arguments:Call arguments
+            meta:The tool's _meta
+            result:Result to cache
+            data:Decoded result payload, for tags
+            generation:self.generation when the call was sent, the result
+                is not cached if something was invalidated since
+        """
+
+        if isinstance(data,dict) and (data.get("success") is False or "error" in data):
+            return
+
+        invalidates=meta.get("invalidates")
+        if invalidates:
+            self.invalidate(entity_tags(server,invalidates,arguments,data))
+
+        policy=meta.get("cache")
+        if policy and (generation is None or generation==self.generation):
+            self.put(
+                cache_key(server,tool,arguments),
+                result,
+                ttl=policy.get("ttl",DEFAULT_TTL),
+                tags=entity_tags(server,policy.get("tags",[]),arguments,data)
+            )
+
+
+# shared by every connection in the process, so pools and reconnects
+# reuse each other's results
+RESULT_CACHE=ResultCache(int(os.environ.get("MCP_RESULT_CACHE_SIZE","1024")))
@@ -0,0 +1,273 @@
+"""
+MCP Schema Cache - remembers the tool schemas each mcp server advertised.
+
+this module handles:
+fingerprinting a server config together with the server's source
+storing discovered tool schemas on disk
+building placeholder tools from the cache without spawning the server
+
+A cached server's tools are handed to the agent straight away; the real
+connection is made by mcp_connect.call_tool the first time one of them is
+used. The cache entry is ignored and rewritten as soon as the config or the
+server module changes, and when a connection is activated its live tool
+list is compared with the cached one (refresh_schemas), which also catches
+HTTP servers whose source cannot be fingerprinted.
+
+"""
+
+import os
+import sys
+import json
+import hashlib
+import importlib.util
+from typing import Any,Optional
+from pathlib import Path
+
+from google.adk.tools.base_tool import BaseTool
+from google.genai import types
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_connect import MCPServerConfig,MCPConnection,call_tool,raw_mcp_tool,tool_name
+
+DEFAULT_CACHE_PATH=Path(
+    os.environ.get("MCP_SCHEMA_CACHE",Path(__file__).parent/".mcp_cache"/"tool_schemas.json")
+)
+
+
+def _server_sources(server:MCPServerConfig)->list[Path]:
+    """Source files whose changes should invalidate a stdio server's tools"""
+
+    if server.type!="stdio":
+        return []
+
+    args=list(server.args)
+    if "-m" in args and args.index("-m")+1<len(args):
+        module=args[args.index("-m")+1]
+        try:
+            spec=importlib.util.find_spec(module)
+        except (ImportError,ValueError):
+            return []
+        if spec is None or not spec.origin or not spec.origin.endswith(".py"):
+            return []
+        origin=Path(spec.origin)
+        # helpers live next to the server module inside its package
+        return sorted(origin.parent.glob("*.py")) if "." in module else [origin]
+
+    return [Path(arg) for arg in args if arg.endswith(".py") and Path(arg).exists()]
+
+
+def server_fingerprint(server:MCPServerConfig)->str:
+    """
+    Cache key for a server's tool list.
+
+    Args:
+        server:Server configuration
+    Returns:
+        sha256 over the connection settings and the server's source files
+
+    """
+
+    digest=hashlib.sha256()
+    digest.update(json.dumps({
+        "type":server.type,
+        "command":server.command,
+        "args":list(server.args),
+        "env":dict(server.env),
+        "url":server.url
+    },sort_keys=True).encode())
+
+    for path in _server_sources(server):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()
+
+
+def tool_schema(tool:Any)->dict[str,Any]:
+    """
+    JSON serializable description of an ADK mcp tool.
+
+    Raises:
+        TypeError: if tool does not wrap an MCP tool, see raw_mcp_tool
+    """
+
+    mcp_tool=raw_mcp_tool(tool)
+    schema={
+        "name":tool_name(tool),
+        "description":mcp_tool.description or "",
+        "inputSchema":mcp_tool.inputSchema or {"type":"object","properties":{}}
+    }
+    if mcp_tool.annotations is not None:
+        schema["annotations"]=mcp_tool.annotations.model_dump(exclude_none=True)
+    # cache and invalidation policy, see mcp_result_cache
+    if mcp_tool.meta:
+        schema["meta"]=mcp_tool.meta
+    return schema
+
+
+def _read_cache(path:Path)->dict[str,Any]:
+    if not path.exists():
+        return {}
+    try:
+        with open(path,"r") as f:
+            return json.load(f)
+    except (OSError,ValueError) as e:
+        print(f"Ignoring unreadable schema cache {path}: {e}")
+        return {}
+
+
+def load_schemas(server:MCPServerConfig,path:Optional[Path]=None)->Optional[list[dict[str,Any]]]:
+    """
+    Cached tool schemas for a server.
+
+    Args:
+        server:Server configuration
+        path:Cache file, DEFAULT_CACHE_PATH if omitted
+    Returns:
+        Tool schemas, or None if nothing valid is cached
+
+    """
+
+    entry=_read_cache(path or DEFAULT_CACHE_PATH).get(server.name)
+    if not entry or entry.get("fingerprint")!=server_fingerprint(server):
+        return None
+    return entry.get("tools")
+
+
+def save_schemas(server:MCPServerConfig,tools:list[Any],path:Optional[Path]=None)->None:
+    """
+    Store the tool schemas of a live server.
+
+    Args:
+        server:Server configuration
+        tools:Tools discovered on the live connection
+        path:Cache file, DEFAULT_CACHE_PATH if omitted
+
+    """
+
+    path=path or DEFAULT_CACHE_PATH
+    cache=_read_cache(path)
+    cache[server.name]={
+        "fingerprint":server_fingerprint(server),
+        "tools":[tool_schema(tool) for tool in tools]
+    }
+
+    path.parent.mkdir(parents=True,exist_ok=True)
+    tmp=path.with_suffix(".tmp")
+    with open(tmp,"w") as f:
+        json.dump(cache,f,indent=2)
+    os.replace(tmp,path)
+
+
+def refresh_schemas(connection:MCPConnection,path:Optional[Path]=None)->bool:
+    """
+    Compare a freshly activated connection's tools with its placeholders.
+
+    When the server now advertises different tools, the cache entry is
+    rewritten and the connection gets new placeholders built from the live
+    tools.
+
+    Args:
+        connection:Connection that was just brought up
+        path:Cache file, DEFAULT_CACHE_PATH if omitted
+    Returns:
+        True if the tools had changed
+
+    """
+
+    live=[tool_schema(tool) for tool in connection.remote.values()]
+    cached=[tool.schema for tool in connection.tool if isinstance(tool,CachedMcpTool)]
+    if live==cached:
+        return False
+
+    print(f"Tools of {connection.server.name} changed since they were cached, refreshing")
+    save_schemas(connection.server,list(connection.remote.values()),path)
+    defer_tools(connection)
+    return True
+
+
+def _to_genai_schema(schema:dict[str,Any])->types.Schema:
+    """Convert a JSON schema from an mcp tool into a Gemini schema"""
+
+    kwargs:dict[str,Any]={}
+    if schema.get("type"):
+        kwargs["type"]=schema["type"].upper()
+    if schema.get("description"):
+        kwargs["description"]=schema["description"]
+    if schema.get("enum"):
+        kwargs["enum"]=[str(value) for value in schema["enum"]]
+    if schema.get("properties"):
+        kwargs["properties"]={key:_to_genai_schema(value) for key,value in schema["properties"].items()}
+    if schema.get("required"):
+        kwargs["required"]=list(schema["required"])
+    if isinstance(schema.get("items"),dict):
+        kwargs["items"]=_to_genai_schema(schema["items"])
+    return types.Schema(**kwargs)
+
+
+class CachedMcpTool(BaseTool):
+    """
+    Agent tool built from a cached schema.
+
+    Declares itself to the model from the cached schema and forwards calls
+    through mcp_connect.call_tool, which connects the server on first use.
+    The model may know it under another name (see mcp_tool_index), calls
+    always go to the server's own tool name.
+
+    """
+
+    def __init__(self,schema:dict[str,Any],connection:MCPConnection,name:Optional[str]=None):
+        super().__init__(name=name or schema["name"],description=schema.get("description",""))
+        self.schema=schema
+        self.connection=connection
+
+    def _get_declaration(self)->types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=_to_genai_schema(self.schema.get("inputSchema") or {})
+        )
+
+    async def run_async(self,*,args:dict[str,Any],tool_context:Any)->Any:
+        return await call_tool(self.connection,self.schema["name"],args,tool_context)
+
+
+def defer_tools(connection:MCPConnection)->MCPConnection:
+    """
+    Swap a live connection's tools for cache-backed placeholders.
+
+    The agent keeps using the placeholders across disconnects, and each call
+    reconnects the server if it was shut down in the meantime.
+
+    Args:
+        connection:Connected MCPConnection
+    Returns:
+        The same connection
+
+    """
+
+    connection.tool=[CachedMcpTool(tool_schema(tool),connection) for tool in connection.remote.values()]
+    return connection
+
+
+def deferred_connection(server:MCPServerConfig,path:Optional[Path]=None)->Optional[MCPConnection]:
+    """
+    Build a not yet connected MCPConnection whose tools come from the cache.
+
+    Args:
+        server:Server configuration
+        path:Cache file, DEFAULT_CACHE_PATH if omitted
+    Returns:
+        MCPConnection with placeholder tools, or None on a cache miss
+
+    """
+
+    schemas=load_schemas(server,path)
+    if schemas is None:
+        return None
+
+    connection=MCPConnection(server=server,tool=[],connected=False)
+    connection.tool=[CachedMcpTool(schema,connection) for schema in schemas]
+    print(f"Loaded {len(schemas)} cached tools for {server.name}")
+    return connection
@@ -0,0 +1,76 @@
+"""
+Batch tool shared by the mock servers.
+
+Runs a list of (tool, arguments) calls inside a single MCP tool call so a
+client pays JSON-RPC framing and stdio round trips once per batch instead
+of once per call.
+"""
+
+import asyncio
+from typing import Any,Awaitable,Callable
+
+MAX_BATCH_CALLS=100
+
+BATCH_INPUT_SCHEMA={
+    "type":"object",
+    "properties":{
+        "calls":{
+            "type":"array",
+            "description":f"Tool calls to run together (max {MAX_BATCH_CALLS})",
+            "items":{
+                "type":"object",
+                "properties":{
+                    "tool":{
+                        "type":"string",
+                        "description":"Tool name"
+                    },
+                    "arguments":{
+                        "type":"object",
+                        "description":"Arguments for the tool"
+                    }
+                },
+                "required":["tool"]
+            }
+        }
+    },
+    "required":["calls"]
+}
+
+
+async def run_batch(
+    calls:list[dict[str,Any]],
+    dispatch:Callable[[str,dict[str,Any]],Awaitable[dict[str,Any]]]
+)->dict[str,Any]:
+    """
+    Run tool calls concurrently and collect their results in order.
+
+    Args:
+        calls:[{"tool":name,"arguments":{...}}, ...]
+        dispatch:The server's tool dispatcher
+    Returns:
+        Batch envelope, one result or error entry per call
+    """
+
+    if len(calls)>MAX_BATCH_CALLS:
+        return {"success":False,"error":f"Batch of {len(calls)} calls exceeds the limit of {MAX_BATCH_CALLS}"}
+
+    async def run_one(call:dict[str,Any])->dict[str,Any]:
+        name=call.get("tool","") if isinstance(call,dict) else ""
+        try:
+            if not name:
+                raise ValueError("Missing tool name")
+            if name=="batch":
+                raise ValueError("Batches cannot be nested")
+            return {"tool":name,"ok":True,"result":await dispatch(name,call.get("arguments") or {})}
+        except KeyError as e:
+            return {"tool":name,"ok":False,"error":f"Missing argument: {e.args[0]}"}
+        except Exception as e:
+            return {"tool":name,"ok":False,"error":str(e)}
+
+    results=await asyncio.gather(*(run_one(call) for call in calls))
+    return {
+        "success":True,
+        "count":len(results),
+        "failed":sum(1 for r in results if not r["ok"]),
+        "results":results
+    }
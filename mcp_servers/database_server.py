@@ -2,13 +2,27 @@
 import random
 import os
 import asyncio
-import json
+import argparse
 from datetime import datetime,timedelta
 from typing import Any
 
+import numpy as np
+
 from mcp.server import Server
-from mcp.server.stdio import stdio_server
-from mcp.types import Tool,TextContent
+from mcp.types import Tool,ToolAnnotations
+
+from mcp_servers.batch import BATCH_INPUT_SCHEMA,run_batch
+from mcp_servers.serialization import tool_response
+from mcp_servers.db_store import CustomerStore,parse_shard
+from mcp_servers.order_file import OrderFile
+from mcp_servers.pagination import CursorError,Pagination,cursor_offset,offset_cursor,page_size,progress_reporter,take_page
+from mcp_servers.dataset import REFUNDS_FILE,load_store,scratch_path,seed_file,shard_refunds
+from mcp_servers.registry import ToolRegistry
+from mcp_servers.refund_ledger import RefundLedger
+from mcp_servers.transport import add_transport_args,serve
+from mcp_servers.metrics import request_traceparent,server_stats as stats_result,span
+
+# Seed data, loaded into the indexed STORE below
 Customers={
         "user@email.com": {
             "ID": "C001",
@@ -81,16 +95,104 @@ Orders= {
         ]
     }
 
-Refunds=[]
+# DB_SHARD=index/count keeps only that shard's customers, set by the
+# workers of the sharded server (database_shards)
+SHARD=parse_shard(os.environ.get("DB_SHARD",""))
+
+# MCP_DATASET (or --dataset) serves a generated dataset (dataset.py)
+# instead of the seed data above
+DATASET=os.environ.get("MCP_DATASET","")
+
+
+def open_ledger(path:str,seed:str="")->RefundLedger:
+    """
+    Refund ledger at path, or at its per shard variant on a shard worker.
+
+    Args:
+        path:Ledger log, kept in memory only if empty
+        seed:Dataset refunds a new ledger starts with, the seed file
+            itself is never written
+    """
+
+    if path and SHARD:
+        # one ledger per shard, refunds.jsonl -> refunds.shard2.jsonl
+        root,ext=os.path.splitext(path)
+        path=f"{root}.shard{SHARD[0]}{ext}"
+        if seed:
+            shard_refunds(seed,path,STORE)
+    elif path and seed:
+        seed_file(seed,path)
+    return RefundLedger(path,id_prefix=f"REF-S{SHARD[0]}" if SHARD else "REF")
+
+
+def use_dataset(path:str)->None:
+    """Serve the customers and orders of a dataset directory"""
+
+    global DATASET,STORE
+    DATASET=path
+    STORE=load_store(path,shard=SHARD)
+
+
+def open_refunds()->None:
+    """
+    Open the persistent refund ledger, called at server start.
+
+    Refunds survive restarts in an append-only log at REFUND_LEDGER_PATH,
+    set it to "" to keep them in memory only. A dataset's new refunds go
+    to a copy of its ledger, not the dataset.
+    """
+
+    global Refunds
+    if DATASET:
+        Refunds=open_ledger(
+            os.environ.get("REFUND_LEDGER_PATH",str(scratch_path(DATASET,REFUNDS_FILE))),
+            seed=os.path.join(DATASET,REFUNDS_FILE)
+        )
+    else:
+        Refunds=open_ledger(os.environ.get(
+            "REFUND_LEDGER_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),"data","refunds.jsonl")
+        ))
+
+
+if DATASET:
+    use_dataset(DATASET)
+else:
+    # ORDERS_PATH serves the orders of a columnar order file (order_file.py)
+    # instead of the seed orders; it is memory mapped, not loaded
+    orders_path=os.environ.get("ORDERS_PATH")
+    if orders_path:
+        STORE=CustomerStore.from_order_file(Customers,OrderFile(orders_path),shard=SHARD)
+    else:
+        STORE=CustomerStore.from_dicts(Customers,Orders,shard=SHARD)
+
+# in memory until open_refunds, importing the module writes nothing
+Refunds=open_ledger("")
 
 
 # Below are the database functions/Tools
 
+registry=ToolRegistry()
+
+# Clients cache reads of customer data (see mcp_result_cache) and drop them
+# when a refund touches the same customer
+READ_ONLY=ToolAnnotations(readOnlyHint=True)
+CUSTOMER_CACHE={"cache":{"ttl":300,"tags":["customer_id"]}}
 
+# list tools return a page at a time, pass next_cursor back for the next one
+MAX_PAGE_SIZE=1000
+DUPLICATES_PAGE=Pagination("duplicates","duplicates_count")
+
+@registry.tool(
+    description="Lookup a customer by email address. Returns customer profile including name, plan, and account status.",
+    params={"email":"Customer email address"},
+    annotations=READ_ONLY,
+    meta={"cache":{"ttl":300}}
+)
 def get_customer(email:str):
     """Look up a customer by email"""
     
-    Customer=Customers.get(email.lower())
+    Customer=STORE.find_by_email(email)
     if Customer:
         return {
             "success":True,
@@ -100,40 +202,63 @@ def get_customer(email:str):
             "success":False,
             "customer":f'Customer not found : {email}'
         }
-def get_orders(customer_id:str):
-    """Get order history for customer"""
     
-    orders=Orders.get(customer_id,[])
+@registry.tool(
+    description="Get order history for a customer by their customer ID. Returns a page of orders with date, amount, and status; pass next_cursor back for the next page.",
+    params={
+        "customer_id":{"description":"Customer ID","example":"C001"},
+        "cursor":"next_cursor from a previous call",
+        "limit":f"Orders per page (max {MAX_PAGE_SIZE})"
+    },
+    annotations=READ_ONLY,
+    meta=CUSTOMER_CACHE,
+    pagination=Pagination("orders","total_orders")
+)
+def get_orders(customer_id:str,cursor:str|None=None,limit:int=100):
+    """Get order history for customer, a page at a time"""
+    
+    try:
+        offset=cursor_offset("get_orders",cursor,customer_id)
+    except CursorError as e:
+        return {"success":False,"error":str(e)}
+    
+    orders,more=take_page(STORE.iter_orders(customer_id,offset),page_size(limit,MAX_PAGE_SIZE))
     return{
         "success":True,
         "customer_id":customer_id,
-        "total_orders":len(orders),
-        "orders":orders
+        "total_orders":STORE.order_count(customer_id),
+        "orders":orders,
+        "next_cursor":offset_cursor("get_orders",offset+len(orders),more,customer_id)
     }
     
-def find_duplicate_charges(customer_id:str):
-    orders=Orders.get(customer_id,[])
+@registry.tool(
+    description="Find duplicate charges for a customer. Identifies orders with the same amount on the same date. Returns totals and a page of duplicates; pass next_cursor back for the next page.",
+    params={
+        "customer_id":"Customer ID to check for duplicates",
+        "cursor":"next_cursor from a previous call",
+        "limit":f"Duplicates per page (max {MAX_PAGE_SIZE})"
+    },
+    annotations=READ_ONLY,
+    meta=CUSTOMER_CACHE,
+    pagination=DUPLICATES_PAGE
+)
+def find_duplicate_charges(customer_id:str,cursor:str|None=None,limit:int=100):
+    try:
+        offset=cursor_offset("find_duplicate_charges",cursor,customer_id)
+    except CursorError as e:
+        return {"success":False,"error":str(e)}
     
-    charges_by_date ={}
-    for order in orders:
-        key = f'{order["date"]}_{order["amount"]}'
-        if key not in charges_by_date:
-            charges_by_date[key]=[]
-        charges_by_date[key].append(order)
-        
-    duplicate=[]
+    duplicate=STORE.duplicate_charges(customer_id)
     
-    for key,group in charges_by_date.items():
-        if len(group)>1:
-            duplicate.extend(group[1:])
-            
     if duplicate:
+        page=duplicate[offset:offset+page_size(limit,MAX_PAGE_SIZE)]
         return{
             "success":True,
             "found_duplicates": True,
             "duplicates_count":len(duplicate),
-            "duplicates":duplicate,
-            "total_refund_amount":sum(d['amount'] for d in duplicate)
+            "duplicates":page,
+            "total_refund_amount":round(sum(d['Amount'] for d in duplicate),2),
+            "next_cursor":offset_cursor("find_duplicate_charges",offset+len(page),offset+len(page)<len(duplicate),customer_id)
         }
     return {
         "success":False,
@@ -141,15 +266,96 @@ def find_duplicate_charges(customer_id:str):
         "message":"No duplicate charges found"
     }
     
-def process_refund(order_id:str,amount:float,reason:str = "duplicate_charges"):
-    for refund in Refunds:
-        if refund['order_id']==order_id:
-            return{
-                "success":False,
-                "error":f"Order {order_id} has already been refunded"
+@registry.tool(
+    description="Scan all customers, or a list of customer IDs, for duplicate charges in one call. Returns totals and a page of duplicate orders; pass next_cursor back for the next page.",
+    params={
+        "customer_ids":"Customer IDs to check, all customers if omitted",
+        "cursor":"next_cursor from a previous call, takes precedence over offset",
+        "offset":"Index of the first duplicate to return",
+        "limit":f"Maximum duplicates to return (max {MAX_PAGE_SIZE})"
+    },
+    annotations=READ_ONLY,
+    pagination=DUPLICATES_PAGE
+)
+def find_all_duplicate_charges(customer_ids:list[str]|None=None,cursor:str|None=None,offset:int=0,limit:int=100):
+    """Scan every customer (or the given ones) for duplicate charges in one pass"""
+    
+    if cursor is not None:
+        try:
+            offset=cursor_offset("find_all_duplicate_charges",cursor)
+        except CursorError as e:
+            return {"success":False,"error":str(e)}
+    
+    columns=STORE.columns()
+    rows=columns.rows_for(customer_ids)
+    duplicate_rows=columns.duplicate_rows(rows)
+    
+    offset=max(offset,0)
+    limit=max(min(limit,MAX_PAGE_SIZE),0)
+    page=duplicate_rows[offset:offset+limit]
+    next_offset=offset+len(page)
+    
+    return {
+        "success":True,
+        "customers_scanned":columns.customer_count if customer_ids is None else columns.matched_customers(customer_ids),
+        "orders_scanned":len(rows),
+        "customers_with_duplicates":int(np.unique(columns.customer[duplicate_rows]).size),
+        "duplicates_count":len(duplicate_rows),
+        "total_refund_amount":int(columns.cents[duplicate_rows].sum())/100,
+        "offset":offset,
+        "next_offset":next_offset if next_offset<len(duplicate_rows) else None,
+        "next_cursor":offset_cursor("find_all_duplicate_charges",next_offset,len(page)>0 and next_offset<len(duplicate_rows)),
+        "duplicates":[
+            {"customer_id":columns.customer_ids[columns.customer[row]],**columns.orders[row]}
+            for row in page.tolist()
+        ]
+    }
+    
+@registry.tool(
+    description="Process a refund for a specific order. Creates a refund record and initiates the refund process.",
+    params={
+        "order_id":{"description":"Order ID to refund","example":"ORD-45231"},
+        "amount":"Amount to refund in dollars",
+        "reason":{"description":"Reason for the refund","example":"Duplicate charge"},
+        "idempotency_key":"Client chosen key; retrying with the same key returns the original refund instead of failing"
+    },
+    annotations=ToolAnnotations(readOnlyHint=False,destructiveHint=True,idempotentHint=True),
+    meta={"invalidates":["customer_id"]}
+)
+async def process_refund(order_id:str,amount:float,reason:str = "duplicate_charge",idempotency_key:str|None=None):
+    if idempotency_key:
+        refund=await Refunds.get_by_key(idempotency_key)
+        if refund is not None:
+            if refund["order_id"]!=order_id:
+                return{
+                    "success":False,
+                    "error":f"Idempotency key {idempotency_key} was already used for order {refund['order_id']}"
+                }
+            replay={"success":True}
+            # the ledger outlives a dataset change, the order may be gone
+            order=STORE.get_order(order_id)
+            if order is not None:
+                replay["customer_id"]=order[0]
+            return {
+                **replay,
+                "refund":refund,
+                "replayed":True,
+                "message":f"Refund of ${refund['amount']:.2f} already initiated for order {order_id}"
             }
+    
+    order=STORE.get_order(order_id)
+    if order is None:
+        return{
+            "success":False,
+            "error":f"Order {order_id} not found"
+        }
+    if Refunds.get_by_order(order_id) is not None:
+        return{
+            "success":False,
+            "error":f"Order {order_id} has already been refunded"
+        }
     refund={
-        "refund_id":f'REF-{random.randint(10000,99999)}',
+        "refund_id":Refunds.next_refund_id(),
         "order_id":order_id,
         "amount":amount,
         "reason":reason,
@@ -157,20 +363,26 @@ def process_refund(order_id:str,amount:float,reason:str = "duplicate_charges"):
         "process_at": datetime.now().isoformat(),
         "estimated_completion":(datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d")
     }
-    Refunds.append(refund)
+    if idempotency_key:
+        refund["idempotency_key"]=idempotency_key
+    await Refunds.record(refund)
     
     return {
         "success":True,
+        # lets clients drop cached data of the refunded customer
+        "customer_id":order[0],
         "refund":refund,
         "message":f"Refund of ${amount:.2f} initiated for order {order_id}"
     }
     
+@registry.tool(
+    description="Get subscription details for a customer including plan type, status, and next billing date.",
+    params={"customer_id":"Customer ID"},
+    annotations=READ_ONLY,
+    meta=CUSTOMER_CACHE
+)
 def get_subscription(customer_id:str):
-    customer=None
-    for email,data in Customers.items():
-        if data["id"]==customer_id:
-            customer=data
-            break
+    customer=STORE.get_customer(customer_id)
         
     if not customer:
         return {"success":False,"error":"Customer not found"}
@@ -178,138 +390,65 @@ def get_subscription(customer_id:str):
     return {
         "success":True,
         "customer_id":customer_id,
-        "plan":customer['plan'],
-        "status":customer['status'],
-        'member_since': customer['since'],
+        "plan":customer['Plan'],
+        "status":customer['Status'],
+        'member_since': customer['Since'],
         'nex_billing_date':(datetime.now()+timedelta(days=30)).strftime("%Y-%m-%d")
     }
     
     
+@registry.tool(
+    description="Call counts, error counts and latency percentiles for every database tool since the server started. format=prometheus returns Prometheus text instead.",
+    params={"format":"json (default) or prometheus"},
+    annotations=READ_ONLY
+)
+def server_stats(format:str="json")->dict:
+    return stats_result("mock-database-server",format)
+    
+    
+@registry.tool(
+    description="Run several database tool calls in one request. Results come back in order, with an error entry for each call that failed.",
+    input_schema=BATCH_INPUT_SCHEMA
+)
+async def batch(calls:list[dict]):
+    return await run_batch(calls,registry.dispatch)
+    
+    
     #setting up mcp server
     
 mcp_server=Server("mock-database-server")
 
 @mcp_server.list_tools()
 async def list_tools() -> list[Tool]:
-    return [
-        Tool(
-            name="get_customer",
-            description="Lookup a customer by email address. Returns customer profile including name, plan, and account status.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "email": {
-                        "type": "string",
-                        "description": "Customer email address"
-                    }
-                },
-                "required": ["email"]
-            }
-        ),
-        Tool(
-            name="get_orders",
-            description="Get order history for a customer by their customer ID. Returns list of all orders with date, amount, and status.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "Customer ID",
-                        "example": "C001"
-                    }
-                },
-                "required": ["customer_id"]
-            }
-        ),
-        Tool(
-            name="find_duplicate_charges",
-            description="Find duplicate charges for a customer. Identifies orders with the same amount on the same date.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "Customer ID to check for duplicates"
-                    }
-                },
-                "required": ["customer_id"]
-            }
-        ),
-        Tool(
-            name="process_refund",
-            description="Process a refund for a specific order. Creates a refund record and initiates the refund process.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "order_id": {
-                        "type": "string",
-                        "description": "Order ID to refund",
-                        "example": "ORD-45231"
-                    },
-                    "amount": {
-                        "type": "number",
-                        "description": "Amount to refund in dollars"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for the refund",
-                        "example": "Duplicate charge",
-                        "default": "Duplicate charge"
-                    }
-                },
-                "required": ["order_id", "amount"]
-            }
-        ),
-        Tool(
-            name="subscription_status",
-            description="Get subscription details for a customer including plan type, status, and next billing date.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "Customer ID"
-                    }
-                },
-                "required": ["customer_id"]
-            }
-        )
-    ]
+    return registry.list_tools()
 
-@mcp_server.call_tool()
-async def call_tool(name:str,arguments:dict[str,Any])->list[TextContent]:
-    """Handel Tool calls"""
+@mcp_server.call_tool(validate_input=False)
+async def call_tool(name:str,arguments:dict[str,Any])->Any:
+    """Handel Tool calls, arguments are validated by the registry"""
     
-    if name=="get_customer":
-        result=get_customer(arguments['email'])
-    elif name == "get_orders":
-        result=get_orders(arguments['customer_id'])
-    elif name == "find_duplicate_charges":
-        result=find_duplicate_charges(arguments['customer_id'])
-    elif name=='process_refund':
-        result=process_refund(
-            arguments['order_id'],
-            arguments['amount'],
-            arguments.get('reason','duplicate_charge')
-        )
-    elif name=="get_subscription":
-        result=get_subscription(arguments["customer_id"])
-    else:
-        result={'error':f'unkonwn tool : {name}'}
+    try:
+        with span("server call_tool",traceparent=request_traceparent(mcp_server),server="mock-database-server",tool=name):
+            result=await registry.dispatch(name,arguments,progress_reporter(mcp_server))
+    except ValueError as e:
+        result={'error':str(e)}
         
-    return [TextContent(type='text',text=json.dumps(result,indent=2))]
+    return tool_response(result)
 
 async def main():
-    """Run the mcp server over stdio"""
+    """Run the mcp server over stdio, or over HTTP for many clients at once"""
     
     import sys
-    print("starting Mock database MCP server (STDIO)",file=sys.stderr)
+    parser=argparse.ArgumentParser(description="Mock database MCP server")
+    parser.add_argument("--dataset",default=DATASET,help="dataset directory to serve (see mcp_servers.dataset)")
+    add_transport_args(parser,default_port=8001)
+    args=parser.parse_args()
+    
+    if args.dataset and args.dataset!=DATASET:
+        use_dataset(args.dataset)
+    open_refunds()
+    
+    print(f"starting Mock database MCP server ({args.transport.upper()})",file=sys.stderr)
+    await serve(mcp_server,args.transport,args.host,args.port)
     
-    async with stdio_server() as (read_stream,write_stream):
-        await mcp_server.run(
-            read_stream,
-            write_stream,
-            mcp_server.create_initialization_options()
-        )
 if __name__=='__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,449 @@
+"""
+Sharded mock database server.
+
+The plain database server keeps every customer in one single threaded
+process, so one core caps its throughput. Here customers are split by a
+CRC32 hash of their ID (db_store.shard_of) across N worker processes,
+each running the normal database tools on its own part of the data with
+its own refund ledger. A thin MCP front end advertises the same tools
+under the same server name and routes every call:
+
+get_orders, find_duplicate_charges, get_subscription
+    to the shard owning customer_id
+process_refund
+    to the shard owning order_id, found by asking every shard once and
+    remembered afterwards
+get_customer
+    to every shard, the first customer found wins
+find_all_duplicate_charges
+    to every shard, totals are summed and the page is cut from the shards
+    in shard order
+stream=true on a list tool
+    streamed by the front end, which asks the routed shard(s) for one
+    page after the other (see pagination.py)
+batch
+    run in the front end, each call routed on its own
+server_stats
+    front end routing stats plus every shard's own
+
+Workers talk to the front end over a socket pair, one pickled frame per
+request and reply, and answer requests concurrently. Refund IDs carry the
+shard (REF-S2-00001); idempotency keys are checked by the shard owning
+the order.
+
+    python -m mcp_servers.database_shards --shards 4 [--transport http --port 8001]
+"""
+
+import os
+import sys
+import pickle
+import socket
+import struct
+import asyncio
+import argparse
+import itertools
+import multiprocessing
+from typing import Any,Optional
+
+from mcp.server import Server
+from mcp.types import Tool
+
+from mcp_servers.batch import run_batch
+from mcp_servers.db_store import shard_of
+from mcp_servers.pagination import Pagination,cursor_offset,offset_cursor,progress_reporter,stream_pages
+from mcp_servers.registry import ToolArgumentError
+from mcp_servers.serialization import tool_response
+from mcp_servers.transport import add_transport_args,serve
+from mcp_servers.metrics import METRICS,request_traceparent,server_stats as stats_result,span
+
+SERVER_NAME="mock-database-server"
+
+# tools routed by their customer_id argument
+BY_CUSTOMER=("get_orders","find_duplicate_charges","get_subscription")
+
+_HEADER=struct.Struct("!I")
+
+
+def _frame(message:Any)->bytes:
+    data=pickle.dumps(message,protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(data))+data
+
+
+async def _read_frame(reader:asyncio.StreamReader)->Any:
+    """Next message, raises asyncio.IncompleteReadError once the peer is gone"""
+
+    size=_HEADER.unpack(await reader.readexactly(_HEADER.size))[0]
+    return pickle.loads(await reader.readexactly(size))
+
+
+def _socket(connection:Any)->socket.socket:
+    """Socket of a multiprocessing Pipe end, which is a socketpair on Unix"""
+
+    sock=socket.socket(fileno=os.dup(connection.fileno()))
+    connection.close()
+    sock.setblocking(False)
+    return sock
+
+
+def _worker_main(index:int,count:int,connection:Any)->None:
+    """Entry point of a shard worker process"""
+
+    os.environ["DB_SHARD"]=f"{index}/{count}"
+    # over stdio the front end's stdout is the MCP stream, keep prints off it
+    os.dup2(2,1)
+    try:
+        asyncio.run(_serve_shard(_socket(connection)))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve_shard(sock:socket.socket)->None:
+    """Answer front end requests until it hangs up"""
+
+    # imported here so the store is built for this worker's DB_SHARD
+    from mcp_servers import database_server as db
+    db.open_refunds()
+
+    reader,writer=await asyncio.open_connection(sock=sock)
+    running=set()
+
+    async def handle(request_id:int,op:str,payload:Any)->None:
+        try:
+            if op=="call":
+                result=await db.registry.dispatch(*payload)
+            elif op=="owns_order":
+                result=db.STORE.get_order(payload) is not None
+            elif op=="list_tools":
+                result=db.registry.list_tools()
+            else:
+                raise ValueError(f"Unknown shard request: {op}")
+            reply=(request_id,None,result)
+        except Exception as e:
+            # argument errors go back to the client, anything else is a bug
+            reply=(request_id,("value" if isinstance(e,ValueError) else "error",str(e)),None)
+        writer.write(_frame(reply))
+
+    while True:
+        try:
+            request=await _read_frame(reader)
+        except (asyncio.IncompleteReadError,ConnectionError):
+            break
+        task=asyncio.create_task(handle(*request))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    if running:
+        await asyncio.gather(*running,return_exceptions=True)
+    writer.close()
+
+
+class Shard:
+    """Front end side of one worker process"""
+
+    def __init__(self,index:int,process:Any,reader:asyncio.StreamReader,writer:asyncio.StreamWriter):
+        self.index=index
+        self.process=process
+        self.reader=reader
+        self.writer=writer
+        self._ids=itertools.count()
+        self._pending:dict[int,asyncio.Future]={}
+        self._reader_task=asyncio.create_task(self._read_replies(),name=f"db-shard-{index}")
+
+    async def request(self,op:str,payload:Any=None)->Any:
+        """
+        Send a request to the worker and wait for its reply.
+
+        Raises:
+            ToolArgumentError: for invalid tool arguments
+            ConnectionError: if the worker is gone
+        """
+
+        if self._reader_task.done():
+            raise ConnectionError(f"Database shard {self.index} is not running")
+
+        request_id=next(self._ids)
+        future=asyncio.get_running_loop().create_future()
+        self._pending[request_id]=future
+        self.writer.write(_frame((request_id,op,payload)))
+        try:
+            await self.writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id,None)
+
+    async def call(self,name:str,arguments:dict[str,Any])->Any:
+        return await self.request("call",(name,arguments))
+
+    async def _read_replies(self)->None:
+        try:
+            while True:
+                request_id,error,result=await _read_frame(self.reader)
+                future=self._pending.get(request_id)
+                if future is None or future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                elif error[0]=="value":
+                    future.set_exception(ToolArgumentError(error[1]))
+                else:
+                    future.set_exception(RuntimeError(f"Database shard {self.index}: {error[1]}"))
+        except (asyncio.IncompleteReadError,ConnectionError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Database shard {self.index} exited"))
+
+    async def close(self)->None:
+        # half close: the worker answers what is in flight, then hangs up
+        if self.writer.can_write_eof():
+            self.writer.write_eof()
+        await asyncio.gather(self._reader_task,return_exceptions=True)
+        self.writer.close()
+        await asyncio.to_thread(self.process.join,10)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShardedDatabase:
+    """Worker processes holding the database shards, and the routing between them"""
+
+    def __init__(self,shards:int):
+        """
+        Args:
+            shards:Number of worker processes
+        """
+
+        if shards<1:
+            raise ValueError("At least one shard is required")
+        self.count=shards
+        self.shards:list[Shard]=[]
+        self.tools:list[Tool]=[]
+        # list tools by name, the front end streams their pages itself
+        self.pagination:dict[str,Pagination]={}
+        # order ID -> owning shard, orders never move between shards
+        self._order_shard:dict[str,Shard]={}
+
+    async def start(self)->None:
+        """Start the workers and load the tool definitions"""
+
+        # spawn, not fork: the front end is already running an event loop
+        context=multiprocessing.get_context("spawn")
+        for index in range(self.count):
+            parent,child=context.Pipe()
+            process=context.Process(
+                target=_worker_main,
+                args=(index,self.count,child),
+                name=f"db-shard-{index}",
+                daemon=True
+            )
+            process.start()
+            child.close()
+            reader,writer=await asyncio.open_connection(sock=_socket(parent))
+            self.shards.append(Shard(index,process,reader,writer))
+
+        tools=await asyncio.gather(*(shard.request("list_tools") for shard in self.shards))
+        self.tools=tools[0]
+        self.pagination={
+            tool.name:pagination for tool in self.tools
+            if (pagination:=Pagination.from_meta(tool.meta)) is not None
+        }
+        print(f"Started {self.count} database shards",file=sys.stderr)
+
+    async def stop(self)->None:
+        await asyncio.gather(*(shard.close() for shard in self.shards),return_exceptions=True)
+        self.shards=[]
+
+    def shard_for(self,customer_id:str)->Shard:
+        return self.shards[shard_of(customer_id,self.count)]
+
+    async def dispatch(self,name:str,arguments:dict[str,Any])->Any:
+        """
+        Route a tool call to the shard(s) that hold its data.
+
+        Raises:
+            ToolArgumentError: for unknown tools and invalid arguments
+        """
+
+        arguments=arguments or {}
+        with METRICS.timer("mcp_shard_route",tool=name),span(f"route {name}",tool=name):
+            if name in BY_CUSTOMER:
+                customer_id=arguments.get("customer_id")
+                # a shard reports the argument error for a missing ID
+                shard=self.shard_for(customer_id) if isinstance(customer_id,str) else self.shards[0]
+                return await shard.call(name,arguments)
+
+            if name=="get_customer":
+                results=await asyncio.gather(*(shard.call(name,arguments) for shard in self.shards))
+                return next((result for result in results if result.get("success")),results[0])
+
+            if name=="find_all_duplicate_charges":
+                return await self._all_duplicate_charges(arguments)
+
+            if name=="process_refund":
+                shard=await self._order_owner(arguments.get("order_id"))
+                return await shard.call(name,arguments)
+
+            if name=="batch":
+                calls=arguments.get("calls")
+                if not isinstance(calls,list):
+                    raise ToolArgumentError("batch: argument calls must be of type array")
+                return await run_batch(calls,self.dispatch)
+
+            if name=="server_stats":
+                stats=await asyncio.gather(*(shard.call(name,arguments) for shard in self.shards))
+                result=stats_result(SERVER_NAME,arguments.get("format","json"))
+                if result.get("success"):
+                    result["shards"]=stats
+                return result
+
+        raise ToolArgumentError(f"Unknown tool: {name}")
+
+    async def _order_owner(self,order_id:Any)->Shard:
+        """Shard holding an order, the first shard if no shard has it"""
+
+        shard=self._order_shard.get(order_id) if isinstance(order_id,str) else None
+        if shard is not None:
+            return shard
+        if not isinstance(order_id,str):
+            return self.shards[0]
+
+        owns=await asyncio.gather(*(shard.request("owns_order",order_id) for shard in self.shards))
+        for shard,owner in zip(self.shards,owns):
+            if owner:
+                self._order_shard[order_id]=shard
+                return shard
+        return self.shards[0]
+
+    async def _all_duplicate_charges(self,arguments:dict[str,Any])->dict[str,Any]:
+        """
+        Fleet scan across every shard.
+
+        A first round gets each shard's totals with an empty page, then only
+        the shards overlapping [offset, offset+limit) are asked for rows.
+        """
+
+        name="find_all_duplicate_charges"
+        customer_ids=arguments.get("customer_ids")
+        offset=arguments.get("offset",0)
+        limit=arguments.get("limit",100)
+        cursor=arguments.get("cursor")
+        if cursor is not None:
+            if not isinstance(cursor,str):
+                raise ToolArgumentError(f"{name}: argument cursor must be of type string")
+            # cursors are offsets into the shard ordered page, see below
+            offset=cursor_offset(name,cursor)
+        for param,value in (("offset",offset),("limit",limit)):
+            if not isinstance(value,int) or isinstance(value,bool):
+                raise ToolArgumentError(f"{name}: argument {param} must be of type integer")
+        offset=max(offset,0)
+        limit=max(min(limit,1000),0)
+
+        subsets:list[Optional[list]]=[None]*self.count
+        if customer_ids is not None:
+            if not isinstance(customer_ids,list):
+                raise ToolArgumentError(f"{name}: argument customer_ids must be of type array")
+            subsets=[[] for _ in range(self.count)]
+            for customer_id in customer_ids:
+                if isinstance(customer_id,str):
+                    subsets[shard_of(customer_id,self.count)].append(customer_id)
+
+        totals=await asyncio.gather(*(
+            shard.call(name,{"customer_ids":subset,"offset":0,"limit":0})
+            for shard,subset in zip(self.shards,subsets)
+        ))
+        failed=next((total for total in totals if not total.get("success")),None)
+        if failed is not None:
+            return failed
+
+        # slice of the page each shard provides, in shard order
+        pages=[]
+        start=0
+        for shard,subset,total in zip(self.shards,subsets,totals):
+            count=total["duplicates_count"]
+            first=max(offset-start,0)
+            last=min(offset+limit-start,count)
+            if first<last:
+                pages.append(shard.call(name,{"customer_ids":subset,"offset":first,"limit":last-first}))
+            start+=count
+
+        duplicates=[]
+        for page in await asyncio.gather(*pages):
+            duplicates.extend(page["duplicates"])
+
+        duplicates_count=sum(total["duplicates_count"] for total in totals)
+        next_offset=offset+len(duplicates)
+        return {
+            "success":True,
+            "customers_scanned":sum(total["customers_scanned"] for total in totals),
+            "orders_scanned":sum(total["orders_scanned"] for total in totals),
+            "customers_with_duplicates":sum(total["customers_with_duplicates"] for total in totals),
+            "duplicates_count":duplicates_count,
+            "total_refund_amount":round(sum(total["total_refund_amount"] for total in totals),2),
+            "offset":offset,
+            "next_offset":next_offset if next_offset<duplicates_count else None,
+            "next_cursor":offset_cursor(name,next_offset,len(duplicates)>0 and next_offset<duplicates_count),
+            "duplicates":duplicates
+        }
+
+
+# started by main(), list_tools and call_tool use it
+DATABASE:Optional[ShardedDatabase]=None
+
+mcp_server=Server(SERVER_NAME)
+
+@mcp_server.list_tools()
+async def list_tools()->list[Tool]:
+    return DATABASE.tools
+
+@mcp_server.call_tool(validate_input=False)
+async def call_tool(name:str,arguments:dict[str,Any])->Any:
+    """Route tool calls to the shards, arguments are validated by the shard registries"""
+
+    try:
+        with span("server call_tool",traceparent=request_traceparent(mcp_server),server=SERVER_NAME,tool=name):
+            pagination=DATABASE.pagination.get(name)
+            progress=progress_reporter(mcp_server) if pagination and (arguments or {}).get("stream") is True else None
+            if progress is not None:
+                arguments={key:value for key,value in arguments.items() if key!="stream"}
+
+                async def fetch(cursor:Optional[str])->Any:
+                    return await DATABASE.dispatch(name,{**arguments,"cursor":cursor})
+                result=await stream_pages(fetch,pagination,progress,arguments.get("cursor"))
+            else:
+                result=await DATABASE.dispatch(name,arguments)
+    except (ValueError,ConnectionError) as e:
+        result={'error':str(e)}
+
+    return tool_response(result)
+
+async def main():
+    """Start the shards, then serve the front end over stdio or HTTP"""
+
+    global DATABASE
+
+    parser=argparse.ArgumentParser(description="Sharded mock database MCP server")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=int(os.environ.get("DB_SHARDS",os.cpu_count() or 1)),
+        help="worker processes, one per core by default"
+    )
+    parser.add_argument("--dataset",default=os.environ.get("MCP_DATASET",""),help="dataset directory to serve (see mcp_servers.dataset)")
+    add_transport_args(parser,default_port=8001)
+    args=parser.parse_args()
+
+    if args.dataset:
+        # the workers map the dataset's order file and split its refunds
+        os.environ["MCP_DATASET"]=args.dataset
+
+    print(f"starting sharded Mock database MCP server ({args.transport.upper()}, {args.shards} shards)",file=sys.stderr)
+    DATABASE=ShardedDatabase(args.shards)
+    await DATABASE.start()
+    try:
+        await serve(mcp_server,args.transport,args.host,args.port)
+    finally:
+        await DATABASE.stop()
+
+if __name__=='__main__':
+    asyncio.run(main())
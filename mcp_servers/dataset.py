@@ -0,0 +1,452 @@
+"""
+Synthetic datasets for the mock servers, and the loaders that serve them.
+
+generate writes a dataset directory of any size from a fixed seed, in
+the shapes the servers use:
+
+customers.jsonl       one customer per line (ID, Name, Email, Plan, Since, Status)
+orders.bin            monthly plan charges as an order file (order_file.py);
+                      duplicate_rate of them are charged twice on the same day
+refunds.jsonl         refund ledger (refund_ledger.py) refunding refund_rate
+                      of the duplicate charges
+email_history.jsonl   email history spill file (email_history.py) of
+                      password resets, refund confirmations and tickets
+manifest.json         seed, parameters and row counts
+
+Everything is generated in vectorized blocks of customers and streamed to
+disk, so memory stays bounded apart from the order file's final sort.
+
+Both servers take --dataset DIR (or MCP_DATASET=DIR) to serve a dataset
+instead of their seed data. Orders are memory mapped, refunds and email
+history are replayed by their usual loaders, sharded database workers
+each get the refunds of their own orders. A dataset is only read, the
+refunds and emails the servers write go to copies of its files under
+mcp_servers/data/datasets (see scratch_path).
+
+    python -m mcp_servers.dataset generate data/large --customers 1000000 --duplicate-rate 0.02
+    python -m mcp_servers.dataset load-orders orders.jsonl data/large/orders.bin
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import time
+import argparse
+from typing import Any,Iterator,Optional
+from pathlib import Path
+from datetime import date,datetime,timedelta
+
+import numpy as np
+
+from mcp_servers.db_store import CustomerStore
+from mcp_servers.order_file import OrderFile,OrderFileWriter
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+CUSTOMERS_FILE="customers.jsonl"
+ORDERS_FILE="orders.bin"
+REFUNDS_FILE="refunds.jsonl"
+EMAIL_HISTORY_FILE="email_history.jsonl"
+MANIFEST_FILE="manifest.json"
+
+# plan -> (monthly price, order item, customer status)
+PLANS={
+    "Basic":(9.99,"Basic Monthly","Active"),
+    "Premium":(29.99,"Premium Monthly","Active"),
+    "Trial":(0.00,"Free Trial","Trial"),
+}
+PLAN_WEIGHTS=(0.55,0.30,0.15)
+
+FIRST_NAMES=("John","Jane","Alex","Maria","Wei","Priya","Omar","Sofia","Liam","Aiko","Noah","Fatima","Lucas","Olga","Mateo","Zara")
+LAST_NAMES=("Doe","Smith","Garcia","Chen","Patel","Khan","Rossi","Muller","Silva","Tanaka","Brown","Ivanova","Nguyen","Kim","Haddad","Novak")
+
+ISSUE_TYPES=("billing","technical","account","refund")
+
+EPOCH=date(1970,1,1)
+
+
+def _dumps(record:dict[str,Any])->bytes:
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record,separators=(",",":")).encode()
+
+
+def _loads(line:bytes)->Any:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _width(count:int)->int:
+    """Zero padding of generated IDs, at least 3 digits like the seed data (C001)"""
+    return max(3,len(str(max(count,1))))
+
+
+def _date(day:int)->str:
+    return (EPOCH+timedelta(days=int(day))).isoformat()
+
+
+def generate(
+    path:str|Path,
+    customers:int=1000,
+    orders_per_customer:float=6.0,
+    duplicate_rate:float=0.02,
+    refund_rate:float=0.5,
+    emails_per_customer:float=2.0,
+    seed:int=42,
+    start:str="2024-01-01",
+    block:int=100_000
+)->dict[str,Any]:
+    """
+    Write a synthetic dataset.
+
+    Args:
+        path:Dataset directory, created if needed
+        customers:Number of customers
+        orders_per_customer:Mean monthly charges per customer (Poisson)
+        duplicate_rate:Fraction of charges that are charged a second time
+        refund_rate:Fraction of duplicate charges already refunded
+        emails_per_customer:Mean emails per customer (Poisson)
+        seed:RNG seed, the same seed and parameters give the same dataset
+        start:Earliest signup date
+        block:Customers generated per vectorized block
+    Returns:
+        The manifest
+    """
+
+    started=time.perf_counter()
+    path=Path(path)
+    path.mkdir(parents=True,exist_ok=True)
+    rng=np.random.default_rng(seed)
+
+    plans=list(PLANS)
+    start_day=(date.fromisoformat(start)-EPOCH).days
+    customer_width=_width(customers)
+    # orders are numbered as they are generated, the total is not known up front
+    order_width=_width(int(customers*orders_per_customer*(1+duplicate_rate)*2))
+
+    writer=OrderFileWriter(path/ORDERS_FILE)
+    status_code=writer.string_code("Completed")
+    item_codes=np.array([writer.string_code(PLANS[plan][1]) for plan in plans],dtype=np.int32)
+    prices=np.array([round(PLANS[plan][0]*100) for plan in plans],dtype=np.int64)
+
+    counts={"customers":0,"orders":0,"duplicates":0,"refunds":0,"emails":0}
+    next_order=1
+    history=_HistoryWriter(path/EMAIL_HISTORY_FILE)
+
+    with open(path/CUSTOMERS_FILE,"wb") as customers_file,open(path/REFUNDS_FILE,"wb") as refunds_file:
+        for first in range(0,customers,block):
+            size=min(block,customers-first)
+            ids=np.arange(first+1,first+size+1)
+            plan=rng.choice(len(plans),size=size,p=PLAN_WEIGHTS)
+            since=start_day+rng.integers(0,365,size=size)
+            first_name=rng.integers(0,len(FIRST_NAMES),size=size)
+            last_name=rng.integers(0,len(LAST_NAMES),size=size)
+            cancelled=rng.random(size)<0.05
+
+            customer_ids=[f"C{i:0{customer_width}d}" for i in ids.tolist()]
+            emails=[
+                f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{i}@example.com"
+                for f,l,i in zip(first_name.tolist(),last_name.tolist(),ids.tolist())
+            ]
+            for k,customer_id in enumerate(customer_ids):
+                name=plans[plan[k]]
+                customers_file.write(_dumps({
+                    "ID":customer_id,
+                    "Name":f"{FIRST_NAMES[first_name[k]]} {LAST_NAMES[last_name[k]]}",
+                    "Email":emails[k],
+                    "Plan":name,
+                    "Since":_date(since[k]),
+                    "Status":"Cancelled" if cancelled[k] else PLANS[name][2]
+                })+b"\n")
+
+            # monthly charges from the signup date, then duplicates right
+            # after the charge they repeat
+            per_customer=rng.poisson(orders_per_customer,size=size)
+            owner=np.repeat(np.arange(size),per_customer)
+            month=np.arange(len(owner))-np.repeat(np.cumsum(per_customer)-per_customer,per_customer)
+            # free plans are never charged, so never charged twice
+            duplicated=(rng.random(len(owner))<duplicate_rate)&(prices[plan[owner]]>0)
+            rows=np.repeat(np.arange(len(owner)),1+duplicated)
+            is_duplicate=np.zeros(len(rows),dtype=bool)
+            is_duplicate[1:]=rows[1:]==rows[:-1]
+            owner=owner[rows]
+            day=(since[owner]+30*month[rows]).astype(np.int32)
+            cents=prices[plan[owner]]
+
+            order_numbers=np.arange(next_order,next_order+len(rows))
+            next_order+=len(rows)
+            order_ids=np.array([f"ORD-{n:0{order_width}d}".encode() for n in order_numbers.tolist()],dtype="S")
+            keys=np.array([c.encode() for c in customer_ids],dtype="S")
+            writer.add_columns(
+                keys[owner],
+                order_ids,
+                day,
+                cents,
+                status=np.full(len(rows),status_code,dtype=np.int32),
+                item=item_codes[plan[owner]]
+            )
+
+            refunded=is_duplicate&(rng.random(len(rows))<refund_rate)
+            refunds=[]
+            for row in np.flatnonzero(refunded).tolist():
+                counts["refunds"]+=1
+                processed=datetime.combine(EPOCH+timedelta(days=int(day[row])+1),datetime.min.time())
+                refund={
+                    "refund_id":f"REF-{counts['refunds']:05d}",
+                    "order_id":order_ids[row].decode(),
+                    "amount":int(cents[row])/100,
+                    "reason":"duplicate_charge",
+                    "status":"completed",
+                    "process_at":processed.isoformat(),
+                    "estimated_completion":(processed+timedelta(days=3)).strftime("%Y-%m-%d")
+                }
+                refunds_file.write(_dumps(refund)+b"\n")
+                refunds.append((owner[row],refund))
+
+            history.add_block(rng,emails,since,refunds,emails_per_customer)
+
+            counts["customers"]+=size
+            counts["orders"]+=len(rows)
+            counts["duplicates"]+=int(is_duplicate.sum())
+
+    counts["orders"]=writer.close()
+    counts["emails"]=history.close()
+
+    manifest={
+        "generator":"mcp_servers.dataset",
+        "seed":seed,
+        "parameters":{
+            "customers":customers,
+            "orders_per_customer":orders_per_customer,
+            "duplicate_rate":duplicate_rate,
+            "refund_rate":refund_rate,
+            "emails_per_customer":emails_per_customer,
+            "start":start
+        },
+        "counts":counts,
+        "seconds":round(time.perf_counter()-started,3)
+    }
+    with open(path/MANIFEST_FILE,"w") as f:
+        json.dump(manifest,f,indent=2)
+    return manifest
+
+
+class _HistoryWriter:
+    """Writes email records in the EmailHistory spill format, chained per recipient"""
+
+    def __init__(self,path:Path):
+        self.file=open(path,"wb")
+        self.offset=0
+        self.count=0
+        self.sequence=0
+        self.tickets=0
+
+    def _write(self,position:int,previous:Optional[list[int]],record:dict[str,Any])->list[int]:
+        line=_dumps({"n":position,"prev":previous,"record":record})+b"\n"
+        self.file.write(line)
+        pointer=[self.offset,len(line)]
+        self.offset+=len(line)
+        self.count+=1
+        return pointer
+
+    def add_block(
+        self,
+        rng:np.random.Generator,
+        emails:list[str],
+        since:np.ndarray,
+        refunds:list[tuple[int,dict[str,Any]]],
+        per_customer:float
+    )->None:
+        counts=rng.poisson(per_customer,size=len(emails))
+        kinds=rng.integers(0,2,size=int(counts.sum()))
+        offsets=rng.integers(0,365,size=int(counts.sum()))
+        refunds_of:dict[int,list[dict[str,Any]]]={}
+        for customer,refund in refunds:
+            refunds_of.setdefault(int(customer),[]).append(refund)
+
+        k=0
+        for customer,(email,count) in enumerate(zip(emails,counts.tolist())):
+            messages=[]
+            for _ in range(count):
+                sent=EPOCH+timedelta(days=int(since[customer]+offsets[k]))
+                messages.append((sent.isoformat(),self._message(email,int(kinds[k]),sent)))
+                k+=1
+            for refund in refunds_of.get(customer,()):
+                messages.append((refund["process_at"],{
+                    "to":email,
+                    "subject":f"Refund Processed - {refund['refund_id']}",
+                    "body":f"Your refund of ${refund['amount']:.2f} for order {refund['order_id']} has been processed.",
+                    "type":"refund_confirmation",
+                    "refund_id":refund["refund_id"],
+                    "order_id":refund["order_id"]
+                }))
+
+            # oldest first, each line points at the recipient's previous one
+            previous=None
+            for position,(sent_at,message) in enumerate(sorted(messages,key=lambda m:m[0])):
+                self.sequence+=1
+                previous=self._write(position,previous,{
+                    "email_id":f"EMAIL-{self.sequence:012X}",
+                    **message,
+                    "sent_at":sent_at if "T" in sent_at else f"{sent_at}T09:00:00",
+                    "status":"sent"
+                })
+
+    def _message(self,email:str,kind:int,sent:date)->dict[str,Any]:
+        if kind==0:
+            return {
+                "to":email,
+                "subject":"Password Reset Request",
+                "body":"Click the link to reset your password. The link expires in 1 hour.",
+                "type":"password_reset"
+            }
+        self.tickets+=1
+        ticket=f"T-{self.tickets}"
+        issue=ISSUE_TYPES[self.tickets%len(ISSUE_TYPES)]
+        return {
+            "to":email,
+            "subject":f"Support Ticket Created - {ticket}",
+            "body":f"We received your {issue} request on {sent.isoformat()}.",
+            "type":"ticket_confirmation",
+            "ticket_id":ticket
+        }
+
+    def close(self)->int:
+        self.file.close()
+        return self.count
+
+
+def iter_customers(path:str|Path)->Iterator[dict[str,Any]]:
+    with open(Path(path)/CUSTOMERS_FILE,"rb") as f:
+        for line in f:
+            yield _loads(line)
+
+
+def load_store(path:str|Path,shard:Optional[tuple[int,int]]=None)->CustomerStore:
+    """
+    Customer store of a dataset, orders are memory mapped.
+
+    Args:
+        path:Dataset directory
+        shard:(index, count) to keep only the customers of one shard
+    """
+
+    customers={customer["Email"]:customer for customer in iter_customers(path)}
+    return CustomerStore.from_order_file(customers,OrderFile(Path(path)/ORDERS_FILE),shard=shard)
+
+
+def scratch_path(dataset:str|Path,name:str)->Path:
+    """
+    Writable copy of a dataset file, the dataset itself is never written.
+
+    Copies live in mcp_servers/data/datasets, one directory per dataset
+    and manifest, so regenerating a dataset starts from fresh copies.
+    """
+
+    dataset=Path(dataset).resolve()
+    digest=hashlib.sha1(str(dataset).encode())
+    manifest=dataset/MANIFEST_FILE
+    if manifest.exists():
+        digest.update(manifest.read_bytes())
+    return Path(__file__).resolve().parent/"data"/"datasets"/f"{dataset.name}-{digest.hexdigest()[:12]}"/name
+
+
+def seed_file(source:str|Path,target:str|Path)->None:
+    """
+    Seed a writable copy with a dataset file.
+
+    Does nothing once the copy exists, it is the source of truth from
+    then on.
+    """
+
+    source,target=Path(source),Path(target)
+    if target.exists() or not source.exists():
+        return
+    target.parent.mkdir(parents=True,exist_ok=True)
+    tmp=target.with_name(target.name+".tmp")
+    shutil.copyfile(source,tmp)
+    os.replace(tmp,target)
+
+
+def shard_refunds(source:str|Path,target:str|Path,store:CustomerStore)->None:
+    """
+    Seed a shard's refund ledger with the dataset refunds of its orders.
+
+    Does nothing once the shard ledger exists, it is the source of truth
+    from then on.
+    """
+
+    source,target=Path(source),Path(target)
+    if target.exists() or not source.exists():
+        return
+    target.parent.mkdir(parents=True,exist_ok=True)
+    tmp=target.with_name(target.name+".tmp")
+    with open(source,"rb") as f,open(tmp,"wb") as out:
+        for line in f:
+            if line.endswith(b"\n") and store.get_order(_loads(line)["order_id"]) is not None:
+                out.write(line)
+    os.replace(tmp,target)
+
+
+def load_orders(source:str|Path,target:str|Path)->int:
+    """
+    Bulk load orders from JSON lines into an order file.
+
+    Each line is an order with its customer: {"customer_id":"C001","OrderID":...}.
+    Lines are streamed, so only the columns are held in memory.
+
+    Returns:
+        Number of orders loaded
+    """
+
+    writer=OrderFileWriter(target)
+    with open(source,"rb") as f:
+        for line in f:
+            if line.strip():
+                order=_loads(line)
+                writer.add(order.pop("customer_id"),order)
+    return writer.close()
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub=parser.add_subparsers(dest="command",required=True)
+
+    gen=sub.add_parser("generate",help="write a synthetic dataset")
+    gen.add_argument("path")
+    gen.add_argument("--customers",type=int,default=1000)
+    gen.add_argument("--orders-per-customer",type=float,default=6.0)
+    gen.add_argument("--duplicate-rate",type=float,default=0.02)
+    gen.add_argument("--refund-rate",type=float,default=0.5)
+    gen.add_argument("--emails-per-customer",type=float,default=2.0)
+    gen.add_argument("--seed",type=int,default=42)
+    gen.add_argument("--start",default="2024-01-01",help="earliest signup date")
+
+    load=sub.add_parser("load-orders",help="bulk load JSON lines orders into an order file")
+    load.add_argument("source")
+    load.add_argument("target")
+    args=parser.parse_args()
+
+    if args.command=="generate":
+        manifest=generate(
+            args.path,
+            customers=args.customers,
+            orders_per_customer=args.orders_per_customer,
+            duplicate_rate=args.duplicate_rate,
+            refund_rate=args.refund_rate,
+            emails_per_customer=args.emails_per_customer,
+            seed=args.seed,
+            start=args.start
+        )
+        print(json.dumps(manifest,indent=2))
+    else:
+        started=time.perf_counter()
+        rows=load_orders(args.source,args.target)
+        print(f"Loaded {rows} orders in {time.perf_counter()-started:.1f}s",file=sys.stderr)
+
+if __name__=="__main__":
+    main()
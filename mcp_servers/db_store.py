@@ -0,0 +1,239 @@
+"""
+In-memory customer/order store backing the mock database server.
+
+Indexes:
+customers by ID (primary)
+customers by normalized email (unique)
+orders by customer ID, orders by order ID
+charges by (customer, date, amount) with the set of keys charged more than once
+
+Every lookup the tools make is a dict access, and duplicate detection
+only walks the keys that are already known to repeat. Fleet-wide scans
+use a columnar snapshot of the orders that is rebuilt after writes.
+
+Orders can instead come from a memory-mapped order file (order_file.py).
+They are then read-only and served straight from the mapped columns,
+nothing is indexed in memory.
+
+A store can hold a single shard of the customers (see database_shards),
+customers are assigned to shards by a CRC32 hash of their ID.
+"""
+
+import zlib
+import itertools
+from typing import Any,Iterator,Optional
+
+import numpy as np
+
+from mcp_servers.order_columns import OrderColumns
+from mcp_servers.order_file import OrderFile
+
+
+def normalize_email(email:str)->str:
+    return email.strip().lower()
+
+
+def shard_of(customer_id:str,shards:int)->int:
+    """Shard owning a customer, stable across processes and runs"""
+    return zlib.crc32(customer_id.encode())%shards
+
+
+def parse_shard(spec:str)->Optional[tuple[int,int]]:
+    """(index, count) from an "index/count" spec such as DB_SHARD=2/4, None if empty"""
+
+    if not spec:
+        return None
+    index,_,count=spec.partition("/")
+    index,count=int(index),int(count)
+    if not 0<=index<count:
+        raise ValueError(f"Invalid shard {spec}, expected index/count with 0 <= index < count")
+    return index,count
+
+
+def charge_key(order:dict[str,Any])->tuple[str,int]:
+    """(date, amount in cents) of an order, cents avoid float key mismatches"""
+    return order["Date"],round(float(order["Amount"])*100)
+
+
+class CustomerStore:
+
+    def __init__(self):
+        self.customers:dict[str,dict[str,Any]]={}
+        self.emails:dict[str,str]={}
+        self.orders:dict[str,list[dict[str,Any]]]={}
+        self.order_index:dict[str,tuple[str,dict[str,Any]]]={}
+        self.charges:dict[str,dict[tuple[str,int],list[dict[str,Any]]]]={}
+        self.duplicate_keys:dict[str,set[tuple[str,int]]]={}
+        self._columns:Optional[OrderColumns]=None
+        # mapped orders, used instead of the dicts above when set
+        self.order_file:Optional[OrderFile]=None
+        self.shard:Optional[tuple[int,int]]=None
+
+    @classmethod
+    def from_dicts(
+        cls,
+        customers:dict[str,dict[str,Any]],
+        orders:dict[str,list[dict[str,Any]]],
+        shard:Optional[tuple[int,int]]=None
+    )->"CustomerStore":
+        """
+        Build a store from the email keyed customers / ID keyed orders layout.
+
+        Args:
+            customers:Customers by email
+            orders:Orders by customer ID
+            shard:(index, count) to keep only the customers of one shard
+        """
+
+        store=cls()
+        owned=lambda customer_id:shard is None or shard_of(customer_id,shard[1])==shard[0]
+        for customer in customers.values():
+            if owned(customer["ID"]):
+                store.add_customer(customer)
+        for customer_id,customer_orders in orders.items():
+            if not owned(customer_id):
+                continue
+            for order in customer_orders:
+                store.add_order(customer_id,order)
+        return store
+
+    @classmethod
+    def from_order_file(
+        cls,
+        customers:dict[str,dict[str,Any]],
+        order_file:OrderFile,
+        shard:Optional[tuple[int,int]]=None
+    )->"CustomerStore":
+        """
+        Build a store serving the orders of a mapped order file.
+
+        Args:
+            customers:Customers by email
+            order_file:The orders
+            shard:(index, count) to keep only the customers of one shard
+        """
+
+        store=cls()
+        store.order_file=order_file
+        store.shard=shard
+        for customer in customers.values():
+            if store.owns(customer["ID"]):
+                store.add_customer(customer)
+        return store
+
+    def owns(self,customer_id:str)->bool:
+        """Whether the customer belongs to this store's shard"""
+        return self.shard is None or shard_of(customer_id,self.shard[1])==self.shard[0]
+
+    def add_customer(self,customer:dict[str,Any])->None:
+        customer_id=customer["ID"]
+        email=normalize_email(customer["Email"])
+
+        if customer_id in self.customers:
+            raise ValueError(f"Duplicate customer ID: {customer_id}")
+        if email in self.emails:
+            raise ValueError(f"Duplicate customer email: {email}")
+
+        self.customers[customer_id]=customer
+        self.emails[email]=customer_id
+
+    def add_order(self,customer_id:str,order:dict[str,Any])->None:
+        if self.order_file is not None:
+            raise ValueError("Orders of a store backed by an order file are read-only")
+        order_id=order["OrderID"]
+        if order_id in self.order_index:
+            raise ValueError(f"Duplicate order ID: {order_id}")
+
+        self.orders.setdefault(customer_id,[]).append(order)
+        self.order_index[order_id]=(customer_id,order)
+        self._columns=None
+
+        key=charge_key(order)
+        group=self.charges.setdefault(customer_id,{}).setdefault(key,[])
+        group.append(order)
+        if len(group)==2:
+            self.duplicate_keys.setdefault(customer_id,set()).add(key)
+
+    def get_customer(self,customer_id:str)->Optional[dict[str,Any]]:
+        return self.customers.get(customer_id)
+
+    def find_by_email(self,email:str)->Optional[dict[str,Any]]:
+        customer_id=self.emails.get(normalize_email(email))
+        return self.customers.get(customer_id) if customer_id else None
+
+    def get_orders(self,customer_id:str)->list[dict[str,Any]]:
+        if self.order_file is not None:
+            if not self.owns(customer_id):
+                return []
+            return self.order_file.orders(*self.order_file.customer_range(customer_id))
+        return self.orders.get(customer_id,[])
+
+    def order_count(self,customer_id:str)->int:
+        if self.order_file is not None:
+            if not self.owns(customer_id):
+                return 0
+            start,stop=self.order_file.customer_range(customer_id)
+            return stop-start
+        return len(self.orders.get(customer_id,()))
+
+    def iter_orders(self,customer_id:str,start:int=0,chunk:int=256)->Iterator[dict[str,Any]]:
+        """
+        A customer's orders from position start on, built as they are consumed.
+
+        Args:
+            customer_id:Customer ID
+            start:Position of the first order, in insertion order
+            chunk:Mapped rows decoded at a time
+        """
+
+        if self.order_file is None:
+            yield from itertools.islice(self.orders.get(customer_id,()),start,None)
+            return
+        if not self.owns(customer_id):
+            return
+        first,stop=self.order_file.customer_range(customer_id)
+        for row in range(first+start,stop,chunk):
+            yield from self.order_file.orders(row,min(row+chunk,stop))
+
+    def get_order(self,order_id:str)->Optional[tuple[str,dict[str,Any]]]:
+        """(customer ID, order) for an order ID"""
+
+        if self.order_file is not None:
+            row=self.order_file.find_order(order_id)
+            if row is None:
+                return None
+            customer_id=self.order_file.customer_of(row)
+            return (customer_id,self.order_file.order(row)) if self.owns(customer_id) else None
+        return self.order_index.get(order_id)
+
+    def duplicate_charges(self,customer_id:str)->list[dict[str,Any]]:
+        """Every repeat of a (date, amount) charge after the first one"""
+
+        if self.order_file is not None:
+            # a customer's orders are few, group them on the fly
+            groups:dict[tuple[str,int],list[dict[str,Any]]]={}
+            for order in self.get_orders(customer_id):
+                groups.setdefault(charge_key(order),[]).append(order)
+            return [order for key in sorted(groups) for order in groups[key][1:]]
+
+        charges=self.charges.get(customer_id,{})
+        duplicates=[]
+        for key in sorted(self.duplicate_keys.get(customer_id,())):
+            duplicates.extend(charges[key][1:])
+        return duplicates
+
+    def columns(self)->OrderColumns:
+        """Columnar snapshot of every order, built on first use after a write"""
+
+        if self._columns is None:
+            if self.order_file is not None:
+                owned=None
+                if self.shard is not None:
+                    owned=np.array(
+                        [self.owns(self.order_file.customer_id(code)) for code in range(self.order_file.customer_count)],
+                        dtype=bool
+                    )
+                self._columns=self.order_file.columns(owned)
+            else:
+                self._columns=OrderColumns.from_orders(self.orders)
+        return self._columns
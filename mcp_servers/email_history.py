@@ -0,0 +1,282 @@
+"""
+Per-recipient email history for the mock email server.
+
+Each recipient gets a fixed size ring buffer of their most recent
+messages. Messages pushed out of the ring spill to an append-only file
+where every line points back at the recipient's previous spilled line and
+holds its own position, and older history is paged from disk by following
+the chain.
+
+Recipients that have not been touched for a while have their whole ring
+spilled once more than max_recipients rings are held in memory. The tail
+pointer and message count of a recipient stay in an index of at most
+max_index recipients. One that falls out of it is written to a small
+SQLite table next to the spill file (<spill file>.tails) and read back
+from there with one primary key lookup, and a bit filter of spilled
+addresses skips even that for recipients that never had anything
+spilled. Memory is bounded whatever the number of recipients, and so is
+the cost of finding any recipient's history.
+
+The tails table is derived data: it is rebuilt with the index whenever
+the spill file is opened, so it never disagrees with the spill file.
+
+Without a spill file, messages that leave the ring are dropped, and so is
+a recipient whose ring is evicted: count() is always what iter_history
+can return.
+
+Every message of a recipient has a position, 0 for the first one ever
+sent. iter_history walks a recipient's messages newest first from any
+position, reading disk lines only as they are consumed, so a page costs
+one read per message on it whatever the length of the history.
+"""
+
+import os
+import json
+import sqlite3
+from typing import Any,Iterator,Optional
+from pathlib import Path
+from collections import deque,OrderedDict
+
+# (offset, length) of a spilled line
+Pointer=tuple[int,int]
+
+# where to continue reading spilled messages: a line and its position
+Resume=tuple[Optional[Pointer],int]
+
+
+def normalize_address(email:str)->str:
+    return email.strip().lower()
+
+
+class EmailHistory:
+
+    def __init__(
+        self,
+        path:Optional[Path]=None,
+        recent:int=10,
+        max_recipients:int=10000,
+        max_index:int=100000,
+        filter_bits:int=1<<24
+    ):
+        """
+        Args:
+            path:Spill file, older messages are dropped if None
+            recent:Messages kept in memory per recipient
+            max_recipients:Recipient rings kept in memory before the least recently used is spilled
+            max_index:Recipients whose tail pointer and count are kept in
+                memory, at least max_recipients; the others are kept in the
+                tails table
+            filter_bits:Size of the filter of spilled addresses, 2 MB by default
+        """
+
+        self.path=Path(path) if path else None
+        self.recent=recent
+        self.max_recipients=max_recipients
+        self.max_index=max(max_index,max_recipients)
+
+        self._rings:OrderedDict[str,deque]=OrderedDict()
+        # address -> (tail pointer, messages ever sent), least recently used first
+        self._index:OrderedDict[str,tuple[Optional[Pointer],int]]=OrderedDict()
+        self._filter=bytearray(filter_bits//8) if self.path else bytearray()
+
+        self._fd:Optional[int]=None
+        self._tails:Optional[sqlite3.Connection]=None
+        if self.path:
+            self.path.parent.mkdir(parents=True,exist_ok=True)
+            self._fd=os.open(self.path,os.O_RDWR|os.O_APPEND|os.O_CREAT,0o644)
+            self._tails=sqlite3.connect(f"{self.path}.tails",isolation_level=None)
+            # derived from the spill file, a crash only costs a rebuild
+            self._tails.execute("PRAGMA journal_mode=OFF")
+            self._tails.execute("PRAGMA synchronous=OFF")
+            self._tails.execute(
+                "CREATE TABLE IF NOT EXISTS tails "
+                "(address TEXT PRIMARY KEY,offset INTEGER,length INTEGER,count INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            self._rebuild()
+
+    def _rebuild(self)->None:
+        """Recover the index and the tails table from the spill file"""
+
+        self._tails.execute("BEGIN")
+        self._tails.execute("DELETE FROM tails")
+        try:
+            self._replay()
+        finally:
+            self._tails.execute("COMMIT")
+
+    def _replay(self)->None:
+        offset=0
+        with open(self.path,"rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    os.ftruncate(self._fd,offset)
+                    break
+                entry=json.loads(line)
+                address=normalize_address(entry["record"]["to"])
+                pointer=(offset,len(line))
+                if "n" in entry:
+                    count=entry["n"]+1
+                else:
+                    # spill files written before lines held their position
+                    count=self._state(address)[1]+1
+                self._remember(address,pointer,count)
+                self._mark_spilled(address)
+                offset+=len(line)
+
+    def _filter_bit(self,address:str)->tuple[int,int]:
+        bit=hash(address)%(len(self._filter)*8)
+        return bit>>3,1<<(bit&7)
+
+    def _mark_spilled(self,address:str)->None:
+        index,mask=self._filter_bit(address)
+        self._filter[index]|=mask
+
+    def _may_have_spilled(self,address:str)->bool:
+        index,mask=self._filter_bit(address)
+        return bool(self._filter[index]&mask)
+
+    def _remember(self,address:str,tail:Optional[Pointer],count:int)->None:
+        self._index[address]=(tail,count)
+        self._index.move_to_end(address)
+        while len(self._index)>self.max_index:
+            old_address=next(iter(self._index))
+            ring=self._rings.pop(old_address,None)
+            if ring:
+                self._spill_ring(old_address,ring)
+            tail,count=self._index.pop(old_address)
+            if self._tails is not None:
+                self._tails.execute(
+                    "INSERT OR REPLACE INTO tails VALUES (?,?,?,?)",
+                    (old_address,*(tail or (None,None)),count)
+                )
+
+    def _state(self,address:str)->tuple[Optional[Pointer],int]:
+        """(tail pointer, messages ever sent) of a recipient, from the index or the tails table"""
+
+        state=self._index.get(address)
+        if state is not None:
+            self._index.move_to_end(address)
+            return state
+        if self._tails is None or not self._may_have_spilled(address):
+            return None,0
+
+        row=self._tails.execute("SELECT offset,length,count FROM tails WHERE address=?",(address,)).fetchone()
+        if row is None:
+            return None,0
+        offset,length,count=row
+        tail=(offset,length) if offset is not None else None
+        self._remember(address,tail,count)
+        return tail,count
+
+    def add(self,record:dict[str,Any])->None:
+        """Add a message record, spilling the oldest in-memory one if the ring is full"""
+
+        address=normalize_address(record["to"])
+        tail,count=self._state(address)
+        ring=self._rings.get(address)
+        if ring is None:
+            ring=self._rings[address]=deque()
+        self._rings.move_to_end(address)
+
+        self._remember(address,tail,count+1)
+        if len(ring)>=self.recent:
+            oldest=count-len(ring)
+            self._spill(address,ring.popleft(),oldest)
+        ring.append(record)
+
+        while len(self._rings)>self.max_recipients:
+            old_address,old_ring=self._rings.popitem(last=False)
+            if self._fd is None:
+                # nothing of it can be returned any more
+                self._index.pop(old_address,None)
+                continue
+            self._spill_ring(old_address,old_ring)
+
+    def _spill_ring(self,address:str,ring:deque)->None:
+        """Spill every message of a ring that has left memory, oldest first"""
+
+        count=self._index[address][1]
+        for offset,record in enumerate(ring):
+            self._spill(address,record,count-len(ring)+offset)
+
+    def _spill(self,address:str,record:dict[str,Any],position:int)->None:
+        """Append a message at position of address's history to the spill file"""
+
+        if self._fd is None:
+            return
+
+        tail,count=self._index[address]
+        line=json.dumps({"n":position,"prev":tail,"record":record},separators=(",",":")).encode()+b"\n"
+        offset=os.lseek(self._fd,0,os.SEEK_END)
+        os.write(self._fd,line)
+        self._index[address]=((offset,len(line)),count)
+        self._mark_spilled(address)
+
+    def count(self,email:str)->int:
+        """Messages iter_history can return for a recipient"""
+
+        address=normalize_address(email)
+        if self._fd is None:
+            return len(self._rings.get(address) or ())
+        return self._state(address)[1]
+
+    def iter_history(
+        self,
+        email:str,
+        before:Optional[int]=None,
+        resume:Optional[Resume]=None
+    )->Iterator[tuple[int,dict[str,Any],Resume]]:
+        """
+        A recipient's messages, newest first.
+
+        Args:
+            email:Recipient address
+            before:Only messages at positions below this one, every message if None
+            resume:Resume of the message at before, from an earlier call;
+                saves walking the spill chain down from its tail
+        Yields:
+            (position, message, resume) where resume continues after the message
+        Raises:
+            ValueError: if resume does not point at a message of this recipient
+        """
+
+        address=normalize_address(email)
+        tail_pointer,count=self._state(address)
+        ring=self._rings.get(address) or ()
+        ring_start=count-len(ring)
+        tail=(tail_pointer,ring_start-1)
+        before=count if before is None else min(before,count)
+
+        for position in range(before-1,ring_start-1,-1):
+            yield position,ring[position-ring_start],tail
+
+        # messages spilled after resume was handed out are only reachable
+        # from the current tail
+        upper=min(before,ring_start)
+        pointer,position=resume if resume is not None and resume[1]>=upper-1 else tail
+        if pointer is not None and self._fd is not None and pointer[0]+pointer[1]>os.fstat(self._fd).st_size:
+            # resume came from a client, never read past the spill file
+            raise ValueError(f"History position {position} is not a message to {email}")
+        while pointer is not None and position>=0 and self._fd is not None:
+            offset,length=pointer
+            entry=json.loads(os.pread(self._fd,length,offset))
+            if normalize_address(entry["record"]["to"])!=address or entry.get("n",position)!=position:
+                raise ValueError(f"History position {position} is not a message to {email}")
+            pointer=tuple(entry["prev"]) if entry["prev"] else None
+            if position<upper:
+                yield position,entry["record"],(pointer,position-1)
+            position-=1
+
+    def close(self)->None:
+        """Spill every ring so the full history survives a restart"""
+
+        if self._fd is not None:
+            for address,ring in self._rings.items():
+                self._spill_ring(address,ring)
+        self._rings.clear()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd=None
+        if self._tails is not None:
+            self._tails.close()
+            self._tails=None
@@ -0,0 +1,250 @@
+"""
+Outbox for the mock email server.
+
+The send tools only enqueue a message and return its ID. A background
+asyncio worker drains the queue in batches and delivers each batch over a
+small pool of reused SMTP connections, so tool latency no longer depends
+on mail delivery.
+
+Delivery is configured with environment variables:
+SMTP_HOST (no SMTP delivery if unset, messages are only logged)
+SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_FROM, SMTP_POOL_SIZE
+"""
+
+import os
+import sys
+import queue
+import asyncio
+import smtplib
+from datetime import datetime
+from email.message import EmailMessage
+from collections import OrderedDict
+from typing import Any,Optional
+
+# errors for a single message, the connection stays usable after them
+REJECTED=(smtplib.SMTPRecipientsRefused,smtplib.SMTPSenderRefused,smtplib.SMTPDataError)
+
+
+class SMTPPool:
+    """Thread safe pool of open SMTP connections, reused across batches"""
+
+    def __init__(
+        self,
+        host:str,
+        port:int=25,
+        size:int=4,
+        user:str="",
+        password:str="",
+        starttls:bool=False,
+        timeout:float=30.0
+    ):
+        self.host=host
+        self.port=port
+        self.size=size
+        self.user=user
+        self.password=password
+        self.starttls=starttls
+        self.timeout=timeout
+        self._idle:queue.LifoQueue=queue.LifoQueue()
+
+    def _open(self)->smtplib.SMTP:
+        smtp=smtplib.SMTP(self.host,self.port,timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.user:
+            smtp.login(self.user,self.password)
+        return smtp
+
+    def acquire(self)->smtplib.SMTP:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self,smtp:smtplib.SMTP)->None:
+        if self._idle.qsize()<self.size:
+            self._idle.put(smtp)
+        else:
+            self.discard(smtp)
+
+    def reconnect(self,smtp:smtplib.SMTP)->smtplib.SMTP:
+        """Replace a connection the server closed, raises if no new one can be opened"""
+
+        self.discard(smtp)
+        return self._open()
+
+    def discard(self,smtp:smtplib.SMTP)->None:
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def close(self)->None:
+        while not self._idle.empty():
+            self.discard(self._idle.get_nowait())
+
+
+class Outbox:
+
+    def __init__(
+        self,
+        smtp:Optional[SMTPPool]=None,
+        sender:str="support@example.com",
+        batch_size:int=50,
+        max_status:int=10000
+    ):
+        """
+        Args:
+            smtp:Connection pool to deliver over, messages are only logged if None
+            sender:From address
+            batch_size:Messages taken off the queue per delivery round
+            max_status:Delivery states remembered for get_status
+        """
+
+        self.smtp=smtp
+        self.sender=sender
+        self.batch_size=batch_size
+        self.max_status=max_status
+
+        self._queue:Optional[asyncio.Queue]=None
+        self._worker:Optional[asyncio.Task]=None
+        # email_id -> delivery state, oldest first, bounded by max_status
+        self._status:OrderedDict[str,dict[str,Any]]=OrderedDict()
+
+    @classmethod
+    def from_env(cls)->"Outbox":
+        host=os.environ.get("SMTP_HOST","")
+        smtp=None
+        if host:
+            smtp=SMTPPool(
+                host,
+                port=int(os.environ.get("SMTP_PORT","25")),
+                size=int(os.environ.get("SMTP_POOL_SIZE","4")),
+                user=os.environ.get("SMTP_USER",""),
+                password=os.environ.get("SMTP_PASSWORD",""),
+                starttls=os.environ.get("SMTP_STARTTLS","")=="1"
+            )
+        return cls(smtp=smtp,sender=os.environ.get("SMTP_FROM","support@example.com"))
+
+    def start(self)->None:
+        """Start the delivery worker on the running loop"""
+
+        if self._worker is None or self._worker.done():
+            self._queue=self._queue or asyncio.Queue()
+            self._worker=asyncio.create_task(self._deliver_forever(),name="email-outbox")
+
+    async def stop(self)->None:
+        """Deliver what is queued, then stop the worker"""
+
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker=None
+        if self.smtp:
+            self.smtp.close()
+
+    def enqueue(self,record:dict[str,Any])->None:
+        """Queue a message record (email_id, to, subject, body) for delivery"""
+
+        self.start()
+        self._set_status(record["email_id"],{"status":"queued","queued_at":datetime.now().isoformat(),"attempts":0})
+        self._queue.put_nowait(record)
+
+    def get_status(self,email_id:str)->Optional[dict[str,Any]]:
+        return self._status.get(email_id)
+
+    def _set_status(self,email_id:str,status:dict[str,Any])->None:
+        self._status[email_id]=status
+        self._status.move_to_end(email_id)
+        while len(self._status)>self.max_status:
+            self._status.popitem(last=False)
+
+    async def _deliver_forever(self)->None:
+        while True:
+            batch=[await self._queue.get()]
+            while len(batch)<self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                print(f"Outbox batch failed: {e}",file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self,batch:list[dict[str,Any]])->None:
+        for record in batch:
+            status=self._status.get(record["email_id"])
+            if status is not None:
+                status["status"]="sending"
+
+        if self.smtp is None:
+            for record in batch:
+                print(f'Email send to {record["to"]}: {record["subject"]}',file=sys.stderr)
+                self._mark(record,None)
+            return
+
+        # one lane per pooled connection, each lane sends sequentially
+        lanes=[batch[i::self.smtp.size] for i in range(min(self.smtp.size,len(batch)))]
+        await asyncio.gather(*(asyncio.to_thread(self._send_lane,lane) for lane in lanes))
+
+    def _send_lane(self,lane:list[dict[str,Any]])->None:
+        smtp:Optional[smtplib.SMTP]=None
+        try:
+            for position,record in enumerate(lane):
+                message=self._message(record)
+                try:
+                    if smtp is None:
+                        smtp=self.smtp.acquire()
+                    try:
+                        smtp.send_message(message)
+                    except smtplib.SMTPServerDisconnected:
+                        # the server closed the pooled connection while it was idle
+                        stale,smtp=smtp,None
+                        smtp=self.smtp.reconnect(stale)
+                        smtp.send_message(message)
+                except REJECTED as e:
+                    self._mark(record,str(e))
+                except Exception as e:
+                    # the connection is gone or in an unknown state: never pool
+                    # it, and fail the rest of the lane instead of waiting out a
+                    # timeout per message; the next batch opens a fresh one
+                    if smtp is not None:
+                        self.smtp.discard(smtp)
+                        smtp=None
+                    for failed in lane[position:]:
+                        self._mark(failed,f"SMTP connection failed: {e}")
+                    return
+                else:
+                    self._mark(record,None)
+        finally:
+            if smtp is not None:
+                self.smtp.release(smtp)
+
+    def _message(self,record:dict[str,Any])->EmailMessage:
+        message=EmailMessage()
+        message["From"]=self.sender
+        message["To"]=record["to"]
+        message["Subject"]=record["subject"]
+        message["Message-ID"]=f'<{record["email_id"]}@{self.sender.split("@")[-1]}>'
+        message.set_content(record["body"])
+        return message
+
+    def _mark(self,record:dict[str,Any],error:Optional[str])->None:
+        status=self._status.get(record["email_id"])
+        if status is None:
+            return
+        status["attempts"]+=1
+        if error is None:
+            status["status"]="sent"
+            status["sent_at"]=datetime.now().isoformat()
+        else:
+            status["status"]="failed"
+            status["error"]=error
+        record["status"]=status["status"]
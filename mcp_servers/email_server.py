@@ -1,21 +1,76 @@
-import json
+import os
 import asyncio
 from datetime import datetime
 from typing import Any
 import random
 import sys
+import uuid
+import argparse
 
 from mcp.server import Server
-from mcp.server.stdio import stdio_server
-from mcp.types import Tool,TextContent
+from mcp.types import Tool,ToolAnnotations
 
+from mcp_servers.batch import BATCH_INPUT_SCHEMA,run_batch
+from mcp_servers.serialization import tool_response
+from mcp_servers.email_outbox import Outbox
+from mcp_servers.email_history import EmailHistory,normalize_address
+from mcp_servers.pagination import CursorError,Pagination,decode_cursor,encode_cursor,page_size,progress_reporter,take_page
+from mcp_servers.registry import ToolRegistry
+from mcp_servers.transport import add_transport_args,serve
+from mcp_servers.metrics import request_traceparent,server_stats as stats_result,span
 
-EMAIL_LOG=[]
 
+# MCP_DATASET (or --dataset) serves the email history of a generated
+# dataset (dataset.py)
+DATASET=os.environ.get("MCP_DATASET","")
+EMAIL_HISTORY_FILE="email_history.jsonl"
+
+
+def open_history(dataset:str)->EmailHistory:
+    """
+    Persistent email history of a dataset, or of the seed data if dataset
+    is empty; opened at server start.
+
+    A dataset's history is copied to EMAIL_HISTORY_PATH (a scratch file by
+    default) and new sends go there, the dataset itself is never written.
+    """
+
+    if not dataset:
+        # last 10 emails per recipient in memory, older ones on disk; set
+        # EMAIL_HISTORY_PATH="" to drop them instead
+        return EmailHistory(os.environ.get(
+            "EMAIL_HISTORY_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),"data","email_history.jsonl")
+        ))
+
+    # imported here, numpy is only needed with a dataset
+    from mcp_servers.dataset import scratch_path,seed_file
+    path=os.environ.get("EMAIL_HISTORY_PATH",str(scratch_path(dataset,EMAIL_HISTORY_FILE)))
+    if path:
+        seed_file(os.path.join(dataset,EMAIL_HISTORY_FILE),path)
+    return EmailHistory(path)
+
+
+# in memory until main opens the history, importing the module writes nothing
+EMAIL_LOG=EmailHistory()
+
+# send tools only queue mail, the outbox worker delivers it
+OUTBOX=Outbox.from_env()
+
+registry=ToolRegistry()
+
+@registry.tool(
+    description="Send generic email to receipt",
+    params={
+        "to":"Recipient email address",
+        "subject":"Email subject line",
+        "body":"Email body content"
+    }
+)
 def send_email(to:str,subject:str,body:str)->dict:
-    """Send Generic Email"""
+    """Queue a generic email for delivery"""
     
-    email_id=f'EMAIL-{random.randint(10000,99999)}'
+    email_id=f'EMAIL-{uuid.uuid4().hex[:12].upper()}'
     
     email_record={
         "email_id":email_id,
@@ -23,20 +78,24 @@ def send_email(to:str,subject:str,body:str)->dict:
         "subject":subject,
         "body":body,
         "sent_at":datetime.now().isoformat(),
-        "status": "sent"
+        "status": "queued"
     }
     
-    EMAIL_LOG.append(email_record)
-    
-    print(f'Email send to {to}: {subject}',file=sys.stderr)
+    EMAIL_LOG.add(email_record)
+    OUTBOX.enqueue(email_record)
     
     return {
         "success":True,
         "email_id":email_id,
-        "message":f"Email sent to {to}",
+        "status":"queued",
+        "message":f"Email to {to} queued for delivery",
         "subject":subject
     }
     
+@registry.tool(
+    description="Send a password reset email with secure reset link",
+    params={"email":"User's email address"}
+)
 def send_password_reset(email:str)->dict:
     """Send a password reset email"""
     reset_token=f"RESET-{random.randint(10000,99999)}"
@@ -59,6 +118,15 @@ def send_password_reset(email:str)->dict:
     
     return result
 
+@registry.tool(
+    description="send refund confirmation email with refund details",
+    params={
+        "email":"User's email address",
+        "refund_id":"Refund ID",
+        "amount":"Refund amount in dollar",
+        "order_id":"Original order ID"
+    }
+)
 def send_refund_confirmation(email:str,refund_id:str,amount:float,order_id:str)->dict:
     """Send a request confirmation email"""
     
@@ -86,6 +154,14 @@ def send_refund_confirmation(email:str,refund_id:str,amount:float,order_id:str)-
     
     return result
 
+@registry.tool(
+    description="Send a support ticket confirmation email",
+    params={
+        "email":"User's email address",
+        "ticket_id":"Support ticket ID",
+        "issue_type":"Type of the issue (eg. billing,technical,general)"
+    }
+)
 def send_ticket_confirmation(email:str,ticket_id:str,issue_type:str)->dict:
     """Send a support ticket confirmation"""
     
@@ -113,152 +189,133 @@ def send_ticket_confirmation(email:str,ticket_id:str,issue_type:str)->dict:
     return result
 
 
-def get_email_history(email:str)->dict:
-    """Get email history for an addresss"""
-    emails =[e for e in EMAIL_LOG if e["to"]==email]
+@registry.tool(
+    description="Check the delivery status (queued, sending, sent, failed) of an email by its ID",
+    params={"email_id":"Email ID returned by a send tool"},
+    annotations=ToolAnnotations(readOnlyHint=True)
+)
+def get_email_status(email_id:str)->dict:
+    """Get the delivery state of a queued email"""
+    
+    status=OUTBOX.get_status(email_id)
+    if status is None:
+        return {"success":False,"error":f"Unknown email ID: {email_id}"}
+    
+    return {
+        "success":True,
+        "email_id":email_id,
+        **status
+    }
+
+HISTORY_PAGE_SIZE=100
+
+
+def _history_resume(state:dict[str,Any])->tuple[int,Any]:
+    """(before, resume) stored in a get_email_history cursor"""
+    
+    before,line,at=state.get("before"),state.get("line"),state.get("at")
+    if not isinstance(before,int) or not isinstance(at,int) or before<0:
+        raise CursorError(f"Invalid cursor state: {state}")
+    if line is not None:
+        if not (isinstance(line,list) and len(line)==2 and all(isinstance(part,int) and part>=0 for part in line)):
+            raise CursorError(f"Invalid cursor state: {state}")
+        line=tuple(line)
+    return before,(line,at)
+
+
+@registry.tool(
+    description="Get the most recent emails sent to an address; pass next_cursor back to page through older ones",
+    params={
+        "email":"Recipient email address",
+        "cursor":"next_cursor from a previous call",
+        "limit":f"Emails per page (max {HISTORY_PAGE_SIZE})"
+    },
+    annotations=ToolAnnotations(readOnlyHint=True),
+    pagination=Pagination("emails","total_emails")
+)
+def get_email_history(email:str,cursor:str|None=None,limit:int=10)->dict:
+    """Get email history for an addresss, newest page first, each page oldest first"""
+    
+    address=normalize_address(email)
+    try:
+        before,resume=_history_resume(decode_cursor("get_email_history",cursor,address)) if cursor else (None,None)
+        page,more=take_page(EMAIL_LOG.iter_history(address,before,resume),page_size(limit,HISTORY_PAGE_SIZE))
+    except CursorError as e:
+        return {"success":False,"error":str(e)}
+    except (ValueError,KeyError,TypeError,OSError):
+        # a cursor pointing at a spill line that no longer holds its message
+        return {"success":False,"error":f"Invalid cursor: {cursor}"}
+    
+    next_cursor=None
+    if more:
+        position,_,(line,at)=page[-1]
+        next_cursor=encode_cursor("get_email_history",{"before":position,"line":line,"at":at},address)
     
     return {
         "success":True,
         "email": email,
-        "total_emails":len(emails),
-        "emails":emails[-10:] #Last 10 emails
+        "total_emails":EMAIL_LOG.count(address),
+        "emails":[message for _,message,_ in reversed(page)],
+        "next_cursor":next_cursor
     }
     
     
+@registry.tool(
+    description="Call counts, error counts and latency percentiles for every email tool since the server started. format=prometheus returns Prometheus text instead.",
+    params={"format":"json (default) or prometheus"},
+    annotations=ToolAnnotations(readOnlyHint=True)
+)
+def server_stats(format:str="json")->dict:
+    return stats_result("mock-email-server",format)
+    
+    
+@registry.tool(
+    description="Run several email tool calls in one request. Results come back in order, with an error entry for each call that failed.",
+    input_schema=BATCH_INPUT_SCHEMA
+)
+async def batch(calls:list[dict])->dict:
+    return await run_batch(calls,registry.dispatch)
+    
+    
 mcp_server=Server("mock-email-server")
 
 @mcp_server.list_tools()
 async def list_tools()->list[Tool]:
     """List available emails tools"""
-    return [
-        Tool(
-            name="send_email",
-            description="Send generic email to receipt",
-            inputSchema={
-                "type":"object",
-                "properties":{
-                    "to":{
-                        "type":"string",
-                        "description":"Recipient email address"
-                    },
-                    "subject":{
-                        "type":"string",
-                        "description":"Email subject line"
-                    },
-                    "body":{
-                        "type":"string",
-                        "description":"Email body content"
-                    }
-                },
-                "required":["to","subject","body"]
-            }
-        ),
-        Tool(
-            name="send_password_reset",
-            description="Send a password reset email with secure reset link",
-            inputSchema={
-                "type":"object",
-                "properties":{
-                    "email":{
-                        "type":"string",
-                        "description":"User's email address"
-                }
-                },   
-                "required":["email"]
-            }
-        ),
-        Tool(
-            name="send_refund_confirmation",
-            description="send refund confirmation email with refund details",
-            inputSchema={
-                "type":"object",
-                "properties":{
-                    "email":{
-                        "type":"string",
-                        "description":"User's email address"
-                },
-                    "refund_id":{
-                        "type":"string",
-                        "description":"Refund ID"
-                    },
-                    "amount":{
-                        "type":"number",
-                        "description":"Refund amount in dollar"
-                    },
-                    "order_id":{
-                        "type":"string",
-                        "description":"Original order ID"
-                }
-                },
-                "required":["email","refund_id","amount","order_id"]
-            }
-        ),
-        Tool(
-            name="send_ticket_confirmation",
-            description="Send a support ticket confirmation email",
-            inputSchema={
-                "type":"object",
-                "properties":{
-                    "email":{
-                        "type":"string",
-                        "description":"User's email address"
-                },
-                    "tikect_id":{
-                        "type":"string",
-                        "description":"Support ticket ID"
-                },
-                    "issue_type":{
-                        "type":"string",
-                        "description":"Type of the issue (eg. billing,technical,general)"
-                }
-                },   
-                "required":["email","ticket_id","issue_type"]
-            }
-        )
-    ]
-    
-@mcp_server.call_tool()
-async def call_tool(name:str,arguments:dict[str,Any])->list[TextContent]:
-    """Handel tool calls"""
-    
-    if name == "send_email":
-        result=send_email(
-            arguments['to'],
-            arguments['subject'],
-            arguments['body'],
-        )
-    elif name=="send_password_reset":
-        result=send_password_reset(arguments["email"])
-    elif name == "send_refund_confirmation":
-        result=send_refund_confirmation(
-            arguments['email'],
-            arguments['refund_id'],
-            arguments['amount'],
-            arguments['order_id'],
-        )
-        
-    elif name=="send_ticket_confirmation":
-        result=send_ticket_confirmation(
-            arguments['email'],
-            arguments['ticket_id'],
-            arguments['issue_type'],
-        )
-    else:
-        result={"error":f"Unkown tool : {name}"}
+    return registry.list_tools()
+    
+@mcp_server.call_tool(validate_input=False)
+async def call_tool(name:str,arguments:dict[str,Any])->Any:
+    """Handel tool calls, arguments are validated by the registry"""
+    
+    try:
+        with span("server call_tool",traceparent=request_traceparent(mcp_server),server="mock-email-server",tool=name):
+            result=await registry.dispatch(name,arguments,progress_reporter(mcp_server))
+    except ValueError as e:
+        result={"error":str(e)}
         
-    return [TextContent(type="text",text=json.dumps(result,indent=2))]
+    return tool_response(result)
 
 
 async def main():
-    """Run the MCP server over STDIO"""
-    print("Starting Mock Email MCP server (STDIO)",file=sys.stderr)
-    
-    async with stdio_server() as (read_stream,write_stream):
-        await mcp_server.run(
-            read_stream,
-            write_stream,
-            mcp_server.create_initialization_options()
-        )
+    """Run the MCP server over STDIO, or over HTTP for many clients at once"""
+    parser=argparse.ArgumentParser(description="Mock email MCP server")
+    parser.add_argument("--dataset",default=DATASET,help="dataset directory whose email history to serve (see mcp_servers.dataset)")
+    add_transport_args(parser,default_port=8002)
+    args=parser.parse_args()
+    
+    global EMAIL_LOG
+    EMAIL_LOG.close()
+    EMAIL_LOG=open_history(args.dataset)
+    
+    print(f"Starting Mock Email MCP server ({args.transport.upper()})",file=sys.stderr)
+    
+    OUTBOX.start()
+    try:
+        await serve(mcp_server,args.transport,args.host,args.port)
+    finally:
+        await OUTBOX.stop()
+        EMAIL_LOG.close()
         
 if __name__=="__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
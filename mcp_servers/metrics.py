@@ -0,0 +1,325 @@
+"""
+Metrics and trace spans of the mock servers, shared with the client.
+
+The servers import nothing from the client side; the client reaches the
+same process wide METRICS and span through mcp_metrics.
+
+this module handles:
+
+Counters and latency histograms per metric and label set
+(connects, tool calls, ...), readable as a dict or as Prometheus text
+Optional trace spans, enabled by pointing MCP_TRACE_FILE at a file.
+Spans are appended there as JSON lines; servers spawned over stdio
+inherit the variable, so one file holds both sides of a call, linked by
+a W3C traceparent sent in the request's _meta
+
+Servers also answer server_stats from here and read the client's
+traceparent with request_traceparent.
+
+Usage:
+    with METRICS.timer("mcp_tool_call",tool="get_orders") as timer:
+        result=run()
+        timer.error=not result.get("success",True)
+
+    METRICS.prometheus()
+"""
+
+import os
+import json
+import time
+import secrets
+import threading
+import contextlib
+import contextvars
+from typing import Any,Iterator,Optional
+from dataclasses import dataclass,field
+
+# histogram bucket upper bounds in seconds, +Inf is implied
+BUCKETS=(0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+
+TRACE_FILE=os.environ.get("MCP_TRACE_FILE")
+
+Labels=tuple[tuple[str,str],...]
+
+
+@dataclass
+class Series:
+    count:int=0
+    errors:int=0
+    total:float=0.0
+    max:float=0.0
+    buckets:list[int]=field(default_factory=lambda:[0]*(len(BUCKETS)+1))
+
+    def observe(self,seconds:float,error:bool)->None:
+        self.count+=1
+        self.errors+=error
+        self.total+=seconds
+        self.max=max(self.max,seconds)
+        index=0
+        while index<len(BUCKETS) and seconds>BUCKETS[index]:
+            index+=1
+        self.buckets[index]+=1
+
+    def quantile(self,q:float)->float:
+        """Estimate a quantile by interpolating inside its bucket"""
+
+        if not self.count:
+            return 0.0
+        rank=q*self.count
+        seen=0
+        for index,hits in enumerate(self.buckets):
+            if hits and seen+hits>=rank:
+                lower=BUCKETS[index-1] if index else 0.0
+                upper=BUCKETS[index] if index<len(BUCKETS) else self.max
+                return min(lower+(upper-lower)*(rank-seen)/hits,self.max)
+            seen+=hits
+        return self.max
+
+    def summary(self)->dict[str,Any]:
+        return {
+            "count":self.count,
+            "errors":self.errors,
+            "mean_ms":self.total/self.count*1000 if self.count else 0.0,
+            "p50_ms":self.quantile(0.5)*1000,
+            "p90_ms":self.quantile(0.9)*1000,
+            "p99_ms":self.quantile(0.99)*1000,
+            "max_ms":self.max*1000
+        }
+
+
+class Timer:
+    """Set error=True inside a timer block to count the call as failed"""
+
+    def __init__(self):
+        self.error=False
+
+
+class Metrics:
+
+    def __init__(self):
+        self._series:dict[str,dict[Labels,Series]]={}
+        self._lock=threading.Lock()
+        self.started=time.time()
+
+    def observe(self,name:str,seconds:float,error:bool=False,**labels:str)->None:
+        """
+        Record one event.
+
+        Args:
+            name:Metric name, e.g. mcp_tool_call
+            seconds:How long it took
+            error:Whether it failed
+            labels:Label values, e.g. tool="get_orders"
+        """
+
+        key=tuple(sorted((k,str(v)) for k,v in labels.items()))
+        with self._lock:
+            series=self._series.setdefault(name,{}).get(key)
+            if series is None:
+                series=self._series[name][key]=Series()
+            series.observe(seconds,error)
+
+    @contextlib.contextmanager
+    def timer(self,name:str,**labels:str)->Iterator[Timer]:
+        """Time a block, an exception counts as an error"""
+
+        timer=Timer()
+        started=time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.error=True
+            raise
+        finally:
+            self.observe(name,time.perf_counter()-started,timer.error,**labels)
+
+    def counts(self,name:str)->dict[Labels,int]:
+        """Event count per label set of one metric"""
+
+        with self._lock:
+            return {key:series.count for key,series in self._series.get(name,{}).items()}
+
+    def snapshot(self)->dict[str,list[dict[str,Any]]]:
+        """Summary per metric and label set, busiest first"""
+
+        with self._lock:
+            return {
+                name:sorted(
+                    ({"labels":dict(key),**series.summary()} for key,series in by_labels.items()),
+                    key=lambda row:row["count"],
+                    reverse=True
+                )
+                for name,by_labels in self._series.items()
+            }
+
+    def prometheus(self)->str:
+        """Prometheus text exposition of every metric"""
+
+        lines=[]
+        with self._lock:
+            for name,by_labels in sorted(self._series.items()):
+                lines.append(f"# TYPE {name}_total counter")
+                for key,series in by_labels.items():
+                    lines.append(f"{name}_total{_labels(key)} {series.count}")
+                lines.append(f"# TYPE {name}_errors_total counter")
+                for key,series in by_labels.items():
+                    lines.append(f"{name}_errors_total{_labels(key)} {series.errors}")
+                lines.append(f"# TYPE {name}_seconds histogram")
+                for key,series in by_labels.items():
+                    cumulative=0
+                    for bound,hits in zip((*BUCKETS,"+Inf"),series.buckets):
+                        cumulative+=hits
+                        lines.append(f"{name}_seconds_bucket{_labels(key,le=bound)} {cumulative}")
+                    lines.append(f"{name}_seconds_sum{_labels(key)} {series.total}")
+                    lines.append(f"{name}_seconds_count{_labels(key)} {series.count}")
+        return "\n".join(lines)+"\n"
+
+    def dump(self,path:str)->None:
+        """Write the Prometheus text to a file, e.g. for a node exporter textfile collector"""
+
+        tmp=f"{path}.tmp"
+        with open(tmp,"w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp,path)
+
+    def reset(self)->None:
+        with self._lock:
+            self._series.clear()
+
+
+def _labels(key:Labels,**extra:Any)->str:
+    pairs=[*key,*((k,str(v)) for k,v in extra.items())]
+    if not pairs:
+        return ""
+    escape=lambda v:v.replace("\\","\\\\").replace('"','\\"').replace("\n","\\n")
+    return "{"+",".join(f'{k}="{escape(v)}"' for k,v in pairs)+"}"
+
+
+# process wide metrics, shared by everything in the client or a server
+METRICS=Metrics()
+
+
+@dataclass
+class Span:
+    name:str
+    trace_id:str
+    span_id:str
+    parent_id:Optional[str]
+    attributes:dict[str,Any]
+    start:float=field(default_factory=time.time)
+    error:Optional[str]=None
+
+    def traceparent(self)->str:
+        """W3C trace context header for this span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+_current_span:contextvars.ContextVar[Optional[Span]]=contextvars.ContextVar("mcp_span",default=None)
+
+
+def tracing_enabled()->bool:
+    return bool(TRACE_FILE)
+
+
+def _parse_traceparent(traceparent:Optional[str])->Optional[tuple[str,str]]:
+    parts=(traceparent or "").split("-")
+    if len(parts)==4 and len(parts[1])==32 and len(parts[2])==16:
+        return parts[1],parts[2]
+    return None
+
+
+@contextlib.contextmanager
+def span(name:str,traceparent:Optional[str]=None,**attributes:Any)->Iterator[Optional[Span]]:
+    """
+    Trace a block when MCP_TRACE_FILE is set, a no-op yielding None otherwise.
+
+    Args:
+        name:Span name
+        traceparent:Remote parent, used when there is no current span
+        attributes:Extra fields written with the span
+    """
+
+    if not TRACE_FILE:
+        yield None
+        return
+
+    parent=_current_span.get()
+    if parent is not None:
+        trace_id,parent_id=parent.trace_id,parent.span_id
+    else:
+        trace_id,parent_id=_parse_traceparent(traceparent) or (secrets.token_hex(16),None)
+
+    current=Span(name,trace_id,secrets.token_hex(8),parent_id,attributes)
+    token=_current_span.set(current)
+    started=time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error=f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _write_span(current,time.perf_counter()-started)
+
+
+def current_traceparent()->Optional[str]:
+    current=_current_span.get()
+    return current.traceparent() if current else None
+
+
+def _write_span(current:Span,seconds:float)->None:
+    line=json.dumps({
+        "trace_id":current.trace_id,
+        "span_id":current.span_id,
+        "parent_id":current.parent_id,
+        "name":current.name,
+        "pid":os.getpid(),
+        "start":current.start,
+        "duration_ms":seconds*1000,
+        "error":current.error,
+        **current.attributes
+    },default=str)
+    # one write per line on an O_APPEND file, so client and server
+    # processes can share the trace file
+    fd=os.open(TRACE_FILE,os.O_WRONLY|os.O_APPEND|os.O_CREAT,0o644)
+    try:
+        os.write(fd,(line+"\n").encode())
+    finally:
+        os.close(fd)
+
+
+def request_traceparent(server:Any)->Optional[str]:
+    """traceparent the client sent in the _meta of the request being handled"""
+
+    try:
+        meta=server.request_context.meta
+    except LookupError:
+        return None
+    if meta is None:
+        return None
+    return getattr(meta,"traceparent",None) or (meta.model_extra or {}).get("traceparent")
+
+
+def server_stats(server_name:str,format:str="json")->dict[str,Any]:
+    """
+    Result of a server's server_stats tool.
+
+    Args:
+        server_name:Reported server name
+        format:json for per tool summaries, prometheus for the text dump
+    Returns:
+        Tool result dict
+    """
+
+    if format=="prometheus":
+        return {"success":True,"server":server_name,"format":"prometheus","text":METRICS.prometheus()}
+    if format!="json":
+        return {"success":False,"error":f"Unknown format: {format}, use json or prometheus"}
+
+    return {
+        "success":True,
+        "server":server_name,
+        "pid":os.getpid(),
+        "uptime_s":round(time.time()-METRICS.started,3),
+        "metrics":METRICS.snapshot()
+    }
@@ -0,0 +1,84 @@
+"""
+Columnar view of the order table for fleet-wide scans.
+
+Each order becomes one row across parallel NumPy arrays (customer code,
+day number, amount in cents), so questions about every customer at once
+are answered with a handful of vectorized array operations instead of a
+Python loop per customer.
+"""
+
+from typing import Any,Iterable,Optional
+
+import numpy as np
+
+
+class OrderColumns:
+
+    def __init__(
+        self,
+        customer_ids:list[str],
+        customer:np.ndarray,
+        day:np.ndarray,
+        cents:np.ndarray,
+        orders:list[dict[str,Any]]
+    ):
+        # customer[i] indexes customer_ids, orders[i] is the source record
+        self.customer_ids=customer_ids
+        self.customer_codes={customer_id:code for code,customer_id in enumerate(customer_ids)}
+        self.customer_count=len(customer_ids)
+        self.customer=customer
+        self.day=day
+        self.cents=cents
+        self.orders=orders
+
+    def __len__(self)->int:
+        return len(self.orders)
+
+    @classmethod
+    def from_orders(cls,orders_by_customer:dict[str,list[dict[str,Any]]])->"OrderColumns":
+        customer_ids=list(orders_by_customer)
+        orders=[]
+        codes=[]
+        for code,customer_id in enumerate(customer_ids):
+            customer_orders=orders_by_customer[customer_id]
+            orders.extend(customer_orders)
+            codes.append(np.full(len(customer_orders),code,dtype=np.int32))
+
+        customer=np.concatenate(codes) if codes else np.empty(0,dtype=np.int32)
+        day=np.array([order["Date"] for order in orders],dtype="datetime64[D]").astype(np.int32)
+        cents=np.rint(np.array([order["Amount"] for order in orders],dtype=np.float64)*100).astype(np.int64)
+        return cls(customer_ids,customer,day,cents,orders)
+
+    def rows_for(self,customer_ids:Optional[Iterable[str]])->np.ndarray:
+        """Row numbers belonging to the given customers, every row if None"""
+
+        if customer_ids is None:
+            return np.arange(len(self.orders))
+        codes=[self.customer_codes[c] for c in customer_ids if c in self.customer_codes]
+        return np.flatnonzero(np.isin(self.customer,np.array(codes,dtype=np.int32)))
+
+    def matched_customers(self,customer_ids:Iterable[str])->int:
+        """How many distinct customers of customer_ids exist here"""
+
+        return len({customer_id for customer_id in customer_ids if customer_id in self.customer_codes})
+
+    def duplicate_rows(self,rows:np.ndarray)->np.ndarray:
+        """
+        Rows that repeat an earlier (customer, date, amount) charge.
+
+        Group-by via a stable lexsort: equal keys end up adjacent in their
+        original order, and every row equal to its predecessor is a repeat.
+        Returned rows are sorted by customer, date and amount.
+        """
+
+        if len(rows)<2:
+            return np.empty(0,dtype=np.int64)
+
+        customer=self.customer[rows]
+        day=self.day[rows]
+        cents=self.cents[rows]
+        order=np.lexsort((cents,day,customer))
+
+        customer,day,cents=customer[order],day[order],cents[order]
+        repeat=(customer[1:]==customer[:-1])&(day[1:]==day[:-1])&(cents[1:]==cents[:-1])
+        return rows[order[1:][repeat]]
@@ -0,0 +1,439 @@
+"""
+Memory-mapped columnar order file for the mock database server.
+
+Orders as Python dicts cost hundreds of bytes each and must all be built
+at startup. An order file stores them as columns instead and is opened
+with mmap, so opening it is instant, the page cache is shared by every
+process that maps it (database shards, restarts) and only the pages a
+query touches are read.
+
+Layout, after an 8 byte magic and a length prefixed JSON header that
+lists every column's dtype, length and offset (64 byte aligned):
+
+customer_keys     sorted customer IDs, fixed width bytes
+customer_offsets  rows of customer i are customer_offsets[i]:customer_offsets[i+1]
+customer          customer code (index into customer_keys) per row
+order_id          fixed width bytes per row
+day, cents        date as days since 1970-01-01, amount in cents
+status, item, reference
+                  codes into the string table, -1 when the order has no such key
+strings           distinct string values, UTF-8 bytes with string_offsets
+order_keys        sorted order IDs, with order_rows the row of each
+
+Rows are grouped by customer in customer_keys order, so a customer's
+orders are one contiguous slice and lookups are binary searches on the
+mapped arrays; nothing is indexed in memory.
+
+    python -m mcp_servers.order_file convert orders.json orders.bin
+    python -m mcp_servers.order_file info orders.bin
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from typing import Any,Iterable,Optional
+from pathlib import Path
+
+import numpy as np
+
+from mcp_servers.order_columns import OrderColumns
+
+MAGIC=b"MCPORDS1"
+VERSION=1
+
+_LENGTH=struct.Struct("<I")
+_ALIGN=64
+
+# (order key, column) of the dictionary encoded string fields
+STRING_COLUMNS=(("Status","status"),("Item","item"),("Reference","reference"))
+
+
+def _aligned(offset:int)->int:
+    return -(-offset//_ALIGN)*_ALIGN
+
+
+class OrderFileWriter:
+    """
+    Streams orders into an order file.
+
+    Orders may arrive in any customer order; rows are buffered in NumPy
+    chunks and sorted by customer once on close. The file is written to a
+    temp path and renamed, so readers never see a partial file.
+
+        with OrderFileWriter("orders.bin") as writer:
+            for customer_id,order in orders:
+                writer.add(customer_id,order)
+    """
+
+    def __init__(self,path:str|Path,chunk_rows:int=65536):
+        self.path=Path(path)
+        self.chunk_rows=chunk_rows
+        self.rows=0
+        self._strings:dict[str,int]={}
+        self._pending:dict[str,list]=self._empty()
+        self._chunks:dict[str,list[np.ndarray]]={name:[] for name in self._pending}
+
+    def _empty(self)->dict[str,list]:
+        return {name:[] for name in ("customer","order_id","date","amount",*(column for _,column in STRING_COLUMNS))}
+
+    def string_code(self,value:Any)->int:
+        """Code of a Status/Item/Reference value in the string table, -1 for None"""
+
+        if value is None:
+            return -1
+        value=str(value)
+        code=self._strings.get(value)
+        if code is None:
+            code=self._strings[value]=len(self._strings)
+        return code
+
+    def add(self,customer_id:str,order:dict[str,Any])->None:
+        pending=self._pending
+        pending["customer"].append(customer_id)
+        pending["order_id"].append(order["OrderID"])
+        pending["date"].append(order["Date"])
+        pending["amount"].append(order["Amount"])
+        for key,column in STRING_COLUMNS:
+            pending[column].append(self.string_code(order.get(key)))
+        self.rows+=1
+        if len(pending["customer"])>=self.chunk_rows:
+            self._flush()
+
+    def add_columns(
+        self,
+        customer:np.ndarray,
+        order_id:np.ndarray,
+        day:np.ndarray,
+        cents:np.ndarray,
+        **codes:np.ndarray
+    )->None:
+        """
+        Add a block of orders given as columns, the fast path for bulk loads.
+
+        Args:
+            customer:Customer IDs, bytes array
+            order_id:Order IDs, bytes array
+            day:Dates as days since 1970-01-01
+            cents:Amounts in cents
+            codes:status, item and reference string codes (see
+                string_code), -1 for every row if omitted
+        """
+
+        unknown=codes.keys()-{column for _,column in STRING_COLUMNS}
+        if unknown:
+            raise ValueError(f"Unknown string column(s): {', '.join(sorted(unknown))}")
+
+        # keep rows in the order they were added
+        self._flush()
+        rows=len(customer)
+        chunks=self._chunks
+        chunks["customer"].append(np.asarray(customer,dtype="S"))
+        chunks["order_id"].append(np.asarray(order_id,dtype="S"))
+        chunks["date"].append(np.asarray(day,dtype=np.int32))
+        chunks["amount"].append(np.asarray(cents,dtype=np.int64))
+        for _,column in STRING_COLUMNS:
+            values=codes.get(column)
+            chunks[column].append(np.full(rows,-1,dtype=np.int32) if values is None else np.asarray(values,dtype=np.int32))
+        self.rows+=rows
+
+    def add_many(self,orders_by_customer:dict[str,list[dict[str,Any]]])->None:
+        for customer_id,orders in orders_by_customer.items():
+            for order in orders:
+                self.add(customer_id,order)
+
+    def _flush(self)->None:
+        pending,self._pending=self._pending,self._empty()
+        if not pending["customer"]:
+            return
+        chunks=self._chunks
+        chunks["customer"].append(np.array([c.encode() for c in pending["customer"]],dtype="S"))
+        chunks["order_id"].append(np.array([o.encode() for o in pending["order_id"]],dtype="S"))
+        chunks["date"].append(np.array(pending["date"],dtype="datetime64[D]").astype(np.int32))
+        chunks["amount"].append(np.rint(np.array(pending["amount"],dtype=np.float64)*100).astype(np.int64))
+        for _,column in STRING_COLUMNS:
+            chunks[column].append(np.array(pending[column],dtype=np.int32))
+
+    def _column(self,name:str,dtype:str)->np.ndarray:
+        chunks=self._chunks[name]
+        return np.concatenate(chunks) if chunks else np.empty(0,dtype=dtype)
+
+    def close(self)->int:
+        """
+        Sort, index and write the file.
+
+        Returns:
+            Number of orders written
+        Raises:
+            ValueError: if an order ID appears twice
+        """
+
+        self._flush()
+        customer=self._column("customer","S1")
+        # stable, so each customer's orders keep their insertion order
+        order=np.argsort(customer,kind="stable")
+        customer=customer[order]
+        order_id=self._column("order_id","S1")[order]
+
+        customer_keys,first,codes=np.unique(customer,return_index=True,return_inverse=True)
+        order_rows=np.argsort(order_id,kind="stable")
+        order_keys=order_id[order_rows]
+        repeated=np.flatnonzero(order_keys[1:]==order_keys[:-1])
+        if repeated.size:
+            raise ValueError(f"Duplicate order ID: {order_keys[repeated[0]].decode()}")
+
+        encoded=[value.encode() for value in self._strings]
+        string_offsets=np.zeros(len(encoded)+1,dtype=np.int64)
+        np.cumsum([len(value) for value in encoded],out=string_offsets[1:])
+
+        columns={
+            "customer_keys":customer_keys,
+            "customer_offsets":np.append(first,len(customer)).astype(np.int64),
+            "customer":codes.astype(np.int32).reshape(-1),
+            "order_id":order_id,
+            "day":self._column("date","int32")[order],
+            "cents":self._column("amount","int64")[order],
+            **{column:self._column(column,"int32")[order] for _,column in STRING_COLUMNS},
+            "strings":np.frombuffer(b"".join(encoded),dtype=np.uint8),
+            "string_offsets":string_offsets,
+            "order_keys":order_keys,
+            "order_rows":order_rows.astype(np.int64)
+        }
+        self._write(columns)
+        self._chunks={name:[] for name in self._chunks}
+        return len(customer)
+
+    def _write(self,columns:dict[str,np.ndarray])->None:
+        specs={}
+        offset=0
+        for name,array in columns.items():
+            offset=_aligned(offset)
+            specs[name]={"dtype":array.dtype.str,"count":len(array),"offset":offset}
+            offset+=array.nbytes
+
+        header=json.dumps({
+            "version":VERSION,
+            "rows":len(columns["customer"]),
+            "customers":len(columns["customer_keys"]),
+            "columns":specs
+        }).encode()
+        data_start=_aligned(len(MAGIC)+_LENGTH.size+len(header))
+
+        self.path.parent.mkdir(parents=True,exist_ok=True)
+        tmp=self.path.with_name(self.path.name+".tmp")
+        with open(tmp,"wb") as f:
+            f.write(MAGIC+_LENGTH.pack(len(header))+header)
+            for name,array in columns.items():
+                f.seek(data_start+specs[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp,self.path)
+
+    def __enter__(self)->"OrderFileWriter":
+        return self
+
+    def __exit__(self,exc_type,exc,tb)->None:
+        if exc_type is None:
+            self.close()
+
+
+def write_order_file(path:str|Path,orders_by_customer:dict[str,list[dict[str,Any]]])->int:
+    """Write orders keyed by customer ID to an order file, returns the row count"""
+
+    writer=OrderFileWriter(path)
+    writer.add_many(orders_by_customer)
+    return writer.close()
+
+
+class OrderFile:
+    """Read-only view of an order file, every column is a NumPy view of the mapping"""
+
+    def __init__(self,path:str|Path):
+        self.path=Path(path)
+        with open(self.path,"rb") as f:
+            self._map=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)]!=MAGIC:
+            raise ValueError(f"{self.path} is not an order file")
+        size=_LENGTH.unpack_from(self._map,len(MAGIC))[0]
+        start=len(MAGIC)+_LENGTH.size
+        self.header=json.loads(self._map[start:start+size])
+        if self.header["version"]!=VERSION:
+            raise ValueError(f"{self.path}: unsupported order file version {self.header['version']}")
+
+        data_start=_aligned(start+size)
+        columns={
+            name:np.frombuffer(self._map,dtype=spec["dtype"],count=spec["count"],offset=data_start+spec["offset"])
+            for name,spec in self.header["columns"].items()
+        }
+        self.customer_keys=columns["customer_keys"]
+        self.customer_offsets=columns["customer_offsets"]
+        self.customer=columns["customer"]
+        self.order_id=columns["order_id"]
+        self.day=columns["day"]
+        self.cents=columns["cents"]
+        self.string_codes=[(key,columns[column]) for key,column in STRING_COLUMNS]
+        self.order_keys=columns["order_keys"]
+        self.order_rows=columns["order_rows"]
+
+        # the distinct values are few (statuses, items), decode them once
+        blob,offsets=columns["strings"],columns["string_offsets"].tolist()
+        self.strings=[blob[a:b].tobytes().decode() for a,b in zip(offsets,offsets[1:])]
+
+    def __len__(self)->int:
+        return len(self.customer)
+
+    @property
+    def customer_count(self)->int:
+        return len(self.customer_keys)
+
+    def customer_id(self,code:int)->str:
+        return self.customer_keys[code].decode()
+
+    def customer_code(self,customer_id:str)->Optional[int]:
+        key=customer_id.encode()
+        index=int(np.searchsorted(self.customer_keys,key))
+        if index<len(self.customer_keys) and self.customer_keys[index]==key:
+            return index
+        return None
+
+    def customer_range(self,customer_id:str)->tuple[int,int]:
+        """(start, stop) rows of a customer's orders, empty if unknown"""
+
+        code=self.customer_code(customer_id)
+        if code is None:
+            return 0,0
+        return int(self.customer_offsets[code]),int(self.customer_offsets[code+1])
+
+    def find_order(self,order_id:str)->Optional[int]:
+        """Row of an order ID"""
+
+        key=order_id.encode()
+        index=int(np.searchsorted(self.order_keys,key))
+        if index<len(self.order_keys) and self.order_keys[index]==key:
+            return int(self.order_rows[index])
+        return None
+
+    def orders(self,start:int,stop:int)->list[dict[str,Any]]:
+        """Rows start:stop as order dicts, in the server's order shape"""
+
+        order_ids=self.order_id[start:stop].tolist()
+        dates=self.day[start:stop].astype("datetime64[D]").astype(str).tolist()
+        cents=self.cents[start:stop].tolist()
+        codes=[(key,column[start:stop].tolist()) for key,column in self.string_codes]
+        strings=self.strings
+
+        orders=[]
+        for i,order_id in enumerate(order_ids):
+            order={"OrderID":order_id.decode(),"Amount":cents[i]/100,"Date":dates[i]}
+            for key,column in codes:
+                if column[i]>=0:
+                    order[key]=strings[column[i]]
+            orders.append(order)
+        return orders
+
+    def order(self,row:int)->dict[str,Any]:
+        return self.orders(row,row+1)[0]
+
+    def customer_of(self,row:int)->str:
+        return self.customer_id(int(self.customer[row]))
+
+    def columns(self,owned:Optional[np.ndarray]=None)->"MappedOrderColumns":
+        return MappedOrderColumns(self,owned)
+
+
+class _CustomerIds:
+    """customer_ids sequence of an order file, decoded on access"""
+
+    def __init__(self,orders:OrderFile):
+        self._orders=orders
+
+    def __len__(self)->int:
+        return self._orders.customer_count
+
+    def __getitem__(self,code:int)->str:
+        return self._orders.customer_id(int(code))
+
+
+class _Rows:
+    """orders sequence of an order file, each row built on access"""
+
+    def __init__(self,orders:OrderFile):
+        self._orders=orders
+
+    def __len__(self)->int:
+        return len(self._orders)
+
+    def __getitem__(self,row:int)->dict[str,Any]:
+        return self._orders.order(int(row))
+
+
+class MappedOrderColumns(OrderColumns):
+    """OrderColumns over the mapped arrays of an order file, nothing is copied"""
+
+    def __init__(self,orders:OrderFile,owned:Optional[np.ndarray]=None):
+        """
+        Args:
+            orders:The order file
+            owned:Per customer code, whether the customer belongs to this
+                store (a database shard); all customers if None
+        """
+
+        self.file=orders
+        self.customer_ids=_CustomerIds(orders)
+        self.customer=orders.customer
+        self.day=orders.day
+        self.cents=orders.cents
+        self.orders=_Rows(orders)
+        self.owned=owned
+        self.customer_count=int(owned.sum()) if owned is not None else orders.customer_count
+
+    def rows_for(self,customer_ids:Optional[Iterable[str]])->np.ndarray:
+        if customer_ids is None:
+            if self.owned is None:
+                return np.arange(len(self.file))
+            return np.flatnonzero(self.owned[self.customer])
+
+        ranges=[]
+        for customer_id in set(customer_ids):
+            code=self.file.customer_code(customer_id)
+            if code is not None and (self.owned is None or self.owned[code]):
+                ranges.append(np.arange(self.file.customer_offsets[code],self.file.customer_offsets[code+1]))
+        if not ranges:
+            return np.empty(0,dtype=np.int64)
+        return np.sort(np.concatenate(ranges))
+
+    def matched_customers(self,customer_ids:Iterable[str])->int:
+        codes={self.file.customer_code(customer_id) for customer_id in customer_ids}
+        return sum(1 for code in codes if code is not None and (self.owned is None or self.owned[code]))
+
+
+def main():
+    import argparse
+
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub=parser.add_subparsers(dest="command",required=True)
+    convert=sub.add_parser("convert",help="write an order file from JSON orders keyed by customer ID")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    info=sub.add_parser("info",help="print an order file's header")
+    info.add_argument("path")
+    args=parser.parse_args()
+
+    if args.command=="convert":
+        with open(args.source) as f:
+            rows=write_order_file(args.target,json.load(f))
+        print(f"Wrote {rows} orders to {args.target}",file=sys.stderr)
+    else:
+        orders=OrderFile(args.path)
+        print(json.dumps({
+            "rows":len(orders),
+            "customers":orders.customer_count,
+            "strings":len(orders.strings),
+            "bytes":os.path.getsize(args.path)
+        },indent=2))
+
+if __name__=="__main__":
+    main()
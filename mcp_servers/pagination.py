@@ -0,0 +1,232 @@
+"""
+Cursor pagination and streamed results shared by the mock servers.
+
+List tools return one page at a time. A page is taken lazily from a
+generator, so only the page itself is ever built, however long the
+underlying history is. The position of the next page travels in an
+opaque cursor: URL safe base64 of a small JSON state, tagged with the
+tool and the scope (customer, address, ...) it belongs to, so a cursor
+cannot be replayed against another tool or another customer. Cursors are
+signed with an HMAC, so a client can only hand back states the server
+issued: email history cursors hold spill file offsets. The key is random
+per process unless MCP_CURSOR_KEY is set, which keeps cursors valid
+across restarts and between processes serving the same data.
+
+Tools registered with a Pagination (see registry.py) also accept
+stream=true. When the client sent a progressToken with the call, the
+registry then walks every page itself and sends each one as a progress
+notification, its message holding the page as JSON:
+
+    {"page":1,"orders":[...],"next_cursor":"..."}
+
+The final tool result carries the totals and an empty item list, so the
+client sees the first page after one page of work and no side holds more
+than one page at a time. Without a progressToken stream is ignored and a
+single page comes back.
+"""
+
+import os
+import hmac
+import json
+import base64
+import hashlib
+import secrets
+import binascii
+import itertools
+from dataclasses import dataclass
+from typing import Any,Awaitable,Callable,Iterable,Optional,TypeVar
+
+from mcp_servers.serialization import encode
+
+T=TypeVar("T")
+
+# awaited with (progress, total, message), see progress_reporter
+Progress=Callable[[float,Optional[float],str],Awaitable[None]]
+
+# bytes of HMAC-SHA256 kept in a cursor
+SIGNATURE_SIZE=16
+
+CURSOR_KEY=os.environ.get("MCP_CURSOR_KEY","").encode() or secrets.token_bytes(32)
+
+STREAM_DESCRIPTION="Send every page as a progress notification instead of returning one page (needs a progressToken)"
+
+
+class CursorError(ValueError):
+    """Raised for a cursor that is malformed or belongs to another tool"""
+
+
+@dataclass(frozen=True)
+class Pagination:
+    """How a list tool pages its results"""
+
+    # result key holding the page
+    items:str
+    # result key holding the total item count, if the tool reports one
+    total:Optional[str]=None
+
+    def meta(self)->dict[str,Any]:
+        """Tool _meta entry telling clients how to follow the cursors"""
+
+        meta={"items":self.items,"cursor":"cursor","next_cursor":"next_cursor"}
+        if self.total:
+            meta["total"]=self.total
+        return meta
+
+    @classmethod
+    def from_meta(cls,meta:Optional[dict[str,Any]])->Optional["Pagination"]:
+        """Pagination of a tool from its _meta, None for tools that do not page"""
+
+        pagination=(meta or {}).get("pagination")
+        if not pagination:
+            return None
+        return cls(items=pagination["items"],total=pagination.get("total"))
+
+
+def _sign(raw:bytes)->bytes:
+    return hmac.new(CURSOR_KEY,raw,hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+
+def encode_cursor(tool:str,state:dict[str,Any],scope:Optional[str]=None)->str:
+    """
+    Opaque cursor for the next page of tool.
+
+    Args:
+        tool:Tool name
+        state:Where the next page starts, small JSON serializable values
+        scope:What the listing is of, e.g. the customer ID
+    """
+
+    raw=json.dumps([tool,scope,state],separators=(",",":")).encode()
+    return base64.urlsafe_b64encode(_sign(raw)+raw).rstrip(b"=").decode()
+
+
+def decode_cursor(tool:str,cursor:str,scope:Optional[str]=None)->dict[str,Any]:
+    """
+    State stored in a cursor of tool.
+
+    Raises:
+        CursorError: if the cursor is malformed, was not signed by this
+            server or was issued by another tool or for another scope
+    """
+
+    try:
+        raw=base64.urlsafe_b64decode(cursor+"="*(-len(cursor)%4))
+        signature,raw=raw[:SIGNATURE_SIZE],raw[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature,_sign(raw)):
+            raise CursorError(f"Invalid cursor: {cursor}")
+        issuer,issued_for,state=json.loads(raw)
+    except (binascii.Error,ValueError,TypeError):
+        raise CursorError(f"Invalid cursor: {cursor}") from None
+    if issuer!=tool or not isinstance(state,dict):
+        raise CursorError(f"Cursor {cursor} does not belong to {tool}")
+    if issued_for!=scope:
+        raise CursorError(f"Cursor {cursor} was issued for {issued_for}, not {scope}")
+    return state
+
+
+def cursor_offset(tool:str,cursor:Optional[str],scope:Optional[str]=None)->int:
+    """
+    Position stored by offset_cursor, 0 for no cursor.
+
+    Raises:
+        CursorError: as decode_cursor, or if the cursor holds no valid position
+    """
+
+    if cursor is None:
+        return 0
+    offset=decode_cursor(tool,cursor,scope).get("offset")
+    if not isinstance(offset,int) or isinstance(offset,bool) or offset<0:
+        raise CursorError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def offset_cursor(tool:str,offset:int,more:bool,scope:Optional[str]=None)->Optional[str]:
+    """next_cursor of a page ending at offset, None on the last page"""
+    return encode_cursor(tool,{"offset":offset},scope) if more else None
+
+
+def page_size(limit:int,maximum:int)->int:
+    """limit clamped to 1..maximum"""
+    return max(min(limit,maximum),1)
+
+
+def take_page(items:Iterable[T],limit:int)->tuple[list[T],bool]:
+    """
+    First limit items of a (lazy) iterable.
+
+    Returns:
+        The page, and whether more items follow it. One item past the page
+        is read to tell.
+    """
+
+    page=list(itertools.islice(items,limit+1))
+    more=len(page)>limit
+    return page[:limit],more
+
+
+def progress_reporter(server:Any)->Optional[Progress]:
+    """
+    Sends progress notifications for the request being handled.
+
+    Args:
+        server:Low level MCP server
+    Returns:
+        None outside a request or when the client sent no progressToken
+    """
+
+    try:
+        context=server.request_context
+    except LookupError:
+        return None
+    token=getattr(context.meta,"progressToken",None) if context.meta else None
+    if token is None:
+        return None
+
+    async def report(progress:float,total:Optional[float],message:str)->None:
+        await context.session.send_progress_notification(
+            token,progress,total,message,related_request_id=context.request_id
+        )
+    return report
+
+
+async def stream_pages(
+    fetch:Callable[[Optional[str]],Awaitable[Any]],
+    pagination:Pagination,
+    progress:Progress,
+    cursor:Optional[str]=None
+)->Any:
+    """
+    Send every page of a list tool as a progress notification.
+
+    Args:
+        fetch:Runs the tool for one page, given the cursor (None for the first)
+        pagination:The tool's Pagination
+        progress:Notification sender from progress_reporter
+        cursor:Where to start, None for the first page
+    Returns:
+        The last page's result with an empty item list and a streamed
+        summary, or the first failed result as is
+    """
+
+    sent=0
+    pages=0
+    while True:
+        result=await fetch(cursor)
+        if not isinstance(result,dict) or result.get("success") is False or "error" in result:
+            return result
+
+        page=result.get(pagination.items) or []
+        cursor=result.get("next_cursor")
+        sent+=len(page)
+        pages+=1
+        total=result.get(pagination.total) if pagination.total else None
+        await progress(
+            sent,
+            total if isinstance(total,(int,float)) else None,
+            encode({"page":pages,pagination.items:page,"next_cursor":cursor})
+        )
+        # an empty page cannot move the cursor, stop rather than loop
+        if cursor is None or not page:
+            result[pagination.items]=[]
+            result["streamed"]={"pages":pages,"items":sent}
+            return result
@@ -0,0 +1,166 @@
+"""
+Append-only refund ledger for the mock database server.
+
+Every refund is one JSON line in a log file. The ledger keeps two indexes
+in memory, by order ID and by client supplied idempotency key, and
+rebuilds them by replaying the log at startup.
+
+Writes use group commit: concurrent refunds are appended to the same
+batch and made durable by a single write + fsync, and each caller is
+answered once its batch is on disk.
+"""
+
+import os
+import json
+import asyncio
+from typing import Any,Optional
+from pathlib import Path
+
+
+class RefundLedger:
+
+    def __init__(
+        self,
+        path:Optional[Path]=None,
+        flush_interval:float=0.002,
+        max_batch:int=512,
+        id_prefix:str="REF"
+    ):
+        """
+        Args:
+            path:Log file, kept in memory only if None
+            flush_interval:Seconds to wait for more refunds before a flush
+            max_batch:Refunds per batch that trigger an immediate flush
+            id_prefix:Refund ID prefix, unique per ledger when several
+                ledgers hand out IDs (one per database shard)
+        """
+
+        self.path=Path(path) if path else None
+        self.id_prefix=id_prefix
+        self.flush_interval=flush_interval
+        self.max_batch=max_batch
+
+        self.by_order:dict[str,dict[str,Any]]={}
+        self.by_key:dict[str,dict[str,Any]]={}
+        self.count=0
+
+        self._batch:list[bytes]=[]
+        self._batch_done:Optional[asyncio.Future]=None
+        self._batch_full=asyncio.Event()
+        self._flusher:Optional[asyncio.Task]=None
+        # refund_id -> future of the batch that makes it durable
+        self._unflushed:dict[str,asyncio.Future]={}
+
+        self._file=None
+        if self.path:
+            self.path.parent.mkdir(parents=True,exist_ok=True)
+            self._replay()
+            self._file=open(self.path,"ab")
+
+    def _replay(self)->None:
+        if not self.path.exists():
+            return
+
+        with open(self.path,"rb") as f:
+            data=f.read()
+
+        good=0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                self._index(json.loads(line))
+            except ValueError:
+                break
+            good+=len(line)
+
+        if good<len(data):
+            # drop a torn write left behind by a crash mid-append
+            print(f"Truncating {len(data)-good} bytes of incomplete refund log",flush=True)
+            with open(self.path,"r+b") as f:
+                f.truncate(good)
+
+    def _index(self,refund:dict[str,Any])->None:
+        self.by_order[refund["order_id"]]=refund
+        if refund.get("idempotency_key"):
+            self.by_key[refund["idempotency_key"]]=refund
+        self.count+=1
+
+    def _unindex(self,refund:dict[str,Any])->None:
+        if self.by_order.get(refund["order_id"]) is refund:
+            del self.by_order[refund["order_id"]]
+        if refund.get("idempotency_key") and self.by_key.get(refund["idempotency_key"]) is refund:
+            del self.by_key[refund["idempotency_key"]]
+        self.count-=1
+
+    def next_refund_id(self)->str:
+        return f"{self.id_prefix}-{self.count+1:05d}"
+
+    def get_by_order(self,order_id:str)->Optional[dict[str,Any]]:
+        return self.by_order.get(order_id)
+
+    async def get_by_key(self,idempotency_key:str)->Optional[dict[str,Any]]:
+        """Refund recorded under an idempotency key, once it is durable"""
+
+        refund=self.by_key.get(idempotency_key)
+        if refund is not None and refund["refund_id"] in self._unflushed:
+            await asyncio.shield(self._unflushed[refund["refund_id"]])
+        return refund
+
+    async def record(self,refund:dict[str,Any])->dict[str,Any]:
+        """
+        Add a refund and wait until it is on disk.
+
+        The indexes are updated before the first await, so a concurrent
+        retry already sees the refund while its batch is being written.
+        """
+
+        self._index(refund)
+        if self.path is None:
+            return refund
+
+        if self._batch_done is None:
+            self._batch_done=asyncio.get_running_loop().create_future()
+        done=self._batch_done
+        self._batch.append(json.dumps(refund,separators=(",",":")).encode()+b"\n")
+        self._unflushed[refund["refund_id"]]=done
+
+        if len(self._batch)>=self.max_batch:
+            self._batch_full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher=asyncio.create_task(self._flush_loop())
+
+        try:
+            await asyncio.shield(done)
+        except Exception:
+            # never acknowledged, so it must not block a retry either
+            self._unindex(refund)
+            raise
+        return refund
+
+    async def _flush_loop(self)->None:
+        loop=asyncio.get_running_loop()
+        while self._batch:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(),self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+
+            batch,done=self._batch,self._batch_done
+            self._batch,self._batch_done=[],None
+
+            try:
+                await loop.run_in_executor(None,self._write,b"".join(batch))
+            except Exception as e:
+                done.set_exception(e)
+            else:
+                done.set_result(None)
+            finally:
+                for refund_id in [r for r,f in self._unflushed.items() if f is done]:
+                    del self._unflushed[refund_id]
+
+    def _write(self,data:bytes)->None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -0,0 +1,278 @@
+"""
+Declarative tool registry shared by the mock servers.
+
+Tools are plain functions registered with a decorator. The registry
+builds each tool's MCP schema once from the function signature, so the
+advertised name and parameters cannot drift from the code that runs.
+It also compiles an argument validator per tool, dispatches calls
+through a dict lookup and records per tool metrics (see metrics.py).
+List tools registered with a Pagination can stream every page as
+progress notifications (see pagination.py):
+
+    registry=ToolRegistry()
+
+    @registry.tool(
+        description="Lookup a customer by email address",
+        params={"email":"Customer email address"}
+    )
+    def get_customer(email:str):
+        ...
+"""
+
+import types
+import inspect
+import typing
+from dataclasses import dataclass
+from typing import Any,Callable,Optional
+
+from mcp.types import Tool,ToolAnnotations
+
+from mcp_servers.metrics import METRICS,span
+from mcp_servers.pagination import STREAM_DESCRIPTION,Pagination,Progress,stream_pages
+
+_JSON_TYPES:dict[Any,tuple[str,tuple[type,...]]]={
+    str:("string",(str,)),
+    int:("integer",(int,)),
+    float:("number",(int,float)),
+    bool:("boolean",(bool,)),
+    list:("array",(list,)),
+    dict:("object",(dict,)),
+}
+
+
+class ToolArgumentError(ValueError):
+    """Raised when a call's arguments do not match the tool's signature"""
+
+
+@dataclass
+class _Param:
+    name:str
+    required:bool
+    accepts:tuple[type,...]
+    json_type:str
+
+
+@dataclass
+class RegisteredTool:
+    name:str
+    func:Callable[...,Any]
+    definition:Tool
+    params:list[_Param]
+    is_async:bool
+    pagination:Optional[Pagination]=None
+
+    def validate(self,arguments:dict[str,Any])->dict[str,Any]:
+        """Check arguments against the signature and return the call kwargs"""
+
+        unknown=arguments.keys()-{param.name for param in self.params}
+        if unknown:
+            raise ToolArgumentError(f"{self.name}: unexpected argument(s): {', '.join(sorted(unknown))}")
+
+        kwargs={}
+        for param in self.params:
+            if param.name not in arguments:
+                if param.required:
+                    raise ToolArgumentError(f"{self.name}: missing required argument: {param.name}")
+                continue
+            value=arguments[param.name]
+            # bool is an int subclass but never a valid number here
+            if value is not None and (
+                not isinstance(value,param.accepts) or (isinstance(value,bool) and bool not in param.accepts)
+            ):
+                raise ToolArgumentError(f"{self.name}: argument {param.name} must be of type {param.json_type}")
+            kwargs[param.name]=value
+        return kwargs
+
+
+def _unwrap_optional(annotation:Any)->tuple[Any,bool]:
+    """(inner type, allows None) for X, Optional[X] and X|None"""
+
+    origin=typing.get_origin(annotation)
+    if origin in (typing.Union,types.UnionType):
+        args=[arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args)==1:
+            return args[0],True
+    return annotation,False
+
+
+def _json_schema(annotation:Any)->tuple[dict[str,Any],tuple[type,...]]:
+    """JSON schema fragment and accepted Python types for a parameter annotation"""
+
+    origin=typing.get_origin(annotation) or annotation
+    if origin not in _JSON_TYPES:
+        raise TypeError(f"Unsupported tool parameter type: {annotation}")
+
+    json_type,accepts=_JSON_TYPES[origin]
+    schema:dict[str,Any]={"type":json_type}
+    if origin is list and typing.get_args(annotation):
+        item_type=typing.get_args(annotation)[0]
+        schema["items"]=_json_schema(item_type)[0] if item_type in _JSON_TYPES else {"type":"object"}
+    return schema,accepts
+
+
+class ToolRegistry:
+
+    def __init__(self):
+        self._tools:dict[str,RegisteredTool]={}
+        self._definitions:list[Tool]=[]
+
+    def tool(
+        self,
+        description:Optional[str]=None,
+        params:Optional[dict[str,Any]]=None,
+        name:Optional[str]=None,
+        input_schema:Optional[dict[str,Any]]=None,
+        annotations:Optional[ToolAnnotations]=None,
+        meta:Optional[dict[str,Any]]=None,
+        pagination:Optional[Pagination]=None
+    )->Callable[[Callable[...,Any]],Callable[...,Any]]:
+        """
+        Register a function as a tool.
+
+        Args:
+            description:Tool description, the docstring if omitted
+            params:Per parameter description string, or a dict of extra
+                schema keys (description, example, ...)
+            name:Tool name, the function name if omitted
+            input_schema:Hand written schema for inputs the signature
+                cannot express, arguments are still checked against the signature
+            annotations:MCP behaviour hints (read only, destructive, ...)
+            meta:Tool _meta, e.g. the client cache policy (see mcp_result_cache)
+            pagination:For list tools taking a cursor and returning
+                next_cursor, adds the stream argument
+        """
+
+        def decorator(func:Callable[...,Any])->Callable[...,Any]:
+            self.register(
+                func,
+                description=description,
+                params=params,
+                name=name,
+                input_schema=input_schema,
+                annotations=annotations,
+                meta=meta,
+                pagination=pagination
+            )
+            return func
+        return decorator
+
+    def register(
+        self,
+        func:Callable[...,Any],
+        description:Optional[str]=None,
+        params:Optional[dict[str,Any]]=None,
+        name:Optional[str]=None,
+        input_schema:Optional[dict[str,Any]]=None,
+        annotations:Optional[ToolAnnotations]=None,
+        meta:Optional[dict[str,Any]]=None,
+        pagination:Optional[Pagination]=None
+    )->RegisteredTool:
+        name=name or func.__name__
+        if name in self._tools:
+            raise ValueError(f"Tool {name} is already registered")
+
+        params=params or {}
+        hints=typing.get_type_hints(func)
+        properties:dict[str,Any]={}
+        required:list[str]=[]
+        compiled:list[_Param]=[]
+
+        for param in inspect.signature(func).parameters.values():
+            annotation,nullable=_unwrap_optional(hints.get(param.name,str))
+            schema,accepts=_json_schema(annotation)
+
+            extra=params.get(param.name,{})
+            schema.update({"description":extra} if isinstance(extra,str) else extra)
+            if param.default is not inspect.Parameter.empty and param.default is not None:
+                schema["default"]=param.default
+            properties[param.name]=schema
+
+            is_required=param.default is inspect.Parameter.empty and not nullable
+            if is_required:
+                required.append(param.name)
+            compiled.append(_Param(param.name,is_required,accepts,schema["type"]))
+
+        unknown=params.keys()-properties.keys()
+        if unknown:
+            raise ValueError(f"{name}: descriptions for unknown parameter(s): {', '.join(sorted(unknown))}")
+
+        if pagination is not None:
+            # handled by dispatch, the function never sees it
+            properties["stream"]={"type":"boolean","description":STREAM_DESCRIPTION,"default":False}
+            meta={**(meta or {}),"pagination":pagination.meta()}
+
+        if input_schema is None:
+            input_schema={"type":"object","properties":properties}
+            if required:
+                input_schema["required"]=required
+
+        registered=RegisteredTool(
+            name=name,
+            func=func,
+            definition=Tool(
+                name=name,
+                description=description or inspect.getdoc(func) or "",
+                inputSchema=input_schema,
+                annotations=annotations,
+                **({"_meta":meta} if meta else {})
+            ),
+            params=compiled,
+            is_async=inspect.iscoroutinefunction(func),
+            pagination=pagination
+        )
+        self._tools[name]=registered
+        self._definitions.append(registered.definition)
+        return registered
+
+    def list_tools(self)->list[Tool]:
+        """Tool definitions, built once at registration"""
+        return self._definitions
+
+    def __contains__(self,name:str)->bool:
+        return name in self._tools
+
+    async def dispatch(self,name:str,arguments:dict[str,Any],progress:Optional[Progress]=None)->Any:
+        """
+        Validate arguments and run a tool.
+
+        Args:
+            name:Tool name
+            arguments:Tool arguments
+            progress:Progress sender of the request (see pagination.progress_reporter),
+                a list tool called with stream=true streams its pages to it
+        Raises:
+            ToolArgumentError: for unknown tools and invalid arguments
+        """
+
+        tool=self._tools.get(name)
+        if tool is None:
+            raise ToolArgumentError(f"Unknown tool: {name}")
+
+        arguments=arguments or {}
+        stream=False
+        if tool.pagination is not None and "stream" in arguments:
+            stream=arguments["stream"]
+            if not isinstance(stream,bool):
+                raise ToolArgumentError(f"{name}: argument stream must be of type boolean")
+            arguments={key:value for key,value in arguments.items() if key!="stream"}
+
+        with METRICS.timer("mcp_tool_call",tool=name) as timer,span(f"tool {name}",tool=name):
+            kwargs=tool.validate(arguments)
+            if stream and progress is not None:
+                async def fetch(cursor:Optional[str])->Any:
+                    return await self._run(tool,{**kwargs,"cursor":cursor})
+                result=await stream_pages(fetch,tool.pagination,progress,kwargs.get("cursor"))
+            else:
+                result=await self._run(tool,kwargs)
+            timer.error=_is_error(result)
+        return result
+
+    async def _run(self,tool:RegisteredTool,kwargs:dict[str,Any])->Any:
+        if tool.is_async:
+            return await tool.func(**kwargs)
+        return tool.func(**kwargs)
+
+
+def _is_error(result:Any)->bool:
+    """Tools report failures in their result rather than by raising"""
+    return isinstance(result,dict) and (result.get("success") is False or "error" in result)
@@ -0,0 +1,61 @@
+"""
+Response serialization shared by the mock servers.
+
+Tool results are encoded once, compactly (no indentation or spaces after
+separators), with orjson when it is installed and the standard library
+otherwise. The format is picked with MCP_RESPONSE_FORMAT:
+
+compact     compact JSON text (default)
+structured  compact JSON text plus MCP structuredContent, so clients can
+            read the result without parsing text
+pretty      indented JSON text, the old format, handy when debugging
+"""
+
+import os
+import json
+from typing import Any
+
+from mcp.types import TextContent
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+RESPONSE_FORMATS=("compact","structured","pretty")
+RESPONSE_FORMAT=os.environ.get("MCP_RESPONSE_FORMAT","compact")
+
+
+def _default(value:Any)->Any:
+    # NumPy scalars leak out of the columnar scans
+    if hasattr(value,"item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(result:Any,pretty:bool=False)->str:
+    """Encode a tool result as JSON text"""
+
+    if pretty:
+        return json.dumps(result,indent=2,default=_default)
+    if orjson is not None:
+        return orjson.dumps(result,default=_default,option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(result,separators=(",",":"),ensure_ascii=False,default=_default)
+
+
+def tool_response(result:dict[str,Any],response_format:str|None=None)->Any:
+    """
+    Build the return value of a call_tool handler.
+
+    Args:
+        result:Tool result
+        response_format:One of RESPONSE_FORMATS, RESPONSE_FORMAT if None
+    Returns:
+        Text content, or (text content, structured content)
+    """
+
+    response_format=response_format or RESPONSE_FORMAT
+    content=[TextContent(type="text",text=encode(result,pretty=response_format=="pretty"))]
+    if response_format=="structured":
+        return content,result
+    return content
@@ -0,0 +1,144 @@
+"""
+Transports shared by the mock servers.
+
+A server runs over stdio by default, one private process per client. With
+--transport http (streamable HTTP) or sse, one process serves many client
+sessions over keep-alive HTTP connections. Every session shares the
+server's module state (customer store, refund ledger, outbox, ...), so a
+fleet of agents can share one warm server:
+
+    python -m mcp_servers.database_server --transport http --port 8001
+
+and point mcp_config.yaml at it:
+
+    - name: database
+      type: http
+      url: http://127.0.0.1:8001/mcp
+
+HTTP servers also serve their metrics as Prometheus text on /metrics.
+"""
+
+import os
+import sys
+import argparse
+import contextlib
+from typing import Any
+
+from mcp.server import Server
+from mcp.server.stdio import stdio_server
+
+from mcp_servers.metrics import METRICS
+
+TRANSPORTS=("stdio","http","sse")
+
+# streamable HTTP endpoint, and the SSE stream / message endpoints
+HTTP_PATH="/mcp"
+SSE_PATH="/sse"
+MESSAGES_PATH="/messages/"
+METRICS_PATH="/metrics"
+
+
+def add_transport_args(parser:argparse.ArgumentParser,default_port:int)->None:
+    """Add --transport, --host and --port to a server's argument parser"""
+
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default=os.environ.get("MCP_TRANSPORT","stdio"),
+        help="stdio (default), http for streamable HTTP, or sse"
+    )
+    parser.add_argument("--host",default=os.environ.get("MCP_HOST","127.0.0.1"))
+    parser.add_argument("--port",type=int,default=int(os.environ.get("MCP_PORT",default_port)))
+
+
+def http_app(mcp_server:Server,transport:str="http")->Any:
+    """
+    ASGI app serving mcp_server to many concurrent sessions.
+
+    Args:
+        mcp_server:The low level MCP server
+        transport:"http" for streamable HTTP or "sse"
+    Returns:
+        Starlette application
+    """
+
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse,Response
+    from starlette.routing import Mount,Route
+
+    async def handle_metrics(request):
+        return PlainTextResponse(METRICS.prometheus(),media_type="text/plain; version=0.0.4")
+
+    if transport=="sse":
+        from mcp.server.sse import SseServerTransport
+
+        sse=SseServerTransport(MESSAGES_PATH)
+
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope,request.receive,request._send) as (read_stream,write_stream):
+                await mcp_server.run(read_stream,write_stream,mcp_server.create_initialization_options())
+            return Response()
+
+        return Starlette(routes=[
+            Route(SSE_PATH,endpoint=handle_sse,methods=["GET"]),
+            Route(METRICS_PATH,endpoint=handle_metrics),
+            Mount(MESSAGES_PATH,app=sse.handle_post_message)
+        ])
+
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+    # stateful sessions, each client keeps its session id across requests
+    session_manager=StreamableHTTPSessionManager(app=mcp_server)
+
+    async def handle_http(scope,receive,send):
+        await session_manager.handle_request(scope,receive,send)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[Mount(HTTP_PATH,app=handle_http),Route(METRICS_PATH,endpoint=handle_metrics)],
+        lifespan=lifespan
+    )
+
+
+async def serve(mcp_server:Server,transport:str="stdio",host:str="127.0.0.1",port:int=8000)->None:
+    """
+    Run an MCP server until it is stopped.
+
+    Args:
+        mcp_server:The low level MCP server
+        transport:One of TRANSPORTS
+        host:Bind address for http and sse
+        port:Bind port for http and sse
+    """
+
+    if transport=="stdio":
+        async with stdio_server() as (read_stream,write_stream):
+            await mcp_server.run(
+                read_stream,
+                write_stream,
+                mcp_server.create_initialization_options()
+            )
+        return
+
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport: {transport}")
+
+    import uvicorn
+
+    path=HTTP_PATH if transport=="http" else SSE_PATH
+    print(f"Serving {mcp_server.name} on http://{host}:{port}{path}",file=sys.stderr)
+
+    # agents reuse their connection between calls, keep it open well past
+    # uvicorn's 5 second default
+    config=uvicorn.Config(
+        http_app(mcp_server,transport),
+        host=host,
+        port=port,
+        timeout_keep_alive=75,
+        log_level="warning"
+    )
+    await uvicorn.Server(config).serve()
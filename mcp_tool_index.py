@@ -0,0 +1,321 @@
+"""
+MCP Tool Index - one index over the tools of every connected mcp server.
+
+this module handles:
+naming tools uniquely across servers, server__tool when two servers share a name
+detecting tool name collisions
+resolving a tool name to its server in one dict lookup
+ranking tools against a user message with BM25
+a toolset that hands the agent only the top k tools for each turn
+
+Every tool in the agent's toolset is declared in every model request, so
+prompts grow with each server added. RankedToolset ranks the tools against
+the turn's user message and only declares the best matches. Ranking is a
+local BM25 over the tool name, description, parameter names and the server
+description: no embeddings, no extra model call, a few microseconds per
+turn for hundreds of tools. A message that matches no tool gets the tools
+called most often, then most recently, instead.
+
+The index is rebuilt by MCPManager whenever the set of connections changes.
+
+"""
+
+import os
+import re
+import sys
+import math
+import heapq
+from typing import Any,Callable,Iterable
+from dataclasses import dataclass,field
+
+from google.adk.tools.base_toolset import BaseToolset
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_connect import MCPConnection,call_tool,tool_name
+from mcp_metrics import METRICS
+from mcp_schema_cache import CachedMcpTool,tool_schema
+
+# separator of server and tool in a namespaced name, model APIs only
+# allow [a-zA-Z0-9_-] in function names
+NAMESPACE_SEPARATOR="__"
+
+# BM25 parameters, the usual defaults
+K1=1.2
+B=0.75
+
+# tool names say the most about a tool, count their words this many times
+NAME_WEIGHT=3
+
+STOPWORDS=frozenset((
+    "a","an","and","are","as","at","be","by","can","do","for","from","get","has","have",
+    "i","if","in","is","it","me","my","of","on","or","please","the","this","to","was",
+    "we","what","when","with","you","your"
+))
+
+_WORD=re.compile(r"[a-z0-9]+")
+_CAMEL=re.compile(r"([a-z0-9])([A-Z])")
+_INVALID_NAME=re.compile(r"[^a-zA-Z0-9_-]")
+
+
+def _stem(word:str)->str:
+    """Crude suffix folding so 'orders' matches 'order' and 'charged' matches 'charge'"""
+
+    if len(word)>4 and word.endswith("ies"):
+        return word[:-3]+"y"
+    for suffix in ("ing","ed","s"):
+        if len(word)>len(suffix)+2 and word.endswith(suffix) and not word.endswith("ss"):
+            word=word[:-len(suffix)]
+            break
+    if len(word)>4 and word.endswith("e"):
+        word=word[:-1]
+    return word
+
+
+def tokenize(text:str)->list[str]:
+    """Lower case word stems of text, snake_case and camelCase split into words"""
+
+    text=_CAMEL.sub(r"\1 \2",text).lower()
+    return [_stem(word) for word in _WORD.findall(text) if word not in STOPWORDS]
+
+
+def namespaced(server_name:str,name:str)->str:
+    """Name of a server's tool that is unique across servers"""
+
+    return _INVALID_NAME.sub("_",f"{server_name}{NAMESPACE_SEPARATOR}{name}")
+
+
+def _document(entry:"ToolEntry")->list[str]:
+    """Words a tool is found by"""
+
+    schema=entry.schema
+    words=tokenize(entry.remote_name)*NAME_WEIGHT
+    words+=tokenize(schema.get("description",""))
+    for param,spec in ((schema.get("inputSchema") or {}).get("properties") or {}).items():
+        words+=tokenize(param)
+        if isinstance(spec,dict):
+            words+=tokenize(spec.get("description",""))
+    words+=tokenize(entry.connection.server.description)
+    return words
+
+
+@dataclass
+class ToolEntry:
+    # name the agent sees, unique across servers
+    name:str
+    # name of the tool on its server
+    remote_name:str
+    connection:MCPConnection
+    tool:Any
+    schema:dict[str,Any]=field(default_factory=dict)
+
+    @property
+    def server(self)->str:
+        return self.connection.server.name
+
+
+class ToolIndex:
+    """
+    Tools of a set of connections, by name and by relevance.
+
+    A tool keeps its own name unless another server has a tool of the same
+    name; then each of them is exposed as server__tool and the clash is
+    listed in collisions. With namespace=True every tool is exposed as
+    server__tool. resolve() accepts both forms as long as the short one is
+    unambiguous.
+
+    """
+
+    def __init__(self,connections:Iterable[MCPConnection]=(),namespace:bool=False):
+        """
+        Args:
+            connections:Connections whose tools to index, in priority order
+            namespace:Expose every tool as server__tool, not just colliding ones
+        """
+
+        self.namespace=namespace
+        self.entries:list[ToolEntry]=[]
+        # tool name -> servers that have a tool by that name, for names on more than one server
+        self.collisions:dict[str,list[str]]={}
+        self._by_name:dict[str,ToolEntry]={}
+
+        # BM25 postings, word -> [(entry position, weight)], the weight is
+        # the word's whole contribution to a score so search only adds
+        self._postings:dict[str,list[tuple[int,float]]]={}
+
+        self._build(list(connections))
+
+    def _build(self,connections:list[MCPConnection])->None:
+        owners:dict[str,list[str]]={}
+        for connection in connections:
+            for tool in connection.tool:
+                owners.setdefault(tool_name(tool),[]).append(connection.server.name)
+        self.collisions={name:servers for name,servers in owners.items() if len(servers)>1}
+
+        for name,servers in self.collisions.items():
+            print(f"Tool {name} is defined by {', '.join(servers)}, exposed as {', '.join(namespaced(server,name) for server in servers)}")
+
+        for connection in connections:
+            for tool in connection.tool:
+                remote_name=tool_name(tool)
+                name=remote_name
+                if self.namespace or remote_name in self.collisions:
+                    name=namespaced(connection.server.name,remote_name)
+
+                schema=getattr(tool,'schema',None) or tool_schema(tool)
+                if name!=remote_name:
+                    # the connection keeps its placeholder, the agent gets a renamed copy
+                    tool=CachedMcpTool(schema,connection,name=name)
+
+                entry=ToolEntry(name=name,remote_name=remote_name,connection=connection,tool=tool,schema=schema)
+                self.entries.append(entry)
+                self._by_name[name]=entry
+                self._by_name.setdefault(namespaced(connection.server.name,remote_name),entry)
+                if remote_name not in self.collisions:
+                    self._by_name.setdefault(remote_name,entry)
+
+        self._index_terms()
+
+    def _index_terms(self)->None:
+        documents=[_document(entry) for entry in self.entries]
+        if not documents:
+            return
+
+        average=sum(len(words) for words in documents)/len(documents) or 1.0
+        frequencies:dict[str,dict[int,int]]={}
+        for position,words in enumerate(documents):
+            for word in words:
+                counts=frequencies.setdefault(word,{})
+                counts[position]=counts.get(position,0)+1
+
+        total=len(documents)
+        for word,counts in frequencies.items():
+            idf=math.log(1+(total-len(counts)+0.5)/(len(counts)+0.5))
+            self._postings[word]=[
+                (position,idf*tf*(K1+1)/(tf+K1*(1-B+B*len(documents[position])/average)))
+                for position,tf in counts.items()
+            ]
+
+    def __len__(self)->int:
+        return len(self.entries)
+
+    def resolve(self,name:str)->ToolEntry:
+        """
+        The tool behind a name the agent used.
+
+        Args:
+            name:Exposed name, or server__tool
+        Raises:
+            KeyError: if no tool has that name
+        """
+
+        entry=self._by_name.get(name)
+        if entry is None:
+            if name in self.collisions:
+                raise KeyError(f"Tool {name} is ambiguous, one of {', '.join(namespaced(server,name) for server in self.collisions[name])}")
+            raise KeyError(f"Unknown tool {name}")
+        return entry
+
+    async def call(self,name:str,arguments:dict[str,Any],tool_context:Any=None)->Any:
+        """Call a tool by its exposed or namespaced name"""
+
+        entry=self.resolve(name)
+        return await call_tool(entry.connection,entry.remote_name,arguments,tool_context)
+
+    def tools(self)->list[Any]:
+        """Every tool, under its exposed name"""
+
+        return [entry.tool for entry in self.entries]
+
+    def scores(self,query:str)->dict[int,float]:
+        """BM25 score per entry position, entries that share no word with query are left out"""
+
+        scores:dict[int,float]={}
+        for word in set(tokenize(query)):
+            for position,weight in self._postings.get(word,()):
+                scores[position]=scores.get(position,0.0)+weight
+        return scores
+
+    def usage(self)->dict[int,tuple[int,float]]:
+        """
+        (calls, last use of its server) per entry position, the ranking
+        used when a query matches no tool. Calls are counted by
+        mcp_connect in the process wide METRICS, so they survive rebuilds.
+        """
+
+        calls={}
+        for key,count in METRICS.counts("mcp_client_tool_call").items():
+            labels=dict(key)
+            calls[labels.get("server"),labels.get("tool")]=count
+        return {
+            position:(calls.get((entry.server,entry.remote_name),0),entry.connection.last_used)
+            for position,entry in enumerate(self.entries)
+        }
+
+    def search(self,query:str,top_k:int=8,pinned:Iterable[str]=())->list[ToolEntry]:
+        """
+        The tools most relevant to a query.
+
+        Args:
+            query:Usually the user's message for this turn
+            top_k:Most tools to return, pinned ones not counted
+            pinned:Tools to always include, by exposed or server side name,
+                so batch pins the batch tool of every server
+        Returns:
+            Matching entries, best first, then the pinned ones. When nothing
+            matches, the top_k tools by usage instead, so a vague message
+            still gets the likeliest tools and never the whole fleet.
+        """
+
+        scores=self.scores(query)
+        if scores:
+            best=heapq.nlargest(top_k,scores.items(),key=lambda item:(item[1],-item[0]))
+        else:
+            best=heapq.nlargest(top_k,self.usage().items(),key=lambda item:(item[1],-item[0]))
+        chosen=[self.entries[position] for position,_ in best]
+        pinned=set(pinned)
+        if pinned:
+            chosen+=[
+                entry for entry in self.entries
+                if (entry.name in pinned or entry.remote_name in pinned) and entry not in chosen
+            ]
+        return chosen
+
+
+def _message_text(content:Any)->str:
+    """Text parts of a genai Content"""
+
+    parts=getattr(content,'parts',None) or []
+    return " ".join(part.text for part in parts if getattr(part,'text',None))
+
+
+class RankedToolset(BaseToolset):
+    """
+    Agent toolset that only declares the tools relevant to the current turn.
+
+    ADK asks a toolset for its tools once per invocation, this one ranks
+    the index against the invocation's user message and returns the top k.
+    The index is fetched on every call, so servers added or removed by a
+    reload show up on the next turn.
+
+    """
+
+    def __init__(self,index:Callable[[],ToolIndex],top_k:int=8,pinned:Iterable[str]=()):
+        """
+        Args:
+            index:Returns the current ToolIndex, e.g. lambda:manager.tool_index
+            top_k:Most tools declared per turn, pinned ones not counted
+            pinned:Names of tools to declare on every turn
+        """
+
+        super().__init__()
+        self.index=index
+        self.top_k=top_k
+        self.pinned=tuple(pinned)
+
+    async def get_tools(self,readonly_context:Any=None)->list[Any]:
+        index=self.index()
+        query=_message_text(getattr(readonly_context,'user_content',None)) if readonly_context else ""
+        if not query or len(index)<=self.top_k:
+            return index.tools()
+        return [entry.tool for entry in index.search(query,self.top_k,self.pinned)]
@@ -0,0 +1,401 @@
+"""
+Mcp zygote - this file handles spawning stdio servers from a pre-warmed
+process instead of a fresh interpreter
+
+this module handles:
+
+serve   a long-lived zygote that imports the server stack (mcp, pydantic,
+        anyio, numpy, ...) once, then forks a child per request. The child
+        takes over the requester's stdin/stdout/stderr and runs the server
+        module as __main__, so it answers initialize without paying the
+        interpreter startup and the stack imports again
+launch  the command a client spawns instead of `python -m module`. It is
+        run with `python -S -I` and only imports the standard library, so
+        it starts in a few milliseconds. It hands its stdio file
+        descriptors to the zygote over a Unix socket (SCM_RIGHTS), forwards
+        termination signals to the child and exits when the child does.
+        Without a zygote it execs the normal command instead
+
+The server modules themselves are not preloaded: they read their
+environment (ledger paths, response format, ...) at import time, and each
+child gets the environment of the client that asked for it.
+
+Enable per server with `zygote: true` in mcp_config.yaml; MCPManager
+starts the zygote when a server needs it.
+The socket is created 0600 in a directory only this user can enter
+($XDG_RUNTIME_DIR, else /tmp/mcp-zygote-<uid>), and both ends check the
+other's uid before a request is sent or served: a request carries the
+client's environment and stdio.
+The zygote is this interpreter, so a server whose command resolves to
+another python or another venv is spawned normally instead.
+
+    python mcp_zygote.py serve [--socket PATH] [--preload mod,mod]
+"""
+
+import os
+import sys
+import json
+import array
+import socket
+import signal
+import struct
+
+# the socket lives in a directory only this user can enter, the runtime
+# dir when there is one; serve creates and checks it
+DEFAULT_SOCKET=os.environ.get(
+    "MCP_ZYGOTE_SOCKET",
+    os.path.join(
+        os.environ.get("XDG_RUNTIME_DIR") or os.path.join("/tmp",f"mcp-zygote-{os.getuid()}"),
+        "mcp-zygote.sock"
+    ) if hasattr(os,"getuid") else ""
+)
+
+# third party modules the servers import, safe to import before fork
+DEFAULT_PRELOAD=(
+    "anyio",
+    "pydantic",
+    "mcp",
+    "mcp.types",
+    "mcp.server",
+    "mcp.server.lowlevel",
+    "mcp.server.stdio",
+    "mcp.shared.session",
+    "numpy",
+)
+
+ZYGOTE_SCRIPT=os.path.abspath(__file__)
+_HEADER=struct.Struct("!I")
+
+
+def _recv_exact(conn:socket.socket,size:int)->bytes:
+    data=b""
+    while len(data)<size:
+        chunk=conn.recv(size-len(data))
+        if not chunk:
+            raise ConnectionError("zygote connection closed")
+        data+=chunk
+    return data
+
+
+def _peer_is_me(conn:socket.socket)->bool:
+    """Whether the process at the other end of a Unix socket runs as this user"""
+
+    if not hasattr(socket,"SO_PEERCRED"):
+        # no peer credentials here, the private socket directory has to do
+        return True
+    creds=conn.getsockopt(socket.SOL_SOCKET,socket.SO_PEERCRED,struct.calcsize("3i"))
+    _,uid,_=struct.unpack("3i",creds)
+    return uid==os.getuid()
+
+
+def _private_dir(path:str)->None:
+    """
+    Create the socket's directory, or check an existing one.
+
+    Raises:
+        PermissionError: if another user owns it or can write to it
+    """
+
+    os.makedirs(path,mode=0o700,exist_ok=True)
+    info=os.stat(path)
+    if info.st_uid!=os.getuid() or info.st_mode&0o022:
+        raise PermissionError(f"{path} must be owned by this user and writable by no one else")
+
+
+def _module_args(command:list[str])->tuple[str,list[str]]|None:
+    """(module, args) for a `python -m module args` command"""
+
+    if len(command)>=3 and command[1]=="-m":
+        return command[2],command[3:]
+    return None
+
+
+def launch(socket_path:str,command:list[str])->None:
+    """
+    Run command's server module in a zygote child bound to this process's stdio.
+
+    Args:
+        socket_path:Zygote socket
+        command:The normal server command, [python, -m, module, args...]
+    """
+
+    target=_module_args(command)
+    conn=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        if target is None:
+            raise OSError("not a python -m command")
+        conn.connect(socket_path)
+        # the environment and stdio only go to a zygote of this user
+        if not _peer_is_me(conn):
+            raise OSError(f"{socket_path} is served by another user")
+    except OSError:
+        conn.close()
+        os.execvp(command[0],command)
+
+    module,args=target
+    payload=json.dumps({"module":module,"args":args,"env":dict(os.environ),"cwd":os.getcwd()}).encode()
+    conn.sendmsg(
+        [_HEADER.pack(len(payload))+payload],
+        [(socket.SOL_SOCKET,socket.SCM_RIGHTS,array.array("i",[0,1,2]))]
+    )
+    pid=json.loads(_recv_exact(conn,_HEADER.unpack(_recv_exact(conn,_HEADER.size))[0]))["pid"]
+
+    # the child owns the pipes now, so the client sees EOF when it exits
+    devnull=os.open(os.devnull,os.O_RDWR)
+    os.dup2(devnull,0)
+    os.dup2(devnull,1)
+
+    def forward(signum,frame):
+        try:
+            os.kill(pid,signum)
+        except ProcessLookupError:
+            pass
+        sys.exit(128+signum)
+
+    for signum in (signal.SIGTERM,signal.SIGINT,signal.SIGHUP):
+        signal.signal(signum,forward)
+
+    # the child holds its end of the connection until it exits
+    while conn.recv(4096):
+        pass
+    sys.exit(0)
+
+
+def _receive(conn:socket.socket)->tuple[dict,list[int]]:
+    fds=array.array("i")
+    data,ancdata,_,_=conn.recvmsg(65536,socket.CMSG_SPACE(3*fds.itemsize))
+    if not data:
+        raise ConnectionError("zygote connection closed")
+    for level,kind,cmsg in ancdata:
+        if level==socket.SOL_SOCKET and kind==socket.SCM_RIGHTS:
+            fds.frombytes(cmsg[:len(cmsg)-len(cmsg)%fds.itemsize])
+    if len(data)<_HEADER.size:
+        data+=_recv_exact(conn,_HEADER.size-len(data))
+    size=_HEADER.unpack(data[:_HEADER.size])[0]
+    body=data[_HEADER.size:]
+    body+=_recv_exact(conn,size-len(body))
+    return json.loads(body),list(fds)
+
+
+def _run_child(conn:socket.socket,request:dict,fds:list[int])->None:
+    """Become the requested server, never returns"""
+
+    import random
+    import runpy
+    import traceback
+
+    code=1
+    try:
+        # out of the zygote's session, so a ^C aimed at the zygote does
+        # not reach the servers
+        os.setsid()
+        for target,fd in zip((0,1,2),fds):
+            os.dup2(fd,target)
+            os.close(fd)
+        # the inherited stream objects still describe the zygote's own
+        # stdio (seekable, buffered), reopen them on the new descriptors
+        sys.stdin=sys.__stdin__=open(0,"r",closefd=False)
+        sys.stdout=sys.__stdout__=open(1,"w",closefd=False)
+        sys.stderr=sys.__stderr__=open(2,"w",buffering=1,errors="backslashreplace",closefd=False)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv=[request["module"],*request["args"]]
+        sys.path[0]=request["cwd"]
+        # children would otherwise share the zygote's random state
+        random.seed()
+
+        # keep the connection open for the launcher until exit
+        _run_child.conn=conn
+        runpy.run_module(request["module"],run_name="__main__",alter_sys=True)
+        code=0
+    except SystemExit as e:
+        code=e.code if isinstance(e.code,int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout,sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code)
+
+
+def serve(socket_path:str,preload:list[str])->None:
+    """
+    Import the server stack, then fork a server per launch request until killed.
+
+    Args:
+        socket_path:Unix socket to listen on
+        preload:Modules to import before forking
+    """
+
+    import time
+    import importlib
+
+    # BLAS thread pools do not survive fork
+    for var in ("OPENBLAS_NUM_THREADS","OMP_NUM_THREADS","MKL_NUM_THREADS"):
+        os.environ.setdefault(var,"1")
+
+    started=time.perf_counter()
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"zygote: could not preload {module}: {e}",file=sys.stderr)
+
+    # children are reaped by the kernel
+    signal.signal(signal.SIGCHLD,signal.SIG_IGN)
+    # unlink the socket on terminate as well
+    signal.signal(signal.SIGTERM,lambda signum,frame:sys.exit(0))
+
+    _private_dir(os.path.dirname(os.path.abspath(socket_path)))
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    # created 0600, never reachable by others between bind and chmod
+    umask=os.umask(0o177)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(umask)
+    listener.listen(64)
+    print(f"zygote: ready on {socket_path}, preloaded in {(time.perf_counter()-started)*1000:.0f} ms",file=sys.stderr,flush=True)
+
+    try:
+        while True:
+            conn,_=listener.accept()
+            if not _peer_is_me(conn):
+                # a child runs whatever module and environment it is sent
+                print("zygote: refused a request from another user",file=sys.stderr,flush=True)
+                conn.close()
+                continue
+            try:
+                request,fds=_receive(conn)
+                if len(fds)!=3:
+                    raise ValueError(f"expected 3 file descriptors, got {len(fds)}")
+            except ConnectionError:
+                # zygote_running probes connect and hang up
+                conn.close()
+                continue
+            except Exception as e:
+                print(f"zygote: bad request: {e}",file=sys.stderr,flush=True)
+                conn.close()
+                continue
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid=os.fork()
+            if pid==0:
+                listener.close()
+                signal.signal(signal.SIGCHLD,signal.SIG_DFL)
+                signal.signal(signal.SIGTERM,signal.SIG_DFL)
+                _run_child(conn,request,fds)
+
+            for fd in fds:
+                os.close(fd)
+            reply=json.dumps({"pid":pid}).encode()
+            try:
+                conn.sendall(_HEADER.pack(len(reply))+reply)
+            except OSError:
+                pass
+            conn.close()
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def launcher_command(command:str,args:list[str],socket_path:str=DEFAULT_SOCKET)->tuple[str,list[str]]:
+    """
+    Command and args that start a stdio server through the zygote.
+
+    Args:
+        command:The server's normal command
+        args:Its arguments, only `-m module ...` servers can be forked
+    Returns:
+        The launcher command, or the original one if it cannot be forked
+    """
+
+    if not socket_path or not hasattr(os,"fork") or _module_args([command,*args]) is None:
+        return command,list(args)
+    return sys.executable,["-S","-I",ZYGOTE_SCRIPT,"launch","--socket",socket_path,"--",command,*args]
+
+
+def zygote_running(socket_path:str=DEFAULT_SOCKET)->bool:
+    """Whether a zygote of this user is listening on socket_path"""
+
+    probe=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return _peer_is_me(probe)
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def start_zygote(socket_path:str=DEFAULT_SOCKET,preload:tuple[str,...]=DEFAULT_PRELOAD,timeout:float=30.0):
+    """
+    Start a zygote unless one is already listening.
+
+    Args:
+        socket_path:Unix socket to listen on
+        preload:Modules to import before forking
+        timeout:Seconds to wait for it to be ready
+    Returns:
+        The zygote's Popen, None if one was already running
+    Raises:
+        TimeoutError: if the zygote does not come up in time
+    """
+
+    import time
+    import subprocess
+
+    if zygote_running(socket_path):
+        return None
+
+    process=subprocess.Popen(
+        [sys.executable,ZYGOTE_SCRIPT,"serve","--socket",socket_path,"--preload",",".join(preload)],
+        stdin=subprocess.DEVNULL,
+        cwd=os.path.dirname(ZYGOTE_SCRIPT),
+        start_new_session=True
+    )
+    deadline=time.monotonic()+timeout
+    while time.monotonic()<deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"zygote exited with {process.returncode}")
+        if zygote_running(socket_path):
+            return process
+        time.sleep(0.02)
+    process.terminate()
+    raise TimeoutError(f"zygote not ready after {timeout}s")
+
+
+def main():
+    # the launcher parses its own arguments, argparse would add to its startup
+    if sys.argv[1:2]==["launch"]:
+        rest=sys.argv[2:]
+        socket_path=DEFAULT_SOCKET
+        if rest[:1]==["--socket"]:
+            socket_path,rest=rest[1],rest[2:]
+        if rest[:1]==["--"]:
+            rest=rest[1:]
+        launch(socket_path,rest)
+        return
+
+    import argparse
+
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub=parser.add_subparsers(dest="mode",required=True)
+    serve_parser=sub.add_parser("serve",help="run the zygote")
+    serve_parser.add_argument("--socket",default=DEFAULT_SOCKET)
+    serve_parser.add_argument("--preload",default=",".join(DEFAULT_PRELOAD))
+    sub.add_parser("launch",help="start a server through the zygote: launch [--socket PATH] -- python -m module ...")
+
+    args=parser.parse_args()
+    serve(args.socket,[module for module in args.preload.split(",") if module])
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Servers serving a generated dataset write their refunds and emails to
+copies of its files, the dataset itself is left as generated.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import hashlib
+from contextlib import AsyncExitStack
+
+from mcp_connect import MCPServerConfig,connect_stdio_server,call_tool,result_data
+from mcp_servers.dataset import generate,scratch_path,seed_file
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def snapshot(path)->dict[str,str]:
+    return {name:hashlib.sha1((path/name).read_bytes()).hexdigest() for name in sorted(os.listdir(path))}
+
+
+def server(module:str,**env:str)->MCPServerConfig:
+    return MCPServerConfig(
+        name=module,
+        type="stdio",
+        command=sys.executable,
+        args=["-m",f"mcp_servers.{module}"],
+        env={"PYTHONPATH":ROOT,**env}
+    )
+
+
+def run_connected(server:MCPServerConfig,test):
+    async def run():
+        async with AsyncExitStack() as exit_stack:
+            connection=await connect_stdio_server(server,exit_stack)
+            assert connection.connected,connection.error
+            await test(connection)
+    asyncio.run(run())
+
+
+def test_servers_leave_the_dataset_as_generated(tmp_path):
+    dataset=tmp_path/"dataset"
+    generate(dataset,customers=50)
+    generated=snapshot(dataset)
+    with open(dataset/"refunds.jsonl") as f:
+        refunded=[json.loads(line)["order_id"] for line in f]
+    with open(dataset/"customers.jsonl") as f:
+        customer=json.loads(f.readline())
+
+    ledger=tmp_path/"refunds.jsonl"
+
+    async def database(connection):
+        # the copy starts with the dataset's refunds
+        result=result_data(await call_tool(connection,"process_refund",{"order_id":refunded[0],"amount":1.0}))
+        assert "already been refunded" in result["error"]
+
+        orders=result_data(await call_tool(connection,"get_orders",{"customer_id":customer["ID"]}))["orders"]
+        order_id=next(order["OrderID"] for order in orders if order["OrderID"] not in refunded)
+        assert result_data(await call_tool(connection,"process_refund",{"order_id":order_id,"amount":1.0}))["success"]
+
+    run_connected(server("database_server",MCP_DATASET=str(dataset),REFUND_LEDGER_PATH=str(ledger)),database)
+    with open(ledger) as f:
+        assert len(f.readlines())==len(refunded)+1
+
+    history=tmp_path/"email_history.jsonl"
+
+    async def email(connection):
+        result=result_data(await call_tool(connection,"send_email",{"to":customer["Email"],"subject":"Hi","body":"Hello"}))
+        assert result["success"]
+        result=result_data(await call_tool(connection,"get_email_history",{"email":customer["Email"]}))
+        assert result["total_emails"]>=1
+
+    run_connected(server("email_server",MCP_DATASET=str(dataset),EMAIL_HISTORY_PATH=str(history)),email)
+    assert history.stat().st_size>(dataset/"email_history.jsonl").stat().st_size
+
+    assert snapshot(dataset)==generated
+
+
+def test_scratch_copies_are_per_dataset(tmp_path):
+    first,second=tmp_path/"a"/"dataset",tmp_path/"b"/"dataset"
+    generate(first,customers=10)
+    generate(second,customers=10,seed=7)
+    assert scratch_path(first,"refunds.jsonl")!=scratch_path(second,"refunds.jsonl")
+    assert scratch_path(first,"refunds.jsonl")==scratch_path(str(first),"refunds.jsonl")
+
+    copy=tmp_path/"copy"/"refunds.jsonl"
+    seed_file(first/"refunds.jsonl",copy)
+    assert copy.read_bytes()==(first/"refunds.jsonl").read_bytes()
+
+    # once copied, the copy is the source of truth
+    copy.write_bytes(b"")
+    seed_file(first/"refunds.jsonl",copy)
+    assert copy.read_bytes()==b""
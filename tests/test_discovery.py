@@ -0,0 +1,40 @@
+"""
+An empty config file means no servers at startup, while a reload refuses it
+and keeps the running servers.
+"""
+
+import asyncio
+
+import pytest
+
+from mcp_connect import MCPServerConfig
+from mcp_discovery import ConfigError,discover_servers
+from mcp_manager import MCPManager
+
+CONFIG="""
+mcp_servers:
+  - name: database
+    command: python
+"""
+
+
+@pytest.mark.parametrize("text",["","# nothing yet\n","other: 1\n"])
+def test_initial_discovery_of_an_empty_config(tmp_path,text):
+    path=tmp_path/"mcp_config.yaml"
+    path.write_text(text)
+    assert discover_servers(str(path))==[]
+    assert MCPManager(config_path=str(path)).servers==[]
+    with pytest.raises(ConfigError):
+        discover_servers(str(path),strict=True)
+
+
+def test_reload_keeps_the_servers_of_an_emptied_config(tmp_path):
+    path=tmp_path/"mcp_config.yaml"
+    path.write_text(CONFIG)
+    manager=MCPManager(config_path=str(path),watch_interval=0)
+    assert [server.name for server in manager.servers]==["database"]
+
+    path.write_text("")
+    with pytest.raises(ConfigError):
+        asyncio.run(manager.reload())
+    assert manager.servers==[MCPServerConfig(name="database",type="stdio",command="python")]
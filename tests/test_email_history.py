@@ -0,0 +1,85 @@
+"""
+EmailHistory with more recipients than its in-memory index holds: evicted
+recipients are found through the tails table, never by scanning the spill
+file.
+"""
+
+import os
+import json
+import random
+
+from mcp_servers import email_history
+from mcp_servers.email_history import EmailHistory
+
+
+def fill(history:EmailHistory,messages:int,recipients:int)->dict[str,list[str]]:
+    sent:dict[str,list[str]]={}
+    rng=random.Random(7)
+    for n in range(messages):
+        address=f"user{rng.randrange(recipients)}@example.com"
+        history.add({"email_id":f"E{n}","to":address})
+        sent.setdefault(address,[]).append(f"E{n}")
+    return sent
+
+
+def assert_history(history:EmailHistory,sent:dict[str,list[str]])->None:
+    for address,email_ids in sent.items():
+        assert history.count(address)==len(email_ids)
+        assert [message["email_id"] for _,message,_ in history.iter_history(address)]==email_ids[::-1]
+
+
+def test_evicted_recipients_cost_one_lookup(tmp_path,monkeypatch):
+    history=EmailHistory(tmp_path/"history.jsonl",recent=2,max_recipients=4,max_index=8)
+    sent=fill(history,2000,200)
+    assert len(history._index)<=8
+    assert_history(history,sent)
+
+    reads=[]
+    pread=os.pread
+    monkeypatch.setattr(email_history.os,"pread",lambda fd,length,offset:reads.append(length) or pread(fd,length,offset))
+
+    # push a recipient out of the index, then look it up again
+    address=next(iter(sent))
+    for n in range(20):
+        history.add({"email_id":f"X{n}","to":f"other{n}@example.com"})
+    assert address not in history._index
+    reads.clear()
+    assert history.count(address)==len(sent[address])
+    assert reads==[]
+
+    # its newest spilled message is one read away
+    next(iter(history.iter_history(address)))
+    assert len(reads)<=1
+    history.close()
+
+
+def test_tails_are_rebuilt_from_the_spill_file(tmp_path):
+    path=tmp_path/"history.jsonl"
+    history=EmailHistory(path,recent=2,max_recipients=4,max_index=8)
+    sent=fill(history,500,50)
+    history.close()
+
+    # a stale tails table is replaced, not trusted
+    os.remove(f"{path}.tails")
+    history=EmailHistory(path,recent=2,max_recipients=4,max_index=8)
+    assert_history(history,sent)
+    history.close()
+
+
+def test_spill_files_without_positions(tmp_path):
+    path=tmp_path/"history.jsonl"
+    tails:dict[str,list[int]]={}
+    sent:dict[str,list[str]]={}
+    offset=0
+    with open(path,"wb") as f:
+        for n in range(300):
+            address=f"user{n%30}@example.com"
+            line=json.dumps({"prev":tails.get(address),"record":{"email_id":f"E{n}","to":address}},separators=(",",":")).encode()+b"\n"
+            f.write(line)
+            tails[address]=[offset,len(line)]
+            offset+=len(line)
+            sent.setdefault(address,[]).append(f"E{n}")
+
+    history=EmailHistory(path,recent=2,max_recipients=4,max_index=8)
+    assert_history(history,sent)
+    history.close()
@@ -0,0 +1,103 @@
+"""
+Outbox delivery against a real SMTP server (aiosmtpd on localhost).
+"""
+
+import socket
+import asyncio
+
+import pytest
+
+aiosmtpd=pytest.importorskip("aiosmtpd.controller")
+
+from mcp_servers.email_outbox import Outbox,SMTPPool
+
+
+class Inbox:
+    def __init__(self):
+        self.messages=[]
+
+    async def handle_DATA(self,server,session,envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port()->int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1",0))
+        return s.getsockname()[1]
+
+
+def smtp_server(inbox:Inbox,port:int):
+    controller=aiosmtpd.Controller(inbox,hostname="127.0.0.1",port=port)
+    controller.start()
+    return controller
+
+
+def record(email_id:str)->dict:
+    return {"email_id":email_id,"to":"user@example.com","subject":f"Message {email_id}","body":"Hello"}
+
+
+async def deliver(outbox:Outbox,*email_ids:str)->list[str]:
+    for email_id in email_ids:
+        outbox.enqueue(record(email_id))
+    await outbox._queue.join()
+    return [outbox.get_status(email_id)["status"] for email_id in email_ids]
+
+
+def test_queued_messages_are_sent():
+    inbox=Inbox()
+    controller=smtp_server(inbox,free_port())
+    outbox=Outbox(smtp=SMTPPool("127.0.0.1",controller.port,size=2,timeout=5))
+
+    async def run():
+        outbox.enqueue(record("E1"))
+        assert outbox.get_status("E1")["status"]=="queued"
+        assert await deliver(outbox,"E2","E3")==["sent","sent"]
+        await outbox.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert outbox.get_status("E1")["status"]=="sent"
+    assert sorted(message.content.decode().split("Subject: ")[1].split("\r\n")[0] for message in inbox.messages)==[
+        "Message E1","Message E2","Message E3"
+    ]
+
+
+def test_closed_connection_is_reopened_and_never_pooled_after_failure():
+    inbox=Inbox()
+    port=free_port()
+    controller=smtp_server(inbox,port)
+    pool=SMTPPool("127.0.0.1",port,size=1,timeout=5)
+    outbox=Outbox(smtp=pool)
+
+    async def run():
+        nonlocal controller
+        assert await deliver(outbox,"E1")==["sent"]
+        assert pool._idle.qsize()==1
+
+        # the server restarts: the pooled connection is dead, a new one works
+        controller.stop()
+        controller=smtp_server(inbox,port)
+        assert await deliver(outbox,"E2")==["sent"]
+
+        # the server goes away: reconnecting fails and the closed
+        # connection must not go back into the pool
+        controller.stop()
+        assert await deliver(outbox,"E3")==["failed"]
+        assert "SMTP connection failed" in outbox.get_status("E3")["error"]
+        assert pool._idle.qsize()==0
+
+        # once it is back the next message opens a fresh connection
+        controller=smtp_server(inbox,port)
+        assert await deliver(outbox,"E4")==["sent"]
+        await outbox.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert len(inbox.messages)==3
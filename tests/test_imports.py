@@ -0,0 +1,28 @@
+"""
+Importing the servers writes nothing, the refund ledger and email history
+are opened when a server starts.
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA=os.path.join(ROOT,"mcp_servers","data")
+
+
+def data_files()->set[str]:
+    return {os.path.join(root,name) for root,_,names in os.walk(DATA) for name in names}
+
+
+def test_importing_the_servers_writes_no_files():
+    env={name:value for name,value in os.environ.items() if name not in ("REFUND_LEDGER_PATH","EMAIL_HISTORY_PATH","MCP_DATASET")}
+    env["PYTHONPATH"]=ROOT
+    before=data_files()
+    subprocess.run(
+        [sys.executable,"-c","import mcp_servers.database_server,mcp_servers.email_server"],
+        env=env,
+        cwd=ROOT,
+        check=True
+    )
+    assert data_files()==before
@@ -0,0 +1,60 @@
+"""
+Cursors are signed, and history resume pointers never read outside the
+spill file, whatever a client sends back.
+"""
+
+import json
+import base64
+
+import pytest
+
+from mcp_servers.pagination import CursorError,decode_cursor,encode_cursor
+from mcp_servers.email_history import EmailHistory
+
+
+def forge(tool:str,state:dict,scope:str)->str:
+    raw=json.dumps([tool,scope,state],separators=(",",":")).encode()
+    return base64.urlsafe_b64encode(b"\0"*16+raw).rstrip(b"=").decode()
+
+
+def test_issued_cursor_round_trips():
+    cursor=encode_cursor("get_orders",{"offset":5},"C001")
+    assert decode_cursor("get_orders",cursor,"C001")=={"offset":5}
+
+
+def test_unsigned_and_tampered_cursors_are_rejected():
+    with pytest.raises(CursorError):
+        decode_cursor("get_orders",forge("get_orders",{"offset":5},"C001"),"C001")
+
+    raw=bytearray(base64.urlsafe_b64decode(encode_cursor("get_orders",{"offset":5},"C001")+"=="))
+    raw[-3]^=1
+    with pytest.raises(CursorError):
+        decode_cursor("get_orders",base64.urlsafe_b64encode(bytes(raw)).decode(),"C001")
+
+    # a valid cursor of one customer does not open another's listing
+    with pytest.raises(CursorError):
+        decode_cursor("get_orders",encode_cursor("get_orders",{"offset":5},"C001"),"C002")
+
+
+def test_history_resume_stays_inside_the_spill_file(tmp_path):
+    history=EmailHistory(tmp_path/"history.jsonl",recent=1)
+    for n in range(3):
+        history.add({"to":"a@example.com","subject":f"A{n}"})
+        history.add({"to":"b@example.com","subject":f"B{n}"})
+
+    pages=list(history.iter_history("a@example.com"))
+    assert [message["subject"] for _,message,_ in pages]==["A2","A1","A0"]
+    _,_,resume=pages[0]
+
+    with pytest.raises(ValueError):
+        list(history.iter_history("a@example.com",2,((0,1<<40),1)))
+
+    # b's line at a's position is refused, a's own line at the wrong position too
+    b_line=next(iter(history.iter_history("b@example.com",2)))[2][0]
+    with pytest.raises(ValueError):
+        list(history.iter_history("a@example.com",2,(b_line,1)))
+    with pytest.raises(ValueError):
+        list(history.iter_history("a@example.com",1,(resume[0],0)))
+
+    assert [message["subject"] for _,message,_ in history.iter_history("a@example.com",2,resume)]==["A1","A0"]
+    history.close()
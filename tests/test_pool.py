@@ -0,0 +1,155 @@
+"""
+ConnectionPool checkout, health checks and trimming against stand-in
+connections, and a pooled server behind MCPManager end to end.
+"""
+
+import os
+import sys
+import asyncio
+
+import mcp_pool
+from mcp_connect import MCPServerConfig,MCPConnection,call_tools_batch,result_data
+from mcp_manager import MCPManager
+from mcp_pool import ConnectionPool
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER=MCPServerConfig(name="database",type="stdio")
+
+
+class Fleet:
+    """Stands in for open_connection, ping_server and disconnect_server"""
+
+    def __init__(self,monkeypatch):
+        self.opened:list[MCPConnection]=[]
+        self.dead:set[int]=set()
+        self.closed:list[MCPConnection]=[]
+        monkeypatch.setattr(mcp_pool,"open_connection",self.open)
+        monkeypatch.setattr(mcp_pool,"ping_server",self.ping)
+        monkeypatch.setattr(mcp_pool,"disconnect_server",self.disconnect)
+
+    async def open(self,server,timeout=None):
+        connection=MCPConnection(server=server,tool=[],connected=True)
+        self.opened.append(connection)
+        return connection
+
+    async def ping(self,connection):
+        return id(connection) not in self.dead
+
+    async def disconnect(self,connection):
+        connection.connected=False
+        self.closed.append(connection)
+
+
+def test_checkout_and_return(monkeypatch):
+    fleet=Fleet(monkeypatch)
+
+    async def run():
+        pool=ConnectionPool(SERVER,size=2)
+        await pool.start()
+        assert len(fleet.opened)==2 and pool.idle_count==2
+
+        first=await pool.acquire()
+        second=await pool.acquire()
+        assert first is not second and {id(first),id(second)}<={id(connection) for connection in fleet.opened}
+        assert pool.idle_count==0 and pool.in_use_count==2
+
+        await pool.release(first)
+        assert pool.in_use_count==1
+        # the most recently returned connection goes out next
+        assert await pool.acquire() is first
+
+        # a connection the caller saw break is closed, not pooled
+        await pool.release(second,broken=True)
+        assert any(connection is second for connection in fleet.closed)
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_dead_connections_are_evicted_on_checkout(monkeypatch):
+    fleet=Fleet(monkeypatch)
+
+    async def run():
+        pool=ConnectionPool(SERVER,size=2)
+        await pool.start()
+        fleet.dead|={id(connection) for connection in fleet.opened}
+
+        connection=await pool.acquire()
+        # both warm connections failed the ping, a fresh one was opened
+        assert connection is fleet.opened[2]
+        await asyncio.sleep(0)
+        assert {id(connection) for connection in fleet.closed}=={id(fleet.opened[0]),id(fleet.opened[1])}
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_surplus_is_trimmed_and_the_pool_refilled(monkeypatch):
+    fleet=Fleet(monkeypatch)
+
+    async def run():
+        pool=ConnectionPool(SERVER,size=2,max_idle=0.05)
+        await pool.start()
+        busy=[await pool.acquire() for _ in range(4)]
+        assert len(fleet.opened)>=4
+
+        # the maintainer tops the pool back up while everything is out
+        for _ in range(50):
+            if pool.idle_count>=2:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.idle_count==2
+
+        for connection in busy:
+            await pool.release(connection)
+        assert pool.idle_count==6
+
+        # surplus idle longer than max_idle is closed, size stays warm
+        for _ in range(100):
+            if pool.idle_count==2:
+                break
+            await asyncio.sleep(0.02)
+        assert pool.idle_count==2
+        assert len(fleet.closed)==4
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_manager_runs_calls_on_pooled_connections(tmp_path):
+    server=MCPServerConfig(
+        name="database",
+        type="stdio",
+        command=sys.executable,
+        args=["-m","mcp_servers.database_server"],
+        env={"PYTHONPATH":ROOT,"REFUND_LEDGER_PATH":str(tmp_path/"refunds.jsonl")},
+        pool_size=2
+    )
+
+    async def run():
+        manager=MCPManager(servers=[server],schema_cache=False,health_interval=0)
+        status=await manager.start()
+        try:
+            assert status["database"].state=="connected"
+            pool=manager._pools["database"]
+            assert pool.idle_count==2
+
+            front=manager.connections["database"]
+            assert front.pool is pool and front.session is None
+
+            results=await asyncio.gather(
+                manager.call("get_subscription",{"customer_id":"C001"}),
+                manager.call("get_orders",{"customer_id":"C001"})
+            )
+            assert result_data(results[0])["plan"]=="Premium"
+            assert result_data(results[1])["total_orders"]==3
+            assert pool.in_use_count==0 and pool.idle_count>=2
+
+            batch=await call_tools_batch(front,[("get_customer",{"email":"user@email.com"})])
+            assert batch[0]["tool"]=="get_customer"
+        finally:
+            await manager.stop()
+        assert pool.idle_count==0
+
+    asyncio.run(run())
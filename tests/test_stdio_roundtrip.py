@@ -0,0 +1,112 @@
+"""
+mcp_connect against a real stdio database server, spawned per test, so the
+results go through ADK's McpTool exactly as they do for the agent.
+"""
+
+import os
+import sys
+import json
+import asyncio
+from contextlib import AsyncExitStack
+
+import pytest
+
+from mcp_connect import MCPServerConfig,connect_stdio_server,call_tool,call_tools_batch,iter_pages,result_data
+from mcp_metrics import METRICS
+from mcp_result_cache import RESULT_CACHE,cache_key
+from mcp_servers import metrics
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def database(tmp_path,**env:str)->MCPServerConfig:
+    return MCPServerConfig(
+        name="database",
+        type="stdio",
+        command=sys.executable,
+        args=["-m","mcp_servers.database_server"],
+        env={"PYTHONPATH":ROOT,"REFUND_LEDGER_PATH":str(tmp_path/"refunds.jsonl"),**env}
+    )
+
+
+def run_connected(server:MCPServerConfig,test):
+    async def run():
+        async with AsyncExitStack() as exit_stack:
+            connection=await connect_stdio_server(server,exit_stack)
+            assert connection.connected,connection.error
+            await test(connection)
+    asyncio.run(run())
+
+
+def test_batch_runs_on_the_server(tmp_path):
+    async def test(connection):
+        results=await call_tools_batch(connection,[
+            ("get_orders",{"customer_id":"C001"}),
+            ("get_subscription",{"customer_id":"C001"}),
+            ("get_orders",{"customer_id":"C001","cursor":"forged"}),
+        ])
+        assert [entry["tool"] for entry in results]==["get_orders","get_subscription","get_orders"]
+        assert results[0]["ok"] and results[0]["result"]["total_orders"]==3
+        assert results[1]["result"]["plan"]=="Premium"
+        assert results[2]["result"]["success"] is False and "Invalid cursor" in results[2]["result"]["error"]
+
+    run_connected(database(tmp_path),test)
+
+
+def test_iter_pages_follows_the_cursor(tmp_path):
+    async def test(connection):
+        pages=[page async for page in iter_pages(connection,"get_orders",{"customer_id":"C001","limit":1})]
+        assert len(pages)==3
+        assert [page["next_cursor"] is None for page in pages]==[False,False,True]
+        assert len({order["OrderID"] for page in pages for order in page["orders"]})==3
+
+        pages=[page async for page in iter_pages(connection,"get_orders",{"customer_id":"C001","limit":2},max_pages=1)]
+        assert len(pages)==1 and len(pages[0]["orders"])==2
+
+    run_connected(database(tmp_path),test)
+
+
+@pytest.mark.parametrize("traced",[False,True])
+def test_refund_drops_cached_reads_and_failures_are_not_cached(tmp_path,monkeypatch,traced):
+    if traced:
+        monkeypatch.setattr(metrics,"TRACE_FILE",str(tmp_path/"trace.jsonl"))
+    RESULT_CACHE.clear()
+
+    async def test(connection):
+        result=await call_tool(connection,"get_subscription",{"customer_id":"C001"})
+        assert result["isError"] is False and result_data(result)["plan"]=="Premium"
+        subscription=cache_key("database","get_subscription",{"customer_id":"C001"})
+        assert RESULT_CACHE.get(subscription)==result
+
+        refund=await call_tool(connection,"process_refund",{"order_id":"ORD-45232","amount":29.99})
+        assert result_data(refund)["success"]
+        assert RESULT_CACHE.get(subscription) is None
+
+        arguments={"customer_id":"C001","cursor":"forged"}
+        assert result_data(await call_tool(connection,"get_orders",arguments))["success"] is False
+        assert RESULT_CACHE.get(cache_key("database","get_orders",arguments)) is None
+
+    run_connected(database(tmp_path),test)
+
+
+def test_failed_calls_are_counted_and_traces_join_the_server(tmp_path,monkeypatch):
+    trace_file=str(tmp_path/"trace.jsonl")
+    monkeypatch.setattr(metrics,"TRACE_FILE",trace_file)
+    METRICS.reset()
+
+    async def test(connection):
+        await call_tool(connection,"process_refund",{"order_id":"ORD-00000","amount":1.0})
+        await call_tool(connection,"get_subscription",{"customer_id":"C001"})
+
+    run_connected(database(tmp_path,MCP_TRACE_FILE=trace_file),test)
+
+    calls={entry["labels"]["tool"]:entry for entry in METRICS.snapshot()["mcp_client_tool_call"]}
+    assert calls["process_refund"]["errors"]==1
+    assert calls["get_subscription"]["errors"]==0
+
+    with open(trace_file) as f:
+        spans=[json.loads(line) for line in f]
+    client={span["span_id"]:span for span in spans if span["name"]=="call_tool"}
+    server=[span for span in spans if span["name"]=="server call_tool"]
+    assert len(client)==2 and len(server)==2
+    assert all(span["parent_id"] in client and span["trace_id"]==client[span["parent_id"]]["trace_id"] for span in server)
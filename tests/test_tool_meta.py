@@ -0,0 +1,88 @@
+"""
+tool_meta and is_read_only against real ADK McpTool objects, so a change in
+how ADK wraps the MCP tool shows up here and not as lost cache policies or
+uncoalesced reads.
+"""
+
+import asyncio
+
+import pytest
+from mcp import StdioServerParameters
+from mcp.types import Tool
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager,StdioConnectionParams
+
+import mcp_connect
+from mcp_connect import MCPServerConfig,MCPConnection,call_tool,is_read_only,raw_mcp_tool,tool_meta
+from mcp_schema_cache import CachedMcpTool,tool_schema
+
+META={"cache":{"ttl":30,"tags":["customer:{customer_id}"]}}
+
+
+def mcp_tool(name:str="get_orders",read_only:bool=True,meta:dict=META)->McpTool:
+    tool=Tool.model_validate({
+        "name":name,
+        "description":"Orders of a customer",
+        "inputSchema":{"type":"object","properties":{"customer_id":{"type":"string"}}},
+        "annotations":{"readOnlyHint":read_only},
+        "_meta":meta
+    })
+    # the session manager only spawns the server when a session is created
+    manager=MCPSessionManager(StdioConnectionParams(server_params=StdioServerParameters(command="true")))
+    return McpTool(mcp_tool=tool,mcp_session_manager=manager)
+
+
+def test_reads_meta_and_annotations_of_live_tool():
+    tool=mcp_tool()
+    assert raw_mcp_tool(tool).name=="get_orders"
+    assert tool_meta(tool)==META
+    assert is_read_only(tool)
+
+
+def test_write_tool_is_not_read_only():
+    tool=mcp_tool("process_refund",read_only=False,meta=None)
+    assert tool_meta(tool)=={}
+    assert not is_read_only(tool)
+
+
+def test_placeholder_agrees_with_live_tool():
+    tool=mcp_tool()
+    schema=tool_schema(tool)
+    assert schema["inputSchema"]["properties"]=={"customer_id":{"type":"string"}}
+
+    connection=MCPConnection(server=MCPServerConfig(name="database",type="stdio"),tool=[])
+    placeholder=CachedMcpTool(schema,connection)
+    assert tool_meta(placeholder)==tool_meta(tool)
+    assert is_read_only(placeholder)
+
+
+def test_tool_without_mcp_tool_fails_loudly():
+    class Plain:
+        name="plain"
+
+    with pytest.raises(TypeError,match="plain"):
+        tool_meta(Plain())
+
+
+def test_identical_reads_on_live_tool_are_coalesced(monkeypatch):
+    sent=[]
+
+    async def call_remote(connection,name,arguments,tool_context,meta):
+        sent.append(name)
+        await asyncio.sleep(0.05)
+        return {"orders":[]}
+
+    monkeypatch.setattr(mcp_connect,"_call_remote",call_remote)
+    server=MCPServerConfig(name="database",type="stdio")
+    read=mcp_tool(meta=None)
+    write=mcp_tool("process_refund",read_only=False,meta=None)
+    connection=MCPConnection(server=server,tool=[],connected=True,remote={"get_orders":read,"process_refund":write})
+
+    async def run():
+        reads=await asyncio.gather(*(call_tool(connection,"get_orders",{"customer_id":"C001"}) for _ in range(5)))
+        writes=await asyncio.gather(*(call_tool(connection,"process_refund",{"order_id":"O1"}) for _ in range(2)))
+        return reads,writes
+
+    reads,writes=asyncio.run(run())
+    assert reads==[{"orders":[]}]*5 and len(writes)==2
+    assert sent==["get_orders","process_refund","process_refund"]
@@ -0,0 +1,42 @@
+"""
+The zygote socket is private to its user: created 0600 in a directory
+nobody else can write to, and neither end talks to another user's process.
+"""
+
+import os
+import stat
+
+import pytest
+
+import mcp_zygote
+from mcp_zygote import start_zygote,zygote_running
+
+pytestmark=pytest.mark.skipif(not hasattr(os,"fork"),reason="the zygote needs fork")
+
+
+def test_socket_is_private_and_peers_are_checked(tmp_path,monkeypatch):
+    socket_path=str(tmp_path/"zygote"/"zygote.sock")
+    process=start_zygote(socket_path,preload=())
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode)==0o600
+        assert stat.S_IMODE(os.stat(os.path.dirname(socket_path)).st_mode)==0o700
+        assert zygote_running(socket_path)
+
+        if hasattr(mcp_zygote.socket,"SO_PEERCRED"):
+            # as seen by another user the listener is not theirs
+            other=os.getuid()+1
+            monkeypatch.setattr(mcp_zygote.os,"getuid",lambda:other)
+            assert not zygote_running(socket_path)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def test_zygote_refuses_a_shared_directory(tmp_path):
+    shared=tmp_path/"shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        mcp_zygote._private_dir(str(shared))
+    with pytest.raises(RuntimeError):
+        start_zygote(str(shared/"zygote.sock"),preload=(),timeout=10)